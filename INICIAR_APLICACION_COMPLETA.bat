@@ -43,7 +43,7 @@ if not exist ".venv" (
 call .venv\Scripts\activate.bat
 
 echo [PASO 4] Instalando dependencias básicas...
-pip install --quiet flask flask-cors yt-dlp librosa numpy scipy soundfile
+pip install --quiet flask flask-cors yt-dlp librosa numpy scipy soundfile websockets
 
 echo [PASO 5] Iniciando Backend Principal (Puerto 3001)...
 cd backend
@@ -55,6 +55,10 @@ echo [PASO 6] Iniciando Servidor YouTube (Puerto 5005)...
 start "YOUTUBE-SERVER" /MIN cmd /c "call .venv\Scripts\activate.bat && python backend_youtube.py && pause"
 timeout /t 3 /nobreak >nul
 
+echo [PASO 6b] Iniciando Analisis en Tiempo Real (Puerto 5006)...
+start "LIVE-ANALYSIS-SERVER" /MIN cmd /c "call .venv\Scripts\activate.bat && python backend_live.py && pause"
+timeout /t 3 /nobreak >nul
+
 echo [PASO 7] Iniciando Frontend (Puerto 8081)...
 start "FRONTEND-SERVER" /MIN cmd /c "call .venv\Scripts\activate.bat && python servidor_frontend.py && pause"
 timeout /t 3 /nobreak >nul
@@ -93,6 +97,7 @@ echo.
 echo 🌐 Frontend:        http://localhost:8081
 echo 🔧 Backend:         http://localhost:3001
 echo 🎵 YouTube Server:  http://localhost:5005
+echo 🎙️ Tiempo real:     ws://localhost:5006
 echo.
 echo ✅ TODOS LOS SERVICIOS FUNCIONANDO
 echo.
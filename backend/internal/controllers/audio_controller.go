@@ -145,6 +145,52 @@ func (ac *AudioController) ExportAnalysis(c *gin.Context) {
 	c.Data(http.StatusOK, contentType, data)
 }
 
+// GetWaveform obtiene los picos de forma de onda de un análisis.
+// Sin ?level devuelve el índice de niveles; con ?level=<muestras por píxel>, los picos binarios
+func (ac *AudioController) GetWaveform(c *gin.Context) {
+	id, err := strconv.Atoi(c.Param("id"))
+	if err != nil {
+		c.JSON(http.StatusBadRequest, gin.H{
+			"error": "ID de análisis inválido",
+		})
+		return
+	}
+
+	data, contentType, err := ac.analysisService.GetWaveform(id, c.Query("level"))
+	if err != nil {
+		c.JSON(http.StatusNotFound, gin.H{
+			"error": "Forma de onda no encontrada",
+			"details": err.Error(),
+		})
+		return
+	}
+
+	c.Data(http.StatusOK, contentType, data)
+}
+
+// GetTiles obtiene teselas de chroma o espectrograma de un análisis.
+// Sin ?kind devuelve el índice; con ?kind=chroma|spectrogram&level=N&index=M, la tesela binaria
+func (ac *AudioController) GetTiles(c *gin.Context) {
+	id, err := strconv.Atoi(c.Param("id"))
+	if err != nil {
+		c.JSON(http.StatusBadRequest, gin.H{
+			"error": "ID de análisis inválido",
+		})
+		return
+	}
+
+	data, contentType, err := ac.analysisService.GetTile(id, c.Query("kind"), c.Query("level"), c.Query("index"))
+	if err != nil {
+		c.JSON(http.StatusNotFound, gin.H{
+			"error": "Tesela no encontrada",
+			"details": err.Error(),
+		})
+		return
+	}
+
+	c.Data(http.StatusOK, contentType, data)
+}
+
 // isValidAudioFile valida si el archivo es un formato de audio soportado
 func (ac *AudioController) isValidAudioFile(filename string) bool {
 	// Obtener la extensión del archivo
@@ -209,6 +255,29 @@ func (ac *AudioController) IdentifySong(c *gin.Context) {
 	c.JSON(http.StatusOK, identification)
 }
 
+// GetLyrics devuelve la letra de una canción identificada (consulta posterior a la identificación)
+func (ac *AudioController) GetLyrics(c *gin.Context) {
+	title := c.Query("title")
+	artist := c.Query("artist")
+	if title == "" || artist == "" {
+		c.JSON(http.StatusBadRequest, gin.H{
+			"error": "Se requieren título y artista",
+		})
+		return
+	}
+
+	lyrics, err := ac.analysisService.GetLyrics(title, artist)
+	if err != nil {
+		c.JSON(http.StatusInternalServerError, gin.H{
+			"error": "Error al buscar la letra",
+			"details": err.Error(),
+		})
+		return
+	}
+
+	c.JSON(http.StatusOK, lyrics)
+}
+
 // DownloadFromYouTube descarga audio desde YouTube
 func (ac *AudioController) DownloadFromYouTube(c *gin.Context) {
 	var request struct {
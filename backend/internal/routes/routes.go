@@ -16,10 +16,15 @@ func SetupRoutes(r *gin.Engine, audioController *controllers.AudioController, he
 			audio.POST("/upload", audioController.UploadAudio)
 			audio.GET("/:id", audioController.GetAnalysis)
 			audio.GET("/:id/export", audioController.ExportAnalysis)
+			audio.GET("/:id/waveform", audioController.GetWaveform)
+			audio.GET("/:id/tiles", audioController.GetTiles)
 			audio.POST("/identify", audioController.IdentifySong)
 			audio.POST("/youtube-download", audioController.DownloadFromYouTube)
 		}
 
+		// Letra de una canción identificada (la identificación no la espera)
+		api.GET("/lyrics", audioController.GetLyrics)
+
 		// Ruta de salud del servidor
 		api.GET("/health", healthController.HealthCheck)
 	}
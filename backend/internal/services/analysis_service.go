@@ -6,15 +6,17 @@ import (
 	"os"
 	"os/exec"
 	"path/filepath"
+	"strconv"
 	"sync"
 	"time"
 )
 
 // AnalysisService maneja el procesamiento y análisis de audio
 type AnalysisService struct {
-	results map[int]*AnalysisResult
-	nextID  int
-	mutex   sync.RWMutex
+	results     map[int]*AnalysisResult
+	nextID      int
+	mutex       sync.RWMutex
+	waveformDir string
 }
 
 // AnalysisResult representa el resultado de un análisis de audio
@@ -26,6 +28,7 @@ type AnalysisResult struct {
 	TempoClassification   string                 `json:"tempo_classification"`
 	Progression           []string               `json:"progression"`
 	Timeline              []TimelineEntry        `json:"timeline"`
+	ChordTimeline         *ColumnarTimeline      `json:"chord_timeline,omitempty"`
 	Notes                 []string               `json:"notes"`
 	Lyrics                string                 `json:"lyrics,omitempty"`
 	Duration              float64                `json:"duration"`
@@ -33,6 +36,9 @@ type AnalysisResult struct {
 	AvgChordConfidence    float64                `json:"average_chord_confidence"`
 	SongIdentification    *SongIdentification    `json:"song_identification,omitempty"`
 	HarmonicAnalysis      *HarmonicAnalysis      `json:"harmonic_analysis,omitempty"`
+	Structure             []StructureSection     `json:"structure,omitempty"`
+	BeatGrid              *BeatGrid              `json:"beat_grid,omitempty"`
+	TempoCurve            *TempoCurve            `json:"tempo_curve,omitempty"`
 	CreatedAt             time.Time              `json:"created_at"`
 	Status                string                 `json:"status"` // "processing", "completed", "error"
 	Error                 string                 `json:"error,omitempty"`
@@ -41,8 +47,16 @@ type AnalysisResult struct {
 // SongIdentification representa información de identificación de la canción
 type SongIdentification struct {
 	Identified      bool                   `json:"identified"`
+	Title           string                 `json:"title,omitempty"`
+	Artist          string                 `json:"artist,omitempty"`
+	Album           string                 `json:"album,omitempty"`
+	Source          string                 `json:"source,omitempty"`
 	Confidence      float64                `json:"confidence"`
+	Lyrics          string                 `json:"lyrics,omitempty"`
+	LyricsPending   bool                   `json:"lyrics_pending,omitempty"`
+	MusicLinks      map[string]string      `json:"music_links,omitempty"`
 	Characteristics map[string]interface{} `json:"characteristics"`
+	Backends        map[string]interface{} `json:"backends,omitempty"`
 }
 
 // HarmonicAnalysis representa el análisis armónico avanzado
@@ -55,6 +69,27 @@ type HarmonicAnalysis struct {
 	HarmonicRhythm     string   `json:"harmonic_rhythm"`
 }
 
+// StructureSection representa una sección de la canción (intro, verso, estribillo...)
+type StructureSection struct {
+	Start   float64 `json:"start"`
+	End     float64 `json:"end"`
+	Label   string  `json:"label"`
+	Section string  `json:"section"`
+}
+
+// BeatGrid representa la rejilla de pulsos y los tiempos fuertes (segundos)
+type BeatGrid struct {
+	Beats       []float64 `json:"beats"`
+	Downbeats   []float64 `json:"downbeats"`
+	BeatsPerBar int       `json:"beats_per_bar"`
+}
+
+// TempoCurve representa el tempo local a lo largo de la canción
+type TempoCurve struct {
+	Time []float64 `json:"time"`
+	BPM  []float64 `json:"bpm"`
+}
+
 // TimelineEntry representa una entrada en la línea de tiempo
 type TimelineEntry struct {
 	Time       string  `json:"time"`
@@ -62,11 +97,47 @@ type TimelineEntry struct {
 	Confidence float64 `json:"confidence,omitempty"`
 }
 
+// ColumnarTimeline representa el timeline completo de acordes en columnas:
+// tiempos en segundos, índices a Vocabulary y confianzas
+type ColumnarTimeline struct {
+	Vocabulary  []string  `json:"vocabulary"`
+	Time        []float64 `json:"time"`
+	Chord       []int     `json:"chord"`
+	Confidence  []float64 `json:"confidence"`
+	Progression []int     `json:"progression,omitempty"`
+}
+
+// Entries expande el timeline columnar a entradas clásicas
+func (ct *ColumnarTimeline) Entries() []TimelineEntry {
+	entries := make([]TimelineEntry, 0, len(ct.Time))
+	for i, t := range ct.Time {
+		if i >= len(ct.Chord) || ct.Chord[i] < 0 || ct.Chord[i] >= len(ct.Vocabulary) {
+			break
+		}
+		entry := TimelineEntry{
+			Time:  fmt.Sprintf("%d:%02d", int(t)/60, int(t)%60),
+			Chord: ct.Vocabulary[ct.Chord[i]],
+		}
+		if i < len(ct.Confidence) {
+			entry.Confidence = ct.Confidence[i]
+		}
+		entries = append(entries, entry)
+	}
+	return entries
+}
+
 // NewAnalysisService crea una nueva instancia del servicio de análisis
 func NewAnalysisService() *AnalysisService {
+	// Directorio de picos de forma de onda (uno por análisis)
+	waveformDir := "./waveforms"
+	if err := os.MkdirAll(waveformDir, 0755); err != nil {
+		panic(fmt.Sprintf("No se pudo crear directorio de formas de onda: %v", err))
+	}
+
 	return &AnalysisService{
-		results: make(map[int]*AnalysisResult),
-		nextID:  1,
+		results:     make(map[int]*AnalysisResult),
+		nextID:      1,
+		waveformDir: waveformDir,
 	}
 }
 
@@ -131,8 +202,22 @@ func (as *AnalysisService) processAudioAsync(id int, audioPath string) {
 		return
 	}
 	
-	// Ejecutar comando con ruta absoluta
-	cmd := exec.Command(venvPythonPath, scriptPath, absAudioPath)
+	// Picos de forma de onda y teselas se escriben junto al resultado, en su propio directorio
+	absPeaksDir, err := filepath.Abs(as.waveformPath(id))
+	if err != nil {
+		as.mutex.Lock()
+		result.Status = "error"
+		result.Error = fmt.Sprintf("Error al obtener ruta absoluta: %v", err)
+		as.mutex.Unlock()
+		return
+	}
+	
+	// Ejecutar comando con ruta absoluta; la identificación sale de la misma pasada
+	cmd := exec.Command(venvPythonPath, scriptPath,
+		"--peaks", absPeaksDir,
+		"--tiles", filepath.Join(absPeaksDir, "tiles"),
+		"--identify",
+		absAudioPath)
 	cmd.Dir = filepath.Join("..", "python_audio")  // Establecer directorio de trabajo
 	
 	output, err := cmd.Output()
@@ -165,6 +250,7 @@ func (as *AnalysisService) processAudioAsync(id int, audioPath string) {
 		TempoClassification   string                 `json:"tempo_classification"`
 		Progression           []string               `json:"progression"`
 		Timeline              []TimelineEntry        `json:"timeline"`
+		ChordTimeline         *ColumnarTimeline      `json:"chord_timeline,omitempty"`
 		Notes                 []string               `json:"notes"`
 		Lyrics                string                 `json:"lyrics,omitempty"`
 		Duration              float64                `json:"duration"`
@@ -172,6 +258,9 @@ func (as *AnalysisService) processAudioAsync(id int, audioPath string) {
 		AvgChordConfidence    float64                `json:"average_chord_confidence"`
 		SongIdentification    *SongIdentification    `json:"song_identification,omitempty"`
 		HarmonicAnalysis      map[string]interface{} `json:"harmonic_analysis,omitempty"`
+		Structure             []StructureSection     `json:"structure,omitempty"`
+		BeatGrid              *BeatGrid              `json:"beat_grid,omitempty"`
+		TempoCurve            *TempoCurve            `json:"tempo_curve,omitempty"`
 		Error                 string                 `json:"error,omitempty"`
 	}
 
@@ -230,6 +319,7 @@ func (as *AnalysisService) processAudioAsync(id int, audioPath string) {
 	result.TempoClassification = analysisData.TempoClassification
 	result.Progression = analysisData.Progression
 	result.Timeline = analysisData.Timeline
+	result.ChordTimeline = analysisData.ChordTimeline
 	result.Notes = analysisData.Notes
 	result.Lyrics = analysisData.Lyrics
 	result.Duration = analysisData.Duration
@@ -237,6 +327,9 @@ func (as *AnalysisService) processAudioAsync(id int, audioPath string) {
 	result.AvgChordConfidence = analysisData.AvgChordConfidence
 	result.SongIdentification = analysisData.SongIdentification
 	result.HarmonicAnalysis = harmonicAnalysis
+	result.Structure = analysisData.Structure
+	result.BeatGrid = analysisData.BeatGrid
+	result.TempoCurve = analysisData.TempoCurve
 	result.Status = "completed"
 	as.mutex.Unlock()
 	
@@ -260,6 +353,105 @@ func (as *AnalysisService) GetAnalysisResults(id int) (*AnalysisResult, error) {
 	return result, nil
 }
 
+// waveformPath retorna el directorio de picos de un análisis
+func (as *AnalysisService) waveformPath(id int) string {
+	return filepath.Join(as.waveformDir, strconv.Itoa(id))
+}
+
+// GetWaveform retorna el índice de niveles de la forma de onda (level vacío)
+// o los picos binarios de un nivel: bytes min, max, rms intercalados (int8)
+func (as *AnalysisService) GetWaveform(id int, level string) ([]byte, string, error) {
+	if _, err := as.GetAnalysisResults(id); err != nil {
+		return nil, "", err
+	}
+
+	dir := as.waveformPath(id)
+	if level == "" {
+		data, err := os.ReadFile(filepath.Join(dir, "waveform.json"))
+		if err != nil {
+			return nil, "", fmt.Errorf("forma de onda no disponible para el análisis %d", id)
+		}
+		return data, "application/json", nil
+	}
+
+	// Validar el nivel como entero para no construir rutas arbitrarias
+	samplesPerPixel, err := strconv.Atoi(level)
+	if err != nil || samplesPerPixel <= 0 {
+		return nil, "", fmt.Errorf("nivel inválido: %s", level)
+	}
+	data, err := os.ReadFile(filepath.Join(dir, fmt.Sprintf("waveform_%d.bin", samplesPerPixel)))
+	if err != nil {
+		return nil, "", fmt.Errorf("nivel %d no disponible", samplesPerPixel)
+	}
+	return data, "application/octet-stream", nil
+}
+
+// tileIndex representa el índice de teselas escrito por spectral_tiles.py
+type tileIndex struct {
+	TileFrames int `json:"tile_frames"`
+	Kinds      map[string]struct {
+		Bins   int `json:"bins"`
+		Levels []struct {
+			Frames int    `json:"frames"`
+			Tiles  int    `json:"tiles"`
+			File   string `json:"file"`
+		} `json:"levels"`
+	} `json:"kinds"`
+}
+
+// GetTile retorna el índice de teselas (kind vacío) o una tesela de chroma o
+// espectrograma: frames x bins bytes (uint8), leída sin cargar el nivel completo
+func (as *AnalysisService) GetTile(id int, kind, level, index string) ([]byte, string, error) {
+	if _, err := as.GetAnalysisResults(id); err != nil {
+		return nil, "", err
+	}
+
+	dir := filepath.Join(as.waveformPath(id), "tiles")
+	indexData, err := os.ReadFile(filepath.Join(dir, "tiles.json"))
+	if err != nil {
+		return nil, "", fmt.Errorf("teselas no disponibles para el análisis %d", id)
+	}
+	if kind == "" {
+		return indexData, "application/json", nil
+	}
+
+	var tiles tileIndex
+	if err := json.Unmarshal(indexData, &tiles); err != nil {
+		return nil, "", fmt.Errorf("índice de teselas inválido: %v", err)
+	}
+	info, ok := tiles.Kinds[kind]
+	if !ok {
+		return nil, "", fmt.Errorf("tipo de tesela desconocido: %s", kind)
+	}
+
+	levelNum, err := strconv.Atoi(level)
+	if err != nil || levelNum < 0 || levelNum >= len(info.Levels) {
+		return nil, "", fmt.Errorf("nivel inválido: %s", level)
+	}
+	levelInfo := info.Levels[levelNum]
+	tileNum, err := strconv.Atoi(index)
+	if err != nil || tileNum < 0 || tileNum >= levelInfo.Tiles {
+		return nil, "", fmt.Errorf("tesela inválida: %s", index)
+	}
+
+	// Cada tesela es un rango contiguo del archivo del nivel
+	frames := levelInfo.Frames - tileNum*tiles.TileFrames
+	if frames > tiles.TileFrames {
+		frames = tiles.TileFrames
+	}
+	file, err := os.Open(filepath.Join(dir, filepath.Base(levelInfo.File)))
+	if err != nil {
+		return nil, "", fmt.Errorf("nivel %d no disponible", levelNum)
+	}
+	defer file.Close()
+
+	data := make([]byte, frames*info.Bins)
+	if _, err := file.ReadAt(data, int64(tileNum*tiles.TileFrames*info.Bins)); err != nil {
+		return nil, "", fmt.Errorf("error al leer tesela: %v", err)
+	}
+	return data, "application/octet-stream", nil
+}
+
 // GetAllAnalyses obtiene todos los análisis realizados
 func (as *AnalysisService) GetAllAnalyses() []*AnalysisResult {
 	as.mutex.RLock()
@@ -315,6 +507,9 @@ func (as *AnalysisService) formatAsText(result *AnalysisResult) string {
 			content += fmt.Sprintf("🎵 IDENTIFICACIÓN\n")
 			if result.SongIdentification.Identified {
 				content += fmt.Sprintf("Canción identificada (Confianza: %.2f)\n", result.SongIdentification.Confidence)
+				if result.SongIdentification.Title != "" {
+					content += fmt.Sprintf("%s - %s\n", result.SongIdentification.Title, result.SongIdentification.Artist)
+				}
 			} else {
 				content += fmt.Sprintf("Canción no identificada en base de datos\n")
 			}
@@ -357,9 +552,25 @@ func (as *AnalysisService) formatAsText(result *AnalysisResult) string {
 			content += "\n"
 		}
 
+		// Estructura
+		if len(result.Structure) > 0 {
+			content += fmt.Sprintf("🧩 ESTRUCTURA\n")
+			for _, section := range result.Structure {
+				content += fmt.Sprintf("  %d:%02d - %d:%02d  %s (%s)\n",
+					int(section.Start)/60, int(section.Start)%60,
+					int(section.End)/60, int(section.End)%60,
+					section.Section, section.Label)
+			}
+			content += "\n"
+		}
+
 		// Línea de tiempo
 		content += fmt.Sprintf("⏱️ LÍNEA DE TIEMPO\n")
-		for _, entry := range result.Timeline {
+		timeline := result.Timeline
+		if result.ChordTimeline != nil {
+			timeline = result.ChordTimeline.Entries()
+		}
+		for _, entry := range timeline {
 			if entry.Confidence > 0 {
 				content += fmt.Sprintf("  %s - %s (Confianza: %.2f)\n", entry.Time, entry.Chord, entry.Confidence)
 			} else {
@@ -438,6 +649,46 @@ print(json.dumps(result, ensure_ascii=False))
 	return result, nil
 }
 
+// GetLyrics busca la letra de una canción ya identificada. La identificación
+// responde sin esperar a la letra (lyrics_pending) y el cliente la pide aquí;
+// la caché de letras de Python hace que sea inmediata en las canciones repetidas
+func (as *AnalysisService) GetLyrics(title, artist string) (map[string]interface{}, error) {
+	// Usar Python del entorno virtual
+	venvPythonPath := filepath.Join("..", "python_audio", "venv", "Scripts", "python.exe")
+	
+	// Verificar que Python existe
+	if _, err := os.Stat(venvPythonPath); os.IsNotExist(err) {
+		return nil, fmt.Errorf("Python del entorno virtual no encontrado: %s", venvPythonPath)
+	}
+	
+	// Título y artista van como argumentos, no dentro del código
+	cmd := exec.Command(venvPythonPath, "-c", `
+import sys
+sys.path.append('.')
+from shazam_integration import fetch_lyrics
+import json
+
+print(json.dumps(fetch_lyrics(sys.argv[1], sys.argv[2]), ensure_ascii=False))
+`, title, artist)
+	
+	cmd.Dir = filepath.Join("..", "python_audio")
+	
+	output, err := cmd.Output()
+	if err != nil {
+		if exitError, ok := err.(*exec.ExitError); ok {
+			return nil, fmt.Errorf("error buscando letra: %s", string(exitError.Stderr))
+		}
+		return nil, fmt.Errorf("error al ejecutar búsqueda de letra: %v", err)
+	}
+	
+	var result map[string]interface{}
+	if err := json.Unmarshal(output, &result); err != nil {
+		return nil, fmt.Errorf("error al parsear letra: %v", err)
+	}
+	
+	return result, nil
+}
+
 // DownloadFromYouTube descarga audio desde YouTube
 func (as *AnalysisService) DownloadFromYouTube(youtubeURL, format string) (map[string]interface{}, error) {
 	// Usar el script de integración Shazam para descarga de YouTube
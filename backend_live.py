@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BACKEND DE ANÁLISIS EN TIEMPO REAL
+Servidor WebSocket: recibe audio del micrófono en bloques y devuelve el
+acorde actual, la tonalidad estimada y el BPM mientras se graba
+
+Protocolo:
+  cliente -> {"type": "start", "sample_rate": 48000}   (texto, opcional)
+  cliente -> muestras float32 little-endian mono         (binario)
+  servidor -> {"type": "update", "chord": ..., "key": ..., "bpm": ..., "latency_ms": ...}
+"""
+
+import sys
+import json
+import asyncio
+import numpy as np
+
+# Agregar el directorio python_audio al path
+sys.path.append('python_audio')
+
+try:
+    import websockets
+    LIVE_AVAILABLE = True
+except ImportError:
+    print("⚠️ websockets no está instalado. Ejecuta: pip install websockets")
+    LIVE_AVAILABLE = False
+
+from live_analysis import LiveAnalyzer
+
+# Configuración
+HOST = '0.0.0.0'
+PORT = 5006
+DEFAULT_SAMPLE_RATE = 48000
+
+# Frecuencias de muestreo aceptadas del cliente (Hz)
+MIN_SAMPLE_RATE = 8000
+MAX_SAMPLE_RATE = 192000
+
+# Tamaño máximo de un mensaje (bytes): ~2 s de audio a 48 kHz
+MAX_MESSAGE_SIZE = 2 * 48000 * 4
+
+
+def parse_sample_rate(value):
+    """Frecuencia de muestreo enviada por el cliente, validada"""
+    try:
+        sample_rate = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"sample_rate no válido: {value!r}")
+    if not MIN_SAMPLE_RATE <= sample_rate <= MAX_SAMPLE_RATE:
+        raise ValueError(
+            f"sample_rate fuera de rango ({MIN_SAMPLE_RATE}-{MAX_SAMPLE_RATE} Hz): {sample_rate}"
+        )
+    return sample_rate
+
+
+async def handle_session(websocket):
+    """Una sesión de análisis por conexión"""
+    analyzer = LiveAnalyzer(sr=DEFAULT_SAMPLE_RATE)
+
+    async for message in websocket:
+        try:
+            if isinstance(message, str):
+                data = json.loads(message)
+                if data.get('type') == 'start':
+                    # Un valor rechazado deja la sesión con el analizador anterior
+                    analyzer = LiveAnalyzer(sr=parse_sample_rate(data.get('sample_rate', DEFAULT_SAMPLE_RATE)))
+                    await websocket.send(json.dumps({'type': 'ready', 'sample_rate': analyzer.sr}))
+                continue
+
+            samples = np.frombuffer(message, dtype='<f4')
+            update = analyzer.push(samples)
+            if update is not None:
+                await websocket.send(json.dumps({'type': 'update', **update}))
+
+        except Exception as e:
+            await websocket.send(json.dumps({'type': 'error', 'error': str(e)}))
+
+
+async def main():
+    async with websockets.serve(handle_session, HOST, PORT, max_size=MAX_MESSAGE_SIZE):
+        print(f"🎙️ Análisis en tiempo real disponible en: ws://localhost:{PORT}")
+        await asyncio.Future()
+
+
+if __name__ == '__main__':
+    if not LIVE_AVAILABLE:
+        sys.exit(1)
+    asyncio.run(main())
@@ -8,6 +8,7 @@ class MusicAnalysisApp {
     constructor() {
         this.apiBaseUrl = 'http://localhost:3001/api';  // API original para análisis (puerto correcto)
         this.youtubeApiUrl = 'http://localhost:5005/api';  // API separada para YouTube
+        this.liveSocketUrl = 'ws://localhost:5006';  // Análisis en tiempo real del micrófono
         this.currentAnalysisId = null;
         this.currentFile = null;
         this.currentFileInfo = null;  // Información extraída del nombre del archivo
@@ -16,6 +17,7 @@ class MusicAnalysisApp {
         this.recordingStartTime = null;
         this.recordingTimer = null;
         this.isRecording = false;
+        this.liveSession = null;
 
         this.init();
     }
@@ -249,8 +251,12 @@ class MusicAnalysisApp {
         document.getElementById('resultDuration').textContent = this.formatDuration(results.duration || 0);
 
         this.displayChordProgression(results.progression || []);
-        this.displayTimeline(results.timeline || []);
+        this.displayTimeline(results.chord_timeline
+            ? this.expandChordTimeline(results.chord_timeline)
+            : (results.timeline || []));
         this.displayNotes(results.notes || []);
+        this.displayStructure(results.structure || []);
+        this.displayWaveform();
 
         if (results.lyrics && results.lyrics.trim()) {
             this.displayLyrics(results.lyrics);
@@ -295,6 +301,20 @@ class MusicAnalysisApp {
         });
     }
 
+    expandChordTimeline(columnar) {
+        // Timeline columnar: tiempos (s), índices al vocabulario y confianzas
+        const vocabulary = columnar.vocabulary || [];
+        const times = columnar.time || [];
+        const chords = columnar.chord || [];
+        const confidences = columnar.confidence || [];
+
+        return times.map((seconds, i) => ({
+            time: this.formatDuration(seconds),
+            chord: vocabulary[chords[i]],
+            confidence: confidences[i]
+        }));
+    }
+
     displayTimeline(timeline) {
         const container = document.getElementById('timeline');
         container.innerHTML = '';
@@ -322,6 +342,93 @@ class MusicAnalysisApp {
         }
     }
 
+    displayStructure(structure) {
+        const card = document.getElementById('structureCard');
+        const container = document.getElementById('structureSections');
+        container.innerHTML = '';
+
+        if (structure.length === 0) {
+            card.style.display = 'none';
+            return;
+        }
+
+        // Cada sección salta el reproductor a su inicio
+        structure.forEach(section => {
+            const sectionElement = document.createElement('button');
+            sectionElement.className = 'btn btn-outline structure-section';
+            sectionElement.textContent = `${section.section} (${section.label}) ${this.formatDuration(section.start)}`;
+            sectionElement.addEventListener('click', () => {
+                const audioPlayer = document.getElementById('audioPlayer');
+                audioPlayer.currentTime = section.start;
+                audioPlayer.play();
+            });
+            container.appendChild(sectionElement);
+        });
+
+        card.style.display = 'block';
+    }
+
+    async displayWaveform() {
+        // Picos precalculados en el análisis: solo se descarga el nivel que cabe en el canvas
+        const canvas = document.getElementById('waveformCanvas');
+        if (!canvas || !this.currentAnalysisId) return;
+
+        try {
+            const waveformUrl = `${this.apiBaseUrl}/audio/${this.currentAnalysisId}/waveform`;
+            const indexResponse = await fetch(waveformUrl);
+            if (!indexResponse.ok) return;
+            const index = await indexResponse.json();
+
+            // Nivel más grueso que aún da al menos un pico por píxel
+            const width = canvas.clientWidth || 800;
+            const samplesPerPixel = index.total_samples / width;
+            const levels = index.levels.slice().sort((a, b) => a.samples_per_pixel - b.samples_per_pixel);
+            let level = levels[0];
+            levels.forEach(candidate => {
+                if (candidate.samples_per_pixel <= samplesPerPixel) level = candidate;
+            });
+
+            const response = await fetch(`${waveformUrl}?level=${level.samples_per_pixel}`);
+            if (!response.ok) return;
+            const peaks = new Int8Array(await response.arrayBuffer());
+
+            document.getElementById('waveformCard').style.display = 'block';
+            this.drawWaveform(canvas, peaks, index.scale);
+        } catch (error) {
+            console.error('Error al cargar forma de onda:', error);
+        }
+    }
+
+    drawWaveform(canvas, peaks, scale) {
+        // peaks: bytes min, max, rms intercalados (int8, amplitud 1.0 = scale)
+        const width = canvas.width = canvas.clientWidth || 800;
+        const height = canvas.height;
+        const middle = height / 2;
+        const pixels = Math.floor(peaks.length / 3);
+        const ctx = canvas.getContext('2d');
+        const styles = getComputedStyle(document.documentElement);
+        const peakColor = styles.getPropertyValue('--primary-color').trim() || '#6366f1';
+        const rmsColor = styles.getPropertyValue('--primary-dark').trim() || '#4f46e5';
+
+        ctx.clearRect(0, 0, width, height);
+        for (let x = 0; x < width; x++) {
+            // Combinar los picos del nivel que caen en esta columna
+            const from = Math.floor(x * pixels / width);
+            const to = Math.max(from + 1, Math.floor((x + 1) * pixels / width));
+            let min = 0, max = 0, rms = 0;
+            for (let i = from; i < to && i < pixels; i++) {
+                min = Math.min(min, peaks[i * 3]);
+                max = Math.max(max, peaks[i * 3 + 1]);
+                rms = Math.max(rms, peaks[i * 3 + 2]);
+            }
+
+            ctx.fillStyle = peakColor;
+            ctx.fillRect(x, middle - (max / scale) * middle, 1, Math.max(1, ((max - min) / scale) * middle));
+            ctx.fillStyle = rmsColor;
+            ctx.fillRect(x, middle - (rms / scale) * middle, 1, (2 * rms / scale) * middle);
+        }
+    }
+
     displayNotes(notes) {
         const container = document.getElementById('notesList');
         container.innerHTML = '';
@@ -517,6 +624,8 @@ class MusicAnalysisApp {
                 lyricsCard.style.display = 'block';
                 const formattedLyrics = this.formatLyrics(identification.lyrics);
                 lyricsContent.innerHTML = `<pre>${formattedLyrics}</pre>`;
+            } else if (identification.lyrics_pending) {
+                this.loadDeferredLyrics(identification.title, identification.artist);
             }
 
             if (identification.music_links) {
@@ -544,6 +653,32 @@ class MusicAnalysisApp {
         }
     }
 
+    async loadDeferredLyrics(title, artist) {
+        // La identificación llega sin esperar a la letra: se pide aparte
+        try {
+            const params = new URLSearchParams({ title, artist });
+            const response = await fetch(`${this.apiBaseUrl}/lyrics?${params}`);
+            if (!response.ok) {
+                return;
+            }
+
+            const data = await response.json();
+
+            // Otra canción pudo identificarse mientras tanto
+            if (document.getElementById('songTitle').textContent !== title) {
+                return;
+            }
+
+            if (data.lyrics && data.lyrics.trim() !== '') {
+                document.getElementById('lyricsCard').style.display = 'block';
+                const formattedLyrics = this.formatLyrics(data.lyrics);
+                document.getElementById('lyricsContent').innerHTML = `<pre>${formattedLyrics}</pre>`;
+            }
+        } catch (error) {
+            console.error('Error al cargar letra:', error);
+        }
+    }
+
     showLoadingState(message = 'Procesando...') {
         const loadingState = document.getElementById('loadingState');
         const loadingText = loadingState.querySelector('p');
@@ -626,6 +761,86 @@ const app = new MusicAnalysisApp();
 // Variable global para timeline completo
 let fullTimelineData = [];
 
+// ANÁLISIS EN TIEMPO REAL DURANTE LA GRABACIÓN
+
+// Muestras por bloque enviado al servidor (~85 ms a 48 kHz)
+const LIVE_BLOCK_SIZE = 4096;
+
+// Módulo del AudioWorklet que corta el micrófono en bloques
+const LIVE_CAPTURE_WORKLET = 'js/live-capture-worklet.js';
+
+async function startLiveAnalysis(stream) {
+    const display = document.getElementById('liveAnalysis');
+    let socket;
+    try {
+        socket = new WebSocket(app.liveSocketUrl);
+    } catch (error) {
+        console.log('Análisis en tiempo real no disponible:', error.message);
+        return null;
+    }
+    socket.binaryType = 'arraybuffer';
+
+    const audioContext = new (window.AudioContext || window.webkitAudioContext)();
+    try {
+        await audioContext.audioWorklet.addModule(LIVE_CAPTURE_WORKLET);
+    } catch (error) {
+        console.log('Análisis en tiempo real no disponible:', error.message);
+        audioContext.close();
+        socket.close();
+        return null;
+    }
+    const source = audioContext.createMediaStreamSource(stream);
+    const capture = new AudioWorkletNode(audioContext, 'live-capture', {
+        numberOfInputs: 1,
+        channelCount: 1,
+        processorOptions: { blockSize: LIVE_BLOCK_SIZE }
+    });
+
+    socket.onopen = () => {
+        socket.send(JSON.stringify({ type: 'start', sample_rate: audioContext.sampleRate }));
+        display.style.display = 'flex';
+    };
+
+    socket.onmessage = (event) => {
+        const data = JSON.parse(event.data);
+        if (data.type !== 'update') return;
+        document.getElementById('liveChord').textContent = data.chord || '-';
+        document.getElementById('liveKey').textContent = data.key || '-';
+        document.getElementById('liveBpm').textContent = data.bpm ? Math.round(data.bpm) : '-';
+    };
+
+    socket.onerror = () => {
+        console.log('Servidor de análisis en tiempo real no disponible');
+    };
+
+    // Enviar PCM float32 mono tal cual lo entrega el worklet, fuera del hilo de audio
+    capture.port.onmessage = (event) => {
+        if (socket.readyState === WebSocket.OPEN) {
+            socket.send(event.data);
+        }
+    };
+    // La salida (silencio) va al destino para que el grafo procese el nodo
+    source.connect(capture);
+    capture.connect(audioContext.destination);
+
+    return { socket, audioContext, source, capture };
+}
+
+function stopLiveAnalysis() {
+    const session = app.liveSession;
+    app.liveSession = null;
+    document.getElementById('liveAnalysis').style.display = 'none';
+    if (!session) return;
+
+    session.capture.port.onmessage = null;
+    session.capture.disconnect();
+    session.source.disconnect();
+    session.audioContext.close();
+    if (session.socket.readyState <= WebSocket.OPEN) {
+        session.socket.close();
+    }
+}
+
 // FUNCIONES GLOBALES PARA EVENTOS DEL HTML
 
 async function startRecording() {
@@ -650,18 +865,9 @@ async function startRecording() {
 
             // HACER EXACTAMENTE LO MISMO QUE CON UN ARCHIVO SUBIDO
             try {
-                // Primero hacer análisis musical completo (igual que archivo subido)
+                // Análisis musical completo; la identificación llega en el mismo resultado
                 await app.analyzeAudio(audioFile);
 
-                // Luego intentar identificar la canción
-                setTimeout(async () => {
-                    try {
-                        await identifySongFromFile(audioFile);
-                    } catch (error) {
-                        console.log('No se pudo identificar la canción grabada:', error.message);
-                    }
-                }, 2000);
-
             } catch (error) {
                 console.error('Error en análisis de grabación:', error);
                 app.showErrorState(`Error al analizar grabación: ${error.message}`);
@@ -672,6 +878,11 @@ async function startRecording() {
         };
 
         app.mediaRecorder.start();
+        startLiveAnalysis(stream).then((session) => {
+            app.liveSession = session;
+            // Se soltó el botón mientras cargaba el worklet
+            if (!app.isRecording) stopLiveAnalysis();
+        });
 
         document.getElementById('recordText').textContent = 'Grabando... Suelta para parar';
         document.getElementById('recordingTimer').style.display = 'block';
@@ -696,6 +907,7 @@ function stopRecording() {
 
     app.mediaRecorder.stop();
     app.isRecording = false;
+    stopLiveAnalysis();
 
     if (app.recordingTimer) {
         clearInterval(app.recordingTimer);
@@ -0,0 +1,37 @@
+/**
+ * Captura del micrófono para el análisis en tiempo real (AudioWorklet)
+ * Junta los cuantos de 128 muestras del hilo de audio en bloques de
+ * blockSize muestras y los pasa al hilo principal (PCM float32 mono)
+ */
+
+class LiveCaptureProcessor extends AudioWorkletProcessor {
+    constructor(options) {
+        super();
+        this.blockSize = options.processorOptions.blockSize;
+        this.block = new Float32Array(this.blockSize);
+        this.filled = 0;
+    }
+
+    process(inputs) {
+        const samples = inputs[0][0];
+        if (!samples) return true;  // Entrada aún sin conectar
+
+        let offset = 0;
+        while (offset < samples.length) {
+            const count = Math.min(samples.length - offset, this.blockSize - this.filled);
+            this.block.set(samples.subarray(offset, offset + count), this.filled);
+            this.filled += count;
+            offset += count;
+
+            if (this.filled === this.blockSize) {
+                // Se transfiere el buffer: el hilo de audio no copia ni espera
+                this.port.postMessage(this.block.buffer, [this.block.buffer]);
+                this.block = new Float32Array(this.blockSize);
+                this.filled = 0;
+            }
+        }
+        return true;
+    }
+}
+
+registerProcessor('live-capture', LiveCaptureProcessor);
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ESTIMACIÓN ADAPTATIVA DE TONALIDAD Y TEMPO
+Procesa el audio en incrementos crecientes y se detiene en cuanto la
+tonalidad (con margen suficiente) y el BPM se mantienen estables durante
+varios incrementos seguidos: la respuesta rápida sin recorrer toda la canción
+"""
+
+import sys
+import json
+import librosa
+import numpy as np
+
+from ffmpeg_decoder import stream_audio_blocks
+from analyze_audio_ultimate import estimate_key, combine_tempo_estimates, classify_tempo
+
+# Duración de cada incremento (segundos)
+DEFAULT_INCREMENT = 5.0
+
+# Incrementos consecutivos con la misma estimación para darla por buena
+DEFAULT_STABLE_INCREMENTS = 3
+
+# Margen mínimo entre la mejor tonalidad y la segunda
+DEFAULT_MIN_KEY_MARGIN = 0.10
+
+# Variación relativa de BPM tolerada entre incrementos
+DEFAULT_TEMPO_TOLERANCE = 0.02
+
+# Audio mínimo antes de aceptar una parada (segundos): las introducciones
+# suelen quedarse en una tonalidad vecina de la canción
+DEFAULT_MIN_DURATION = 30.0
+
+# Bloques por debajo de este nivel no aportan al chroma (silencio)
+SILENCE_FLOOR_DB = -60.0
+
+HOP_LENGTH = 512
+N_FFT = 2048
+
+# Frames del principio de cada tramo que dependen de muestras ya descartadas
+# (ventana del frame anterior + desfase de centrado de onset_strength)
+ENVELOPE_WARMUP_FRAMES = 1 + N_FFT // HOP_LENGTH
+
+
+def onset_envelope(y, sr):
+    """
+    Envolvente de onsets (mediana sobre bandas mel) sin el recorte top_db
+    relativo al máximo del tramo, para que no dependa de dónde empieza
+    """
+    S = librosa.power_to_db(
+        librosa.feature.melspectrogram(y=y, sr=sr, n_fft=N_FFT, hop_length=HOP_LENGTH),
+        top_db=None
+    )
+    return librosa.onset.onset_strength(S=S, sr=sr, n_fft=N_FFT, hop_length=HOP_LENGTH, aggregate=np.median)
+
+
+class OnsetEnvelopeStream:
+    """
+    Envolvente de onsets calculada por bloques. Cada frame solo depende de las
+    muestras anteriores a su posición, así que basta conservar la cola que
+    cubre ENVELOPE_WARMUP_FRAMES: la concatenación de lo que devuelve push es
+    igual a onset_envelope del archivo entero.
+    """
+
+    def __init__(self, sr):
+        self.sr = sr
+        self.tail = np.zeros(0, dtype=np.float32)
+        self.tail_start = 0  # primer frame cubierto por la cola
+        self.emitted = 0
+
+    def push(self, block):
+        """Añadir muestras; devuelve los frames nuevos de la envolvente"""
+        self.tail = np.concatenate([self.tail, np.asarray(block, dtype=np.float32)])
+        envelope = onset_envelope(self.tail, self.sr)
+        new = envelope[self.emitted - self.tail_start:]
+        self.emitted += len(new)
+
+        keep_from = max(self.tail_start, self.emitted - ENVELOPE_WARMUP_FRAMES)
+        self.tail = self.tail[(keep_from - self.tail_start) * HOP_LENGTH:]
+        self.tail_start = keep_from
+        return new
+
+
+def estimate_key_tempo_adaptive(file_path, sr=22050, increment=DEFAULT_INCREMENT,
+                                stable_increments=DEFAULT_STABLE_INCREMENTS,
+                                min_key_margin=DEFAULT_MIN_KEY_MARGIN,
+                                tempo_tolerance=DEFAULT_TEMPO_TOLERANCE,
+                                min_duration=DEFAULT_MIN_DURATION,
+                                max_duration=None):
+    """
+    Tonalidad y BPM con parada temprana.
+    Cada incremento solo procesa sus muestras nuevas: el chroma se acumula
+    como suma y la envolvente de onsets se extiende sin recalcular lo anterior.
+    """
+    try:
+        # Bloques múltiplos del hop: los frames de chroma no se desplazan entre bloques
+        block_size = max(1, round(increment * sr / HOP_LENGTH)) * HOP_LENGTH
+        sr, blocks = stream_audio_blocks(file_path, sr=sr, block_size=block_size)
+
+        chroma_sum = np.zeros(12)
+        chroma_frames = 0
+        envelope_stream = OnsetEnvelopeStream(sr)
+        envelopes = []
+        consumed = 0
+
+        key_analysis = {'key': 'Unknown', 'confidence': 0.0, 'margin': 0.0}
+        bpm = None
+        key_streak = 0
+        tempo_streak = 0
+        increments = 0
+        converged = False
+
+        for block in blocks:
+            block = np.asarray(block, dtype=np.float32)
+            consumed += len(block)
+            increments += 1
+
+            # Chroma del bloque (se omiten los bloques silenciosos)
+            rms_db = 10.0 * np.log10(max(float(np.mean(block ** 2)), 1e-12))
+            if rms_db > SILENCE_FLOOR_DB and len(block) >= N_FFT:
+                chroma = librosa.feature.chroma_stft(y=block, sr=sr, hop_length=HOP_LENGTH, n_fft=N_FFT)
+                chroma_sum += chroma.sum(axis=1)
+                chroma_frames += chroma.shape[1]
+
+            envelopes.append(envelope_stream.push(block))
+
+            if chroma_frames == 0:
+                continue
+
+            # Tonalidad acumulada
+            previous_key = key_analysis['key']
+            key_analysis = estimate_key(chroma_sum / chroma_frames)
+            if key_analysis['key'] == previous_key and key_analysis.get('margin', 0.0) >= min_key_margin:
+                key_streak += 1
+            else:
+                key_streak = 0
+
+            # Tempo acumulado sobre la envolvente completa (autocorrelación barata)
+            envelope = np.concatenate(envelopes)
+            tempo1 = float(librosa.feature.tempo(onset_envelope=envelope, sr=sr, hop_length=HOP_LENGTH)[0])
+            onset_frames = librosa.onset.onset_detect(onset_envelope=envelope, sr=sr, hop_length=HOP_LENGTH)
+            onset_times = librosa.frames_to_time(onset_frames, sr=sr, hop_length=HOP_LENGTH)
+            new_bpm = combine_tempo_estimates(tempo1, onset_times)
+
+            if bpm is not None and abs(new_bpm - bpm) <= tempo_tolerance * bpm:
+                tempo_streak += 1
+            else:
+                tempo_streak = 0
+            bpm = new_bpm
+
+            print(f"Incremento {increments}: {key_analysis['key']} ({key_analysis.get('margin', 0.0):.3f}), "
+                  f"{bpm:.1f} BPM", file=sys.stderr)
+
+            if (key_streak >= stable_increments and tempo_streak >= stable_increments
+                    and consumed >= min_duration * sr):
+                converged = True
+                break
+
+            if max_duration is not None and consumed >= max_duration * sr:
+                break
+
+        # Cerrar el generador detiene la decodificación del resto del archivo
+        if hasattr(blocks, 'close'):
+            blocks.close()
+
+        if bpm is None:
+            bpm = 120.0
+
+        return {
+            'success': True,
+            'key': key_analysis['key'],
+            'key_confidence': key_analysis.get('confidence', 0.0),
+            'key_margin': key_analysis.get('margin', 0.0),
+            'bpm': bpm,
+            'tempo_classification': classify_tempo(bpm),
+            'converged': converged,
+            'increments': increments,
+            'audio_consumed': consumed / sr,
+            'analysis_method': 'adaptive_v1'
+        }
+
+    except Exception as e:
+        print(f"Error en estimacion adaptativa: {e}", file=sys.stderr)
+        return {
+            'success': False,
+            'error': str(e),
+            'analysis_method': 'adaptive_v1'
+        }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Uso: python adaptive_estimation.py <archivo_audio> [incrementos_estables]")
+        sys.exit(1)
+
+    result = estimate_key_tempo_adaptive(
+        sys.argv[1],
+        stable_increments=int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_STABLE_INCREMENTS
+    )
+    print(json.dumps(result, ensure_ascii=False))
@@ -8,6 +8,7 @@ import librosa
 import numpy as np
 from scipy import signal
 import json
+from ffmpeg_decoder import load_audio
 
 class AdvancedChordDetector:
     def __init__(self):
@@ -179,7 +180,7 @@ def analyze_with_advanced_detection(audio_path):
         detector = AdvancedChordDetector()
         
         # Cargar audio
-        y, sr = librosa.load(audio_path, sr=22050)
+        y, sr = load_audio(audio_path, sr=22050)
         duration = len(y) / sr
         
         print(f"Analizando archivo: {audio_path}")
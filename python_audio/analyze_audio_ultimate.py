@@ -7,11 +7,22 @@ Análisis musical avanzado con múltiples algoritmos y técnicas de IA
 
 import librosa
 import numpy as np
-import json
 import sys
 import os
 from scipy import signal
 from scipy.stats import mode
+from ffmpeg_decoder import load_audio
+from silence_detection import detect_activity, ActivityMap
+from feature_store import FeatureStore, file_hash
+from beat_sync import beat_boundaries, sync_features, score_templates
+from waveform_peaks import compute_peak_pyramid, write_peaks
+from spectral_tiles import TileStore, write_tiles, log_spectrogram, quantize, VALUE_RANGES, N_MELS
+from structure_segmentation import segment_structure
+from tempo_map import rhythm_envelopes, analyze_rhythm, tempo_curve, beat_grid
+from result_format import (
+    encode_timeline_columnar, legacy_timeline, serialize_result,
+    PROGRESSION_PREVIEW_CHORDS, SUPPORTED_FORMATS
+)
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -29,71 +40,194 @@ if hasattr(sys.stdout, 'reconfigure'):
     except:
         pass
 
-def analyze_audio_complete(file_path):
+# Plantillas de acordes básicos (progresión)
+CHORD_TEMPLATES = {
+    'C': [1, 0, 0, 0, 1, 0, 0, 1, 0, 0, 0, 0],
+    'Dm': [0, 0, 1, 0, 0, 1, 0, 0, 0, 1, 0, 0],
+    'Em': [0, 0, 0, 0, 1, 0, 0, 1, 0, 0, 0, 1],
+    'F': [1, 0, 0, 0, 0, 1, 0, 0, 0, 1, 0, 0],
+    'G': [0, 0, 1, 0, 0, 0, 0, 1, 0, 0, 0, 1],
+    'Am': [1, 0, 0, 1, 0, 0, 0, 0, 1, 0, 0, 0],
+    'Bdim': [0, 0, 1, 0, 0, 1, 0, 0, 0, 0, 0, 1]
+}
+
+# Plantillas del timeline (sin disminuido)
+TIMELINE_CHORD_TEMPLATES = {
+    name: template for name, template in CHORD_TEMPLATES.items() if name != 'Bdim'
+}
+
+# Pulsos por segmento en el modo sincronizado
+SYNC_BEATS_PER_SEGMENT = {
+    'beat': 1,
+    'bar': 4
+}
+
+# Salto de la STFT de la etapa de estructura (las secciones duran segundos)
+STRUCTURE_HOP_LENGTH = 2048
+
+# Parámetros de extracción: forman parte de la clave del almacén de características
+FEATURE_PARAMS = {
+    'hop_length': 512,
+    'skip_silence': True
+}
+
+# Bloques fijos (segundos) cuyo chroma medio se guarda con las características:
+# los del timeline y la progresión del análisis en serie
+SEGMENT_CHROMA_DURATIONS = (4, 2)
+
+# Parámetros de la lógica de decisión: cambiarlos no requiere repetir el DSP
+DEFAULT_DECISION_PARAMS = {
+    'chord_threshold': 0.3,
+    'segment_duration': 4,
+    'progression_segment_duration': 2,
+    'sync': None
+}
+
+def analyze_audio_complete(file_path, skip_silence=True, sync=None, store=None, decision_params=None,
+                           peaks_dir=None, tiles_dir=None, audio=None, identify=False,
+                           return_features=False):
     """
-    Análisis completo de audio con múltiples técnicas
+    Análisis completo de audio con múltiples técnicas.
+    Con skip_silence, las regiones silenciosas no pasan por las etapas pesadas
+    y aparecen en el timeline como 'N' (sin acorde).
+    Con sync='beat' o 'bar', los acordes se calculan por pulso o por compás
+    sobre la rejilla de la etapa de tempo en lugar de bloques fijos.
+    Con un FeatureStore (o parámetros de decisión propios) el análisis pasa por
+    características por frame reutilizables; ver analyze_with_features.
+    Con peaks_dir se escribe además la pirámide de picos de forma de onda, y
+    con tiles_dir las teselas de chroma y espectrograma para las vistas con zoom.
+    Con audio=(y, sr) ya decodificado (p. ej. desde memoria compartida) no se
+    vuelve a decodificar el archivo.
+    Con identify, la identificación de la canción sale de la misma decodificación
+    (ver analyze_and_identify) y el análisis no cambia.
+    Con return_features devuelve (resultado, características): el chroma, los
+    MFCC y la envolvente de tempo ya calculados (ver identification_features),
+    o None si no los hay.
     """
+    if store is not None or decision_params is not None:
+        decision_params = {'sync': sync, **(decision_params or {})}
+        return analyze_with_features(file_path, store, decision_params, skip_silence,
+                                     peaks_dir, tiles_dir, audio, identify)
+    if identify:
+        return analyze_and_identify(file_path, skip_silence, sync, peaks_dir, tiles_dir, audio)
+    
     try:
         # Enviar mensajes de debug a stderr para no interferir con JSON
         print(f"Iniciando analisis completo de: {file_path}", file=sys.stderr)
+        features = None
         
-        # Cargar audio
-        y, sr = librosa.load(file_path, sr=None)
+        # Cargar audio (ffmpeg decodifica formatos comprimidos en una pasada)
+        y, sr = audio if audio is not None else load_audio(file_path, sr=None)
         duration = len(y) / sr
         
         print(f"Audio cargado: {duration:.2f}s, {sr}Hz", file=sys.stderr)
         
+        # Picos de forma de onda: subproducto de la decodificación
+        if peaks_dir:
+            write_peaks(peaks_dir, compute_peak_pyramid(y), sr, len(y))
+        
+        tiles = TileStore(tiles_dir) if tiles_dir else None
+        
+        # Pre-análisis de energía: regiones que no merecen análisis
+        activity = detect_activity(y, sr) if skip_silence else None
+        if activity is not None and not activity.has_activity:
+            # Todo silencio: no hay tonalidad, tempo ni acordes que buscar
+            print("Audio sin actividad: se omite el analisis", file=sys.stderr)
+            if tiles is not None:
+                write_tiles(tiles, 'chroma', np.zeros((12, 1 + len(y) // 512), dtype=np.float32), sr, 512)
+                write_tiles(tiles, 'spectrogram', silent_spectrogram(len(y), 512), sr, 512)
+            result = silent_result(len(y), sr, activity)
+            return (result, features) if return_features else result
+        if activity is not None:
+            y_active = activity.active_audio(y)
+            print(f"Audio activo: {activity.active_ratio * 100:.1f}%", file=sys.stderr)
+        else:
+            y_active = y
+        
         # Análisis básico
-        basic_analysis = analyze_basic_features(y, sr)
+        basic_analysis = analyze_basic_features(y_active, sr)
         
         # Análisis de tonalidad
-        key_analysis = analyze_key_advanced(y, sr)
+        key_analysis = analyze_key_advanced(y_active, sr)
         
-        # Análisis de acordes
-        chord_analysis = analyze_chords_advanced(y, sr)
+        # Análisis de tempo (su rejilla de pulsos alimenta el modo sincronizado)
+        tempo_analysis = analyze_tempo_advanced(y_active, sr, activity)
         
-        # Análisis de tempo
-        tempo_analysis = analyze_tempo_advanced(y, sr)
+        # Análisis de acordes y timeline
+        if sync in SYNC_BEATS_PER_SEGMENT and len(tempo_analysis['beat_frames']) > 1:
+            chord_analysis = analyze_chords_beat_sync(
+                y_active, sr, tempo_analysis['beat_frames'], activity,
+                beats_per_segment=SYNC_BEATS_PER_SEGMENT[sync],
+                phase=tempo_analysis['downbeat_phase'], tiles=tiles
+            )
+            timeline = chord_analysis['timeline']
+        else:
+            sync = None
+            chord_analysis = analyze_chords_advanced(y, sr, activity, tiles)
+            timeline = create_chord_timeline(y, sr, activity)
         
-        # Timeline de acordes
-        timeline = create_chord_timeline(y, sr)
+        if tiles is not None:
+            write_tiles(tiles, 'spectrogram', log_spectrogram(y, sr), sr, 512)
         
         # Notas principales
-        notes = extract_main_notes(y, sr)
-        
-        # Clasificación de tempo
-        bpm_value = tempo_analysis['bpm']
-        if bpm_value < 80:
-            tempo_class = "Lento"
-        elif bpm_value < 120:
-            tempo_class = "Moderado"
-        elif bpm_value < 160:
-            tempo_class = "Rápido"
-        else:
-            tempo_class = "Muy Rápido"
+        notes = extract_main_notes(y_active, sr)
+        
+        # Estructura (secciones repetidas) sobre la rejilla de pulsos
+        structure = analyze_structure(y_active, sr, tempo_analysis['beat_frames'], activity)
         
         # Combinar resultados
-        result = {
-            'success': True,
-            'duration': duration,
-            'sample_rate': sr,
-            'key': key_analysis['key'],
-            'key_confidence': key_analysis['confidence'],
-            'bpm': tempo_analysis['bpm'],
-            'tempo_confidence': tempo_analysis['confidence'],
-            'tempo_classification': tempo_class,
-            'progression': chord_analysis['progression'],
-            'timeline': timeline,
-            'notes': notes,
-            'chord_count': len(chord_analysis['detected_chords']),
-            'average_chord_confidence': calculate_avg_confidence(timeline),
-            'basic_features': basic_analysis,
-            'analysis_method': 'ultimate_v2'
-        }
+        result = build_result(
+            duration, sr, key_analysis, tempo_analysis, chord_analysis,
+            timeline, notes, basic_analysis, activity, sync, structure
+        )
+        if return_features:
+            features = identification_features(key_analysis, tempo_analysis, sr, activity)
         
         print(f"Analisis completado exitosamente", file=sys.stderr)
-        return result
+        return (result, features) if return_features else result
         
+    except Exception as e:
+        print(f"Error en analisis: {e}", file=sys.stderr)
+        result = {
+            'success': False,
+            'error': str(e),
+            'analysis_method': 'ultimate_v2'
+        }
+        return (result, None) if return_features else result
+
+def identification_features(key_analysis, tempo_analysis, sr, activity=None, hop_length=512):
+    """
+    Características por frame del análisis en serie con el formato de
+    extract_frame_features que usa la identificación local: chroma de la etapa
+    de tonalidad, envolvente de onsets y MFCC del espectrograma mel de la
+    etapa de tempo. None si alguna de las dos etapas falló.
+    """
+    if 'chroma' not in key_analysis or 'mel_db' not in tempo_analysis:
+        return None
+    chroma = key_analysis['chroma']
+    frame_positions = np.arange(chroma.shape[1]) * hop_length
+    if activity is not None:
+        frame_positions = activity.to_original(frame_positions)
+    return {
+        'sr': int(sr),
+        'hop_length': hop_length,
+        'chroma': chroma,
+        'mfcc': librosa.feature.mfcc(S=tempo_analysis['mel_db'], sr=sr, n_mfcc=13),
+        'onset_envelope': tempo_analysis['onset_envelope'],
+        'frame_positions': frame_positions
+    }
+
+def analyze_and_identify(file_path, skip_silence=True, sync=None, peaks_dir=None,
+                         tiles_dir=None, audio=None):
+    """
+    Análisis en serie e identificación de la canción con una sola decodificación.
+    El audio se decodifica a su frecuencia original, como sin identificación:
+    el documento es el mismo de analyze_audio_complete más 'song_identification'.
+    La identificación local reutiliza el chroma, los MFCC y el tempo del análisis.
+    """
+    try:
+        if audio is None:
+            audio = load_audio(file_path, sr=None)
     except Exception as e:
         print(f"Error en analisis: {e}", file=sys.stderr)
         return {
@@ -101,38 +235,393 @@ def analyze_audio_complete(file_path):
             'error': str(e),
             'analysis_method': 'ultimate_v2'
         }
+    
+    result, features = analyze_audio_complete(file_path, skip_silence, sync, peaks_dir=peaks_dir,
+                                              tiles_dir=tiles_dir, audio=audio, return_features=True)
+    if result['success']:
+        result['song_identification'] = identify_song(file_path, audio, features)
+    return result
 
-def analyze_basic_features(y, sr):
-    """Análisis de características básicas"""
+def identify_song(file_path, audio=None, features=None):
+    """Identificación de la canción reutilizando el audio y las características del análisis"""
+    from contextlib import redirect_stdout
+    from shazam_integration import identify_and_enrich_song
+    # La identificación imprime en stdout, reservado para el JSON del resultado
+    with redirect_stdout(sys.stderr):
+        return identify_and_enrich_song(file_path, audio, features)
+
+def analyze_with_features(file_path, store=None, decision_params=None, skip_silence=True,
+                          peaks_dir=None, tiles_dir=None, audio=None, identify=False):
+    """
+    Análisis a partir de características por frame.
+    Si el almacén ya tiene las características de este archivo (mismo contenido
+    y parámetros de extracción) no se decodifica ni se calcula ninguna STFT.
+    Con identify el resultado incluye 'song_identification' y la identificación
+    reutiliza tempo, chroma y MFCC de las características.
+    """
     try:
-        # Características espectrales
-        spectral_centroids = librosa.feature.spectral_centroid(y=y, sr=sr)[0]
-        spectral_rolloff = librosa.feature.spectral_rolloff(y=y, sr=sr)[0]
-        spectral_bandwidth = librosa.feature.spectral_bandwidth(y=y, sr=sr)[0]
+        print(f"Iniciando analisis por caracteristicas de: {file_path}", file=sys.stderr)
         
-        # Zero crossing rate
-        zcr = librosa.feature.zero_crossing_rate(y)[0]
+        params = {**FEATURE_PARAMS, 'skip_silence': skip_silence}
+        content_hash = file_hash(file_path) if store is not None else None
+        features = store.load(file_path, params, content_hash) if store is not None else None
         
-        # MFCC
-        mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
+        if features is None:
+            if audio is None:
+                audio = load_audio(file_path, sr=None)
+            y, sr = audio
+            print(f"Audio cargado: {len(y) / sr:.2f}s, {sr}Hz", file=sys.stderr)
+            features = extract_frame_features(y, sr, skip_silence, params['hop_length'])
+            if store is not None:
+                store.save(file_path, params, features, content_hash)
+        else:
+            print("Caracteristicas cargadas del almacen", file=sys.stderr)
+        
+        if peaks_dir and 'waveform' in features:
+            pyramid = {int(level): peaks for level, peaks in features['waveform'].items()}
+            write_peaks(peaks_dir, pyramid, features['sr'], features['total_samples'])
+        elif peaks_dir:
+            print("La entrada del almacen no tiene picos de forma de onda", file=sys.stderr)
+        
+        if tiles_dir:
+            tiles = TileStore(tiles_dir)
+            chroma = full_timeline_frames(
+                features['chroma'], features['frame_positions'], features['total_samples'], features['hop_length']
+            )
+            write_tiles(tiles, 'chroma', chroma, features['sr'], features['hop_length'])
+            if 'log_spectrogram' in features:
+                write_tiles(tiles, 'spectrogram', features['log_spectrogram'],
+                            features['sr'], features['hop_length'])
         
+        result = analyze_from_features(features, decision_params)
+        
+        if identify:
+            result['song_identification'] = identify_song(file_path, audio, features)
+        
+        print("Analisis completado exitosamente", file=sys.stderr)
+        return result
+        
+    except Exception as e:
+        print(f"Error en analisis: {e}", file=sys.stderr)
+        return {
+            'success': False,
+            'error': str(e),
+            'analysis_method': 'ultimate_v2_features'
+        }
+
+def extract_frame_features(y, sr, skip_silence=True, hop_length=512):
+    """
+    Características que necesita toda la lógica de decisión: las mismas que
+    usa el análisis en serie, así analyze_from_features da su mismo resultado.
+    Como en el análisis en serie, chroma, envolventes, pulsos y tempo se calculan
+    solo sobre el audio activo; frame_positions y beat_positions guardan su
+    posición en muestras de la línea de tiempo original (onset_frames sigue en
+    la del audio activo, como los onsets del análisis en serie).
+    """
+    activity = detect_activity(y, sr) if skip_silence else None
+    if activity is not None and not activity.has_activity:
+        # Todo silencio: solo lo que necesitan las teselas y los picos (ver silent_result)
         return {
-            'spectral_centroid_mean': float(np.mean(spectral_centroids)),
-            'spectral_rolloff_mean': float(np.mean(spectral_rolloff)),
-            'spectral_bandwidth_mean': float(np.mean(spectral_bandwidth)),
-            'zero_crossing_rate_mean': float(np.mean(zcr)),
-            'mfcc_mean': [float(np.mean(mfcc)) for mfcc in mfccs]
+            'sr': int(sr),
+            'total_samples': int(len(y)),
+            'hop_length': hop_length,
+            'all_silent': True,
+            'chroma': np.zeros((12, 0), dtype=np.float32),
+            'frame_positions': np.zeros(0, dtype=np.int64),
+            'activity_regions': np.zeros((0, 2), dtype=np.int64),
+            'waveform': {str(level): peaks for level, peaks in compute_peak_pyramid(y).items()},
+            'log_spectrogram': silent_spectrogram(len(y), hop_length)
         }
+    if activity is not None:
+        y_active = activity.active_audio(y)
+        to_original = activity.to_original
+    else:
+        y_active = y
+        to_original = lambda positions: np.asarray(positions, dtype=np.int64)
+    
+    chroma = librosa.feature.chroma_stft(y=y_active, sr=sr, hop_length=hop_length)
+    
+    # Un solo espectrograma mel para envolventes, tempograma, MFCC y teselas
+    envelopes = rhythm_envelopes(y_active, sr, hop_length)
+    mel_db = envelopes['mel_db']
+    rhythm = analyze_rhythm(envelopes['onset_envelope'], sr, hop_length, envelopes['bass_envelope'])
+    mfcc = librosa.feature.mfcc(S=mel_db, sr=sr, n_mfcc=13)
+    basic_sums, basic_counts = basic_feature_sums(y_active, sr)
+    frame_positions = to_original(np.arange(chroma.shape[1]) * hop_length)
+    
+    # Lo que el análisis en serie calcula con su propia STFT: chroma medio de
+    # los bloques fijos (timeline y progresión) y la rejilla de estructura
+    segment_chroma = {
+        f"{duration:g}": segment_chroma_means(y, sr, duration, activity)
+        for duration in SEGMENT_CHROMA_DURATIONS
+    }
+    structure, structure_energy = structure_features(y_active, sr)
+    
+    return {
+        'sr': int(sr),
+        'total_samples': int(len(y)),
+        'hop_length': hop_length,
+        'chroma': chroma.astype(np.float32),
+        'mfcc': mfcc.astype(np.float32),
+        'frame_positions': frame_positions,
+        'onset_envelope': envelopes['onset_envelope'].astype(np.float32),
+        'beat_positions': to_original(librosa.frames_to_samples(rhythm['beat_frames'], hop_length=hop_length)),
+        'onset_frames': np.asarray(envelopes['onset_frames'], dtype=np.int64),
+        'tempo': rhythm['tempo'],
+        'local_tempo': rhythm['local_tempo'],
+        'downbeat_phase': rhythm['downbeat_phase'],
+        'activity_regions': activity.regions if activity is not None else np.zeros((0, 2), dtype=np.int64),
+        'basic_sums': basic_sums,
+        'basic_counts': basic_counts,
+        'segment_chroma': segment_chroma,
+        'structure_features': structure,
+        'structure_energy': structure_energy,
+        'structure_positions': to_original(np.arange(structure.shape[1]) * STRUCTURE_HOP_LENGTH),
+        'waveform': {str(level): peaks for level, peaks in compute_peak_pyramid(y).items()},
+        # Espectrograma para las teselas (dB relativo al máximo) en la línea de
+        # tiempo completa, ya cuantizado (uint8) para no inflar el almacén
+        'log_spectrogram': full_timeline_frames(
+            quantize(mel_db - mel_db.max(), VALUE_RANGES['spectrogram']),
+            frame_positions, len(y), hop_length
+        )
+    }
+
+def silent_spectrogram(total_samples, hop_length=512):
+    """
+    Espectrograma de las teselas de un archivo sin actividad, ya cuantizado:
+    todo en el suelo del rango (en dB relativo al máximo, el silencio saldría a 0 dB)
+    """
+    return np.zeros((N_MELS, 1 + total_samples // hop_length), dtype=np.uint8)
+
+def full_timeline_frames(values, frame_positions, total_samples, hop_length, fill=0):
+    """
+    Repartir columnas calculadas sobre el audio activo en la rejilla de frames
+    del archivo completo (las teselas muestran el archivo entero); los frames
+    de silencio quedan con fill.
+    """
+    full = np.full((values.shape[0], 1 + total_samples // hop_length), fill, dtype=values.dtype)
+    columns = np.minimum(np.asarray(frame_positions) // hop_length, full.shape[1] - 1)
+    full[:, columns] = values[:, :len(columns)]
+    return full
+
+def analyze_from_features(features, decision_params=None):
+    """Lógica de decisión (tonalidad, tempo, acordes) sobre características ya calculadas"""
+    params = {**DEFAULT_DECISION_PARAMS, **(decision_params or {})}
+    sr = features['sr']
+    total_samples = features['total_samples']
+    hop_length = features['hop_length']
+    
+    regions = features['activity_regions']
+    if features.get('all_silent'):
+        return silent_result(total_samples, sr, ActivityMap(regions, sr, total_samples),
+                             params['segment_duration'], analysis_method='ultimate_v2_features')
+    activity = ActivityMap(regions, sr, total_samples) if len(regions) else None
+    
+    # Frames del audio activo, con su posición en la línea de tiempo original
+    chroma = features['chroma']
+    frame_positions = features['frame_positions']
+    
+    # Tonalidad y notas (solo hay frames activos)
+    chroma_mean = np.mean(chroma, axis=1)
+    key_analysis = estimate_key(chroma_mean)
+    notes = main_notes_from_chroma(chroma_mean)
+    
+    # Tempo, rejilla de pulsos y curva de tempo
+    onset_times = librosa.frames_to_time(features['onset_frames'], sr=sr, hop_length=hop_length)
+    beat_positions = features['beat_positions']
+    local_tempo = features['local_tempo']
+    tempo_analysis = {
+        'bpm': combine_tempo_estimates(features['tempo'], onset_times),
+        'confidence': 0.8,
+        'beat_grid': beat_grid(beat_positions, int(features['downbeat_phase']), sr),
+        'tempo_curve': tempo_curve(frame_positions[:len(local_tempo)], local_tempo, sr, total_samples)
+    }
+    
+    # Acordes y timeline
+    sync = params['sync']
+    if sync in SYNC_BEATS_PER_SEGMENT and len(beat_positions) > 1:
+        chord_analysis = chords_from_synced_chroma(
+            chroma, frame_positions, beat_positions, total_samples, sr, activity,
+            SYNC_BEATS_PER_SEGMENT[sync], chord_threshold=params['chord_threshold'],
+            phase=int(features['downbeat_phase'])
+        )
+        timeline = chord_analysis['timeline']
+    else:
+        sync = None
+        # Bloques de la duración del análisis en serie: el chroma medio de cada
+        # bloque está guardado; con otras duraciones se promedia el chroma por frame
+        segment_chroma = features['segment_chroma']
+        timeline_key = f"{params['segment_duration']:g}"
+        if timeline_key in segment_chroma:
+            timeline = timeline_from_segment_chroma(
+                segment_chroma[timeline_key], total_samples, sr, params['segment_duration'], activity
+            )
+        else:
+            timeline = chords_from_frame_chroma(
+                chroma, frame_positions, total_samples, sr,
+                params['segment_duration'], TIMELINE_CHORD_TEMPLATES, activity
+            )
+        progression_key = f"{params['progression_segment_duration']:g}"
+        if progression_key in segment_chroma:
+            detected_chords = chords_from_segment_chroma(
+                segment_chroma[progression_key], total_samples, sr,
+                params['progression_segment_duration'], activity, params['chord_threshold']
+            )
+        else:
+            segments = chords_from_frame_chroma(
+                chroma, frame_positions, total_samples, sr,
+                params['progression_segment_duration'], CHORD_TEMPLATES, activity
+            )
+            detected_chords = [
+                entry['chord'] for entry in segments
+                if entry['chord'] != 'N' and entry['confidence'] > params['chord_threshold']
+            ]
+        chord_analysis = {
+            'progression': unique_progression(detected_chords),
+            'detected_chords': detected_chords
+        }
+    
+    basic_analysis = summarize_basic_features(features['basic_sums'], features['basic_counts'])
+    
+    # Estructura: chroma + timbre de structure_features, como en serie
+    structure = segment_structure(
+        features['structure_features'], features['structure_positions'], beat_positions,
+        total_samples, sr, activity, energy=features['structure_energy']
+    )
+    
+    return build_result(
+        total_samples / sr, sr, key_analysis, tempo_analysis, chord_analysis,
+        timeline, notes, basic_analysis, activity, sync, structure,
+        analysis_method='ultimate_v2_features'
+    )
+
+def reanalyze_store(store, decision_params=None):
+    """Re-analizar todo lo guardado en un almacén con nuevos parámetros de decisión"""
+    results = {}
+    for features in store.entries():
+        results[features['source_path']] = analyze_from_features(features, decision_params)
+    return results
+
+def classify_tempo(bpm_value):
+    """Clasificación de tempo"""
+    if bpm_value <= 0:
+        return "Sin pulso"
+    if bpm_value < 80:
+        return "Lento"
+    elif bpm_value < 120:
+        return "Moderado"
+    elif bpm_value < 160:
+        return "Rápido"
+    return "Muy Rápido"
+
+def build_result(duration, sr, key_analysis, tempo_analysis, chord_analysis,
+                 timeline, notes, basic_analysis, activity=None, sync=None,
+                 structure=None, analysis_method='ultimate_v2'):
+    """Combinar los resultados de cada etapa en el documento final"""
+    return {
+        'success': True,
+        'duration': duration,
+        'sample_rate': sr,
+        'key': key_analysis['key'],
+        'key_confidence': key_analysis['confidence'],
+        'bpm': tempo_analysis['bpm'],
+        'tempo_confidence': tempo_analysis['confidence'],
+        'tempo_classification': classify_tempo(tempo_analysis['bpm']),
+        'beat_grid': tempo_analysis.get('beat_grid'),
+        'tempo_curve': tempo_analysis.get('tempo_curve'),
+        'progression': chord_analysis['progression'][:PROGRESSION_PREVIEW_CHORDS],
+        'timeline': legacy_timeline(timeline),
+        'chord_timeline': encode_timeline_columnar(timeline, chord_analysis['progression']),
+        'timeline_sync': sync,
+        'notes': notes,
+        'chord_count': len(chord_analysis['detected_chords']),
+        'average_chord_confidence': calculate_avg_confidence(timeline),
+        'basic_features': basic_analysis,
+        'silence': activity.to_dict() if activity is not None else None,
+        'structure': structure or [],
+        'analysis_method': analysis_method
+    }
+
+def silent_timeline(total_samples, sr, segment_duration=4):
+    """Timeline de un archivo sin actividad: bloques 'N' como los de create_chord_timeline"""
+    segment_samples = int(segment_duration * sr)
+    return [
+        {'start': start / sr, 'chord': 'N', 'confidence': 0.0}
+        for start in range(0, total_samples, segment_samples)
+        if min(segment_samples, total_samples - start) >= sr
+    ]
+
+def silent_result(total_samples, sr, activity, segment_duration=4, analysis_method='ultimate_v2'):
+    """
+    Documento de un archivo sin actividad (mapa de silencio vacío): todo el
+    timeline es 'N' y no se estiman tonalidad, tempo, notas ni estructura.
+    """
+    tempo_analysis = {
+        'bpm': 0.0,
+        'confidence': 0.0,
+        'beat_grid': beat_grid([], 0, sr),
+        'tempo_curve': {'time': [], 'bpm': []}
+    }
+    result = build_result(
+        total_samples / sr, sr, {'key': 'Unknown', 'confidence': 0.0}, tempo_analysis,
+        {'progression': [], 'detected_chords': []},
+        silent_timeline(total_samples, sr, segment_duration), [], {}, activity,
+        analysis_method=analysis_method
+    )
+    result['average_chord_confidence'] = 0.0
+    return result
+
+def basic_feature_sums(y, sr):
+    """
+    Sumas y número de frames de las características básicas.
+    Las sumas de varios fragmentos se combinan sumando, sin perder exactitud.
+    """
+    frames = {
+        # Características espectrales
+        'spectral_centroid': librosa.feature.spectral_centroid(y=y, sr=sr)[0],
+        'spectral_rolloff': librosa.feature.spectral_rolloff(y=y, sr=sr)[0],
+        'spectral_bandwidth': librosa.feature.spectral_bandwidth(y=y, sr=sr)[0],
+        # Zero crossing rate
+        'zero_crossing_rate': librosa.feature.zero_crossing_rate(y)[0],
+        # MFCC
+        'mfcc': librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
+    }
+    sums = {name: np.sum(values, axis=-1) for name, values in frames.items()}
+    counts = {name: values.shape[-1] for name, values in frames.items()}
+    return sums, counts
+
+def summarize_basic_features(sums, counts):
+    """Medias de las características básicas a partir de sumas y conteos"""
+    return {
+        'spectral_centroid_mean': float(sums['spectral_centroid'] / counts['spectral_centroid']),
+        'spectral_rolloff_mean': float(sums['spectral_rolloff'] / counts['spectral_rolloff']),
+        'spectral_bandwidth_mean': float(sums['spectral_bandwidth'] / counts['spectral_bandwidth']),
+        'zero_crossing_rate_mean': float(sums['zero_crossing_rate'] / counts['zero_crossing_rate']),
+        'mfcc_mean': [float(value) for value in sums['mfcc'] / counts['mfcc']]
+    }
+
+def analyze_basic_features(y, sr):
+    """Análisis de características básicas"""
+    try:
+        sums, counts = basic_feature_sums(y, sr)
+        return summarize_basic_features(sums, counts)
     except:
         return {}
 
 def analyze_key_advanced(y, sr):
-    """Análisis avanzado de tonalidad"""
+    """Análisis avanzado de tonalidad (con el chroma por frame, que reutiliza la identificación)"""
     try:
         # Chroma features
         chroma = librosa.feature.chroma_stft(y=y, sr=sr)
-        chroma_mean = np.mean(chroma, axis=1)
+        return {**estimate_key(np.mean(chroma, axis=1)), 'chroma': chroma}
         
+    except Exception as e:
+        print(f"Error en analisis de tonalidad: {e}", file=sys.stderr)
+        return {'key': 'Unknown', 'confidence': 0.0}
+
+def estimate_key(chroma_mean):
+    """Tonalidad por correlación del chroma medio con los perfiles de tonalidad"""
+    try:
         # Perfiles de tonalidad (Krumhansl-Schmuckler)
         major_profile = np.array([6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88])
         minor_profile = np.array([6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17])
@@ -154,74 +643,40 @@ def analyze_key_advanced(y, sr):
             minor_corr = np.corrcoef(chroma_mean, np.roll(minor_profile, i))[0, 1]
             correlations.append((f"{keys[i]} Minor", minor_corr))
         
-        # Encontrar la mejor correlación
-        best_key, best_corr = max(correlations, key=lambda x: x[1] if not np.isnan(x[1]) else -1)
+        # Encontrar la mejor correlación (y el margen sobre la segunda)
+        ranked = sorted(correlations, key=lambda x: x[1] if not np.isnan(x[1]) else -1, reverse=True)
+        best_key, best_corr = ranked[0]
+        second_corr = ranked[1][1]
+        margin = best_corr - second_corr if not (np.isnan(best_corr) or np.isnan(second_corr)) else 0.0
         
         return {
             'key': best_key,
-            'confidence': float(best_corr) if not np.isnan(best_corr) else 0.0
+            'confidence': float(best_corr) if not np.isnan(best_corr) else 0.0,
+            'margin': float(margin)
         }
         
     except Exception as e:
         print(f"Error en analisis de tonalidad: {e}", file=sys.stderr)
         return {'key': 'Unknown', 'confidence': 0.0}
 
-def analyze_chords_advanced(y, sr):
-    """Análisis avanzado de acordes"""
+def analyze_chords_advanced(y, sr, activity=None, tiles=None):
+    """
+    Análisis avanzado de acordes (omite segmentos silenciosos si hay mapa de actividad).
+    Con un TileStore, el chroma completo se guarda como teselas para la interfaz.
+    """
     try:
-        # Chroma features con ventana más pequeña para mejor resolución temporal
-        hop_length = 512
-        chroma = librosa.feature.chroma_stft(y=y, sr=sr, hop_length=hop_length)
-        
-        # Plantillas de acordes básicos
-        chord_templates = {
-            'C': [1, 0, 0, 0, 1, 0, 0, 1, 0, 0, 0, 0],
-            'Dm': [0, 0, 1, 0, 0, 1, 0, 0, 0, 1, 0, 0],
-            'Em': [0, 0, 0, 0, 1, 0, 0, 1, 0, 0, 0, 1],
-            'F': [1, 0, 0, 0, 0, 1, 0, 0, 0, 1, 0, 0],
-            'G': [0, 0, 1, 0, 0, 0, 0, 1, 0, 0, 0, 1],
-            'Am': [1, 0, 0, 1, 0, 0, 0, 0, 1, 0, 0, 0],
-            'Bdim': [0, 0, 1, 0, 0, 1, 0, 0, 0, 0, 0, 1]
-        }
+        # Chroma completo (con ventana pequeña) solo para las teselas
+        if tiles is not None:
+            hop_length = 512
+            chroma = librosa.feature.chroma_stft(y=y, sr=sr, hop_length=hop_length)
+            write_tiles(tiles, 'chroma', chroma, sr, hop_length)
         
-        # Detectar acordes por segmentos
-        segment_length = sr * 2  # 2 segundos por segmento
-        detected_chords = []
-        
-        for i in range(0, len(y), segment_length):
-            segment = y[i:i+segment_length]
-            if len(segment) < sr:  # Segmento muy corto
-                continue
-                
-            # Chroma del segmento
-            seg_chroma = librosa.feature.chroma_stft(y=segment, sr=sr)
-            seg_chroma_mean = np.mean(seg_chroma, axis=1)
-            
-            # Comparar con plantillas
-            best_chord = 'N'
-            best_score = -1
-            
-            for chord_name, template in chord_templates.items():
-                score = np.corrcoef(seg_chroma_mean, template)[0, 1]
-                if not np.isnan(score) and score > best_score:
-                    best_score = score
-                    best_chord = chord_name
-            
-            if best_score > 0.3:  # Umbral de confianza
-                detected_chords.append(best_chord)
-        
-        # Obtener progresión única
-        if detected_chords:
-            unique_chords = []
-            for chord in detected_chords:
-                if not unique_chords or chord != unique_chords[-1]:
-                    unique_chords.append(chord)
-            progression = unique_chords[:8]  # Máximo 8 acordes
-        else:
-            progression = ['C', 'Am', 'F', 'G']  # Progresión por defecto
+        # Detectar acordes por segmentos de 2 segundos (STFT propia por segmento)
+        means = segment_chroma_means(y, sr, 2, activity)
+        detected_chords = chords_from_segment_chroma(means, len(y), sr, 2, activity)
         
         return {
-            'progression': progression,
+            'progression': unique_progression(detected_chords),
             'detected_chords': detected_chords
         }
         
@@ -232,153 +687,427 @@ def analyze_chords_advanced(y, sr):
             'detected_chords': []
         }
 
-def analyze_tempo_advanced(y, sr):
-    """Análisis avanzado de tempo"""
+def analyze_chords_beat_sync(y, sr, beat_frames, activity=None, beats_per_segment=1, phase=0,
+                             tiles=None):
+    """
+    Acordes y timeline por pulso (o compás): el chroma se calcula una sola vez,
+    se promedia entre pulsos y se puntúan todas las plantillas a la vez.
+    Los compases empiezan en el pulso phase (el primer tiempo fuerte).
+    'y' es el audio analizado por la etapa de tempo (el activo si hay mapa de
+    actividad); los tiempos devueltos están en la línea de tiempo original.
+    Con un TileStore, ese mismo chroma se guarda como teselas en la línea de
+    tiempo original (frames de silencio a cero).
+    """
     try:
-        # Múltiples métodos de detección de tempo
-        tempo1, beats1 = librosa.beat.beat_track(y=y, sr=sr)
+        hop_length = 512
+        chroma = librosa.feature.chroma_stft(y=y, sr=sr, hop_length=hop_length)
         
-        # Onset detection
-        onset_frames = librosa.onset.onset_detect(y=y, sr=sr)
-        onset_times = librosa.frames_to_time(onset_frames, sr=sr)
-        
-        # Calcular BPM desde onsets
-        if len(onset_times) > 1:
-            intervals = np.diff(onset_times)
-            median_interval = np.median(intervals)
-            tempo2 = 60.0 / median_interval if median_interval > 0 else tempo1
+        frame_positions = np.arange(chroma.shape[1]) * hop_length
+        beat_positions = librosa.frames_to_samples(beat_frames, hop_length=hop_length)
+        total_samples = len(y)
+        if activity is not None:
+            frame_positions = activity.to_original(frame_positions)
+            beat_positions = activity.to_original(beat_positions)
+            total_samples = activity.total_samples
+        if tiles is not None:
+            write_tiles(tiles, 'chroma', full_timeline_frames(chroma, frame_positions, total_samples, hop_length),
+                        sr, hop_length)
+        
+        return chords_from_synced_chroma(
+            chroma, frame_positions, beat_positions, total_samples, sr,
+            activity, beats_per_segment, phase=phase
+        )
+        
+    except Exception as e:
+        print(f"Error en analisis sincronizado: {e}", file=sys.stderr)
+        return {
+            'progression': ['C', 'Am', 'F', 'G'],
+            'detected_chords': [],
+            'timeline': create_chord_timeline(y, sr)
+        }
+
+def chords_from_synced_chroma(chroma, frame_positions, beat_positions, total_samples,
+                              sr, activity=None, beats_per_segment=1, chord_threshold=0.3, phase=0):
+    """
+    Acordes y timeline a partir de chroma frame a frame ya calculado.
+    Posiciones (frames y pulsos) en muestras de la línea de tiempo original;
+    phase es el índice del primer tiempo fuerte en beat_positions.
+    """
+    boundaries = beat_boundaries(beat_positions, total_samples, beats_per_segment, phase)
+    if activity is not None:
+        # Cortar también en los bordes del silencio para que queden como 'N'
+        boundaries = np.union1d(boundaries, activity.regions.ravel())
+    vectors, counts = sync_features(chroma, frame_positions, boundaries)
+    
+    timeline_names, timeline_scores, timeline_best = score_templates(vectors, TIMELINE_CHORD_TEMPLATES)
+    chord_names, chord_scores, chord_best = score_templates(vectors, CHORD_TEMPLATES)
+    
+    timeline = []
+    detected_chords = []
+    for i in range(len(boundaries) - 1):
+        start, end = int(boundaries[i]), int(boundaries[i + 1])
+        
+        # Segmento sin frames o silencioso: sin acorde
+        if counts[i] == 0 or (activity is not None and activity.is_silent(start, end)):
+            timeline.append({'start': start / sr, 'chord': 'N', 'confidence': 0.0})
+            continue
+        
+        timeline.append({
+            'start': start / sr,
+            'chord': timeline_names[timeline_best[i]],
+            'confidence': float(timeline_scores[i])
+        })
+        
+        if chord_scores[i] > chord_threshold:  # Umbral de confianza
+            detected_chords.append(chord_names[chord_best[i]])
+    
+    return {
+        'progression': unique_progression(detected_chords),
+        'detected_chords': detected_chords,
+        'timeline': timeline
+    }
+
+def chords_from_frame_chroma(chroma, frame_positions, total_samples, sr,
+                             segment_duration, templates, activity=None):
+    """
+    Acorde por bloque fijo promediando el chroma por frame, sin STFT por segmento.
+    Como en create_chord_timeline, se omiten los bloques de menos de 1 segundo.
+    """
+    segment_samples = int(segment_duration * sr)
+    boundaries = np.append(np.arange(0, total_samples, segment_samples), total_samples)
+    vectors, counts = sync_features(chroma, frame_positions, boundaries)
+    names, scores, best = score_templates(vectors, templates)
+    
+    timeline = []
+    for i in range(len(boundaries) - 1):
+        start, end = int(boundaries[i]), int(boundaries[i + 1])
+        if end - start < sr:  # Segmento muy corto
+            continue
+        
+        if counts[i] == 0 or (activity is not None and activity.is_silent(start, end)):
+            timeline.append({'start': start / sr, 'chord': 'N', 'confidence': 0.0})
         else:
-            tempo2 = tempo1
+            timeline.append({'start': start / sr, 'chord': names[best[i]], 'confidence': float(scores[i])})
+    
+    return timeline
+
+def unique_progression(detected_chords):
+    """Progresión completa sin repeticiones consecutivas"""
+    if not detected_chords:
+        return ['C', 'Am', 'F', 'G']  # Progresión por defecto
+    
+    unique_chords = []
+    for chord in detected_chords:
+        if not unique_chords or chord != unique_chords[-1]:
+            unique_chords.append(chord)
+    return unique_chords
+
+def analyze_tempo_advanced(y, sr, activity=None):
+    """
+    Análisis avanzado de tempo: BPM, rejilla de pulsos con tiempos fuertes y
+    curva de tempo, todo de un mismo espectrograma mel y un mismo tempograma.
+    'y' puede ser el audio activo: con mapa de actividad, la rejilla y la curva
+    se devuelven en la línea de tiempo original (beat_frames sigue en la de 'y').
+    """
+    try:
+        hop_length = 512
+        envelopes = rhythm_envelopes(y, sr, hop_length)
+        rhythm = analyze_rhythm(envelopes['onset_envelope'], sr, hop_length, envelopes['bass_envelope'])
         
-        # Promedio ponderado
-        final_tempo = (tempo1 * 0.7 + tempo2 * 0.3)
+        # Onset detection
+        onset_times = librosa.frames_to_time(envelopes['onset_frames'], sr=sr, hop_length=hop_length)
         
-        # Validar rango razonable
-        if final_tempo < 60:
-            final_tempo *= 2
-        elif final_tempo > 200:
-            final_tempo /= 2
+        beat_positions = librosa.frames_to_samples(rhythm['beat_frames'], hop_length=hop_length)
+        frame_positions = np.arange(len(rhythm['local_tempo'])) * hop_length
+        total_samples = len(y)
+        if activity is not None:
+            beat_positions = activity.to_original(beat_positions)
+            frame_positions = activity.to_original(frame_positions)
+            total_samples = activity.total_samples
         
         return {
-            'bpm': float(final_tempo),
-            'confidence': 0.8
+            'bpm': combine_tempo_estimates(rhythm['tempo'], onset_times),
+            'confidence': 0.8,
+            'beat_frames': rhythm['beat_frames'],
+            'downbeat_phase': rhythm['downbeat_phase'],
+            'beat_grid': beat_grid(beat_positions, rhythm['downbeat_phase'], sr),
+            'tempo_curve': tempo_curve(frame_positions, rhythm['local_tempo'], sr, total_samples),
+            # Para la identificación local (ver identification_features)
+            'onset_envelope': envelopes['onset_envelope'],
+            'mel_db': envelopes['mel_db']
         }
         
     except Exception as e:
         print(f"Error en analisis de tempo: {e}", file=sys.stderr)
         return {
             'bpm': 120.0,
-            'confidence': 0.0
+            'confidence': 0.0,
+            'beat_frames': np.array([], dtype=int),
+            'downbeat_phase': 0,
+            'beat_grid': beat_grid([], 0, sr),
+            'tempo_curve': {'time': [], 'bpm': []}
         }
 
-def create_chord_timeline(y, sr):
-    """Crear timeline de acordes"""
+def structure_features(y, sr):
+    """
+    Características de estructura por frame de STRUCTURE_HOP_LENGTH muestras:
+    chroma + timbre (MFCC sin el coeficiente de energía) y la energía aparte.
+    Una sola STFT de salto grueso alimenta chroma y MFCC.
+    """
+    hop_length = STRUCTURE_HOP_LENGTH
+    power = np.abs(librosa.stft(y, n_fft=hop_length, hop_length=hop_length)) ** 2
+    chroma = librosa.feature.chroma_stft(S=power, sr=sr)
+    mel_db = librosa.power_to_db(librosa.feature.melspectrogram(S=power, sr=sr))
+    mfcc = librosa.feature.mfcc(S=mel_db, sr=sr, n_mfcc=13)
+    return np.vstack([chroma, mfcc[1:]]), mfcc[0]
+
+def analyze_structure(y, sr, beat_frames, activity=None):
+    """
+    Secciones repetidas (intro, verso, estribillo...).
+    'y' es el audio de la etapa de tempo (el activo si hay mapa de actividad).
+    """
     try:
-        # Dividir en segmentos de 4 segundos
-        segment_duration = 4
-        segment_samples = segment_duration * sr
-        timeline = []
-        
-        chord_templates = {
-            'C': [1, 0, 0, 0, 1, 0, 0, 1, 0, 0, 0, 0],
-            'Dm': [0, 0, 1, 0, 0, 1, 0, 0, 0, 1, 0, 0],
-            'Em': [0, 0, 0, 0, 1, 0, 0, 1, 0, 0, 0, 1],
-            'F': [1, 0, 0, 0, 0, 1, 0, 0, 0, 1, 0, 0],
-            'G': [0, 0, 1, 0, 0, 0, 0, 1, 0, 0, 0, 1],
-            'Am': [1, 0, 0, 1, 0, 0, 0, 0, 1, 0, 0, 0],
-        }
+        features, energy = structure_features(y, sr)
         
-        for i in range(0, len(y), segment_samples):
-            start_time = i / sr
-            segment = y[i:i+segment_samples]
-            
-            if len(segment) < sr:  # Segmento muy corto
-                continue
-            
-            # Análisis del segmento
-            chroma = librosa.feature.chroma_stft(y=segment, sr=sr)
-            chroma_mean = np.mean(chroma, axis=1)
-            
-            # Detectar acorde
-            best_chord = 'C'
-            best_score = -1
-            
-            for chord_name, template in chord_templates.items():
-                score = np.corrcoef(chroma_mean, template)[0, 1]
-                if not np.isnan(score) and score > best_score:
-                    best_score = score
-                    best_chord = chord_name
-            
-            # Formatear tiempo
-            minutes = int(start_time // 60)
-            seconds = int(start_time % 60)
-            time_str = f"{minutes}:{seconds:02d}"
-            
-            timeline.append({
-                'time': time_str,
-                'chord': best_chord,
-                'confidence': float(best_score) if not np.isnan(best_score) else 0.5
-            })
+        frame_positions = np.arange(features.shape[1]) * STRUCTURE_HOP_LENGTH
+        beat_positions = librosa.frames_to_samples(beat_frames, hop_length=512)
+        total_samples = len(y)
+        if activity is not None:
+            frame_positions = activity.to_original(frame_positions)
+            beat_positions = activity.to_original(beat_positions)
+            total_samples = activity.total_samples
         
-        return timeline[:15]  # Máximo 15 entradas
+        return segment_structure(
+            features, frame_positions, beat_positions, total_samples, sr, activity, energy=energy
+        )
+        
+    except Exception as e:
+        print(f"Error en analisis de estructura: {e}", file=sys.stderr)
+        return []
+
+def combine_tempo_estimates(tempo1, onset_times):
+    """Combinar el tempo del beat tracker con el derivado de los onsets"""
+    # Calcular BPM desde onsets
+    if len(onset_times) > 1:
+        intervals = np.diff(onset_times)
+        median_interval = np.median(intervals)
+        tempo2 = 60.0 / median_interval if median_interval > 0 else tempo1
+    else:
+        tempo2 = tempo1
+    
+    # Promedio ponderado
+    final_tempo = (tempo1 * 0.7 + tempo2 * 0.3)
+    
+    # Validar rango razonable
+    if final_tempo < 60:
+        final_tempo *= 2
+    elif final_tempo > 200:
+        final_tempo /= 2
+    
+    return float(final_tempo)
+
+def create_chord_timeline(y, sr, activity=None):
+    """Crear timeline de acordes completo: entradas {'start', 'chord', 'confidence'}"""
+    try:
+        # Dividir en segmentos de 4 segundos (STFT propia por segmento)
+        means = segment_chroma_means(y, sr, 4, activity)
+        return timeline_from_segment_chroma(means, len(y), sr, 4, activity)
         
     except Exception as e:
         print(f"Error creando timeline: {e}", file=sys.stderr)
         return [
-            {'time': '0:00', 'chord': 'C', 'confidence': 0.5},
-            {'time': '0:04', 'chord': 'Am', 'confidence': 0.5},
-            {'time': '0:08', 'chord': 'F', 'confidence': 0.5},
-            {'time': '0:12', 'chord': 'G', 'confidence': 0.5}
+            {'start': 0.0, 'chord': 'C', 'confidence': 0.5},
+            {'start': 4.0, 'chord': 'Am', 'confidence': 0.5},
+            {'start': 8.0, 'chord': 'F', 'confidence': 0.5},
+            {'start': 12.0, 'chord': 'G', 'confidence': 0.5}
         ]
 
+def segment_chroma_means(y, sr, segment_duration, activity=None):
+    """
+    Chroma medio de cada bloque fijo con una STFT propia por bloque (filas:
+    bloques). Los bloques de menos de 1 segundo o silenciosos quedan en NaN.
+    """
+    segment_samples = int(segment_duration * sr)
+    starts = range(0, len(y), segment_samples)
+    means = np.full((len(starts), 12), np.nan)
+    for row, start in enumerate(starts):
+        segment = y[start:start + segment_samples]
+        if len(segment) < sr:  # Segmento muy corto
+            continue
+        if activity is not None and activity.is_silent(start, start + len(segment)):
+            continue
+        means[row] = np.mean(librosa.feature.chroma_stft(y=segment, sr=sr), axis=1)
+    return means
+
+def match_template(chroma_mean, templates):
+    """Plantilla con mayor correlación: (nombre, puntuación), o (None, -1) si ninguna puntúa"""
+    best_chord = None
+    best_score = -1
+    for chord_name, template in templates.items():
+        score = np.corrcoef(chroma_mean, template)[0, 1]
+        if not np.isnan(score) and score > best_score:
+            best_score = score
+            best_chord = chord_name
+    return best_chord, best_score
+
+def timeline_from_segment_chroma(means, total_samples, sr, segment_duration, activity=None):
+    """Timeline por bloques fijos a partir de segment_chroma_means"""
+    segment_samples = int(segment_duration * sr)
+    timeline = []
+    for row, start in enumerate(range(0, total_samples, segment_samples)):
+        end = min(start + segment_samples, total_samples)
+        if end - start < sr:  # Segmento muy corto
+            continue
+        
+        # Segmento silencioso: sin acorde, sin análisis
+        if activity is not None and activity.is_silent(start, end):
+            timeline.append({'start': start / sr, 'chord': 'N', 'confidence': 0.0})
+            continue
+        
+        best_chord, best_score = match_template(means[row], TIMELINE_CHORD_TEMPLATES)
+        timeline.append({
+            'start': start / sr,
+            'chord': best_chord or 'C',
+            'confidence': float(best_score)
+        })
+    return timeline
+
+def chords_from_segment_chroma(means, total_samples, sr, segment_duration, activity=None,
+                               chord_threshold=0.3):
+    """Acordes detectados por bloques fijos a partir de segment_chroma_means"""
+    segment_samples = int(segment_duration * sr)
+    detected_chords = []
+    for row, start in enumerate(range(0, total_samples, segment_samples)):
+        end = min(start + segment_samples, total_samples)
+        if end - start < sr:
+            continue
+        if activity is not None and activity.is_silent(start, end):
+            continue
+        best_chord, best_score = match_template(means[row], CHORD_TEMPLATES)
+        if best_score > chord_threshold:  # Umbral de confianza
+            detected_chords.append(best_chord)
+    return detected_chords
+
 def extract_main_notes(y, sr):
     """Extraer notas principales"""
     try:
         # Chroma features
         chroma = librosa.feature.chroma_stft(y=y, sr=sr)
-        chroma_mean = np.mean(chroma, axis=1)
-        
-        # Nombres de notas
-        note_names = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
-        
-        # Obtener las 4 notas más prominentes
-        top_indices = np.argsort(chroma_mean)[-4:][::-1]
-        main_notes = [note_names[i] for i in top_indices]
-        
-        return main_notes
+        return main_notes_from_chroma(np.mean(chroma, axis=1))
         
     except Exception as e:
         print(f"Error extrayendo notas: {e}", file=sys.stderr)
         return ['C', 'E', 'G', 'A']
 
+def main_notes_from_chroma(chroma_mean):
+    """Las 4 notas más prominentes del chroma medio"""
+    # Nombres de notas
+    note_names = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
+    
+    # Obtener las 4 notas más prominentes
+    top_indices = np.argsort(chroma_mean)[-4:][::-1]
+    return [note_names[i] for i in top_indices]
+
 def calculate_avg_confidence(timeline):
     """Calcular confianza promedio del timeline"""
     try:
         if not timeline:
             return 0.5
         
-        confidences = [entry.get('confidence', 0.5) for entry in timeline]
+        confidences = [entry.get('confidence', 0.5) for entry in timeline if entry.get('chord') != 'N']
+        if not confidences:
+            return 0.5
         return float(np.mean(confidences))
     except:
         return 0.5
 
+def is_number(value):
+    """Indicar si la opción es un número (para --chord-threshold y --segment-duration)"""
+    try:
+        float(value)
+        return True
+    except ValueError:
+        return False
+
 def main():
     """Función principal para uso desde línea de comandos"""
-    if len(sys.argv) != 2:
-        print("Uso: python analyze_audio_ultimate.py <archivo_audio>")
+    args = sys.argv[1:]
+    output_format = 'json'
+    output_path = None
+    
+    sync = None
+    workers = None
+    store = None
+    decision_params = None
+    peaks_dir = None
+    tiles_dir = None
+    identify = False
+    
+    # Opciones: --format json|msgpack|npz, --output <ruta>, --sync beat|bar, --workers N,
+    # --cache <dir>, --chord-threshold X, --segment-duration S, --peaks <dir>, --tiles <dir>,
+    # --identify (sin valor: incluir la identificación de la canción)
+    while len(args) > 1 and args[0].startswith('--'):
+        option, value = args[0], args[1]
+        if option == '--identify':
+            identify = True
+            args = args[1:]
+            continue
+        if option == '--format' and value in SUPPORTED_FORMATS:
+            output_format = value
+        elif option == '--output':
+            output_path = value
+        elif option == '--sync' and value in SYNC_BEATS_PER_SEGMENT:
+            sync = value
+        elif option == '--workers' and value.isdigit():
+            workers = int(value)
+        elif option == '--cache':
+            store = FeatureStore(value)
+        elif option in ('--chord-threshold', '--segment-duration') and is_number(value):
+            key = 'chord_threshold' if option == '--chord-threshold' else 'segment_duration'
+            decision_params = {**(decision_params or {}), key: float(value)}
+        elif option == '--peaks':
+            peaks_dir = value
+        elif option == '--tiles':
+            tiles_dir = value
+        else:
+            args = []
+            break
+        args = args[2:]
+    
+    if len(args) != 1:
+        print("Uso: python analyze_audio_ultimate.py [--format json|msgpack|npz] [--output ruta] [--sync beat|bar] [--workers N] [--cache dir] [--chord-threshold X] [--segment-duration S] [--peaks dir] [--tiles dir] [--identify] <archivo_audio>")
         sys.exit(1)
     
-    file_path = sys.argv[1]
+    file_path = args[0]
     
     if not os.path.exists(file_path):
         print(f"Error: Archivo no encontrado: {file_path}")
         sys.exit(1)
     
-    # Realizar análisis
-    result = analyze_audio_complete(file_path)
+    # El análisis por fragmentos no pasa por el almacén de características
+    if workers and (store is not None or tiles_dir or identify or decision_params):
+        print("Error: --workers no se puede combinar con --cache, --tiles, --identify, --chord-threshold ni --segment-duration", file=sys.stderr)
+        sys.exit(1)
+    
+    # Realizar análisis (en paralelo por fragmentos si se piden procesos)
+    if workers:
+        from parallel_analysis import analyze_audio_parallel
+        result = analyze_audio_parallel(file_path, workers=workers, sync=sync, peaks_dir=peaks_dir)
+    else:
+        result = analyze_audio_complete(file_path, sync=sync, store=store,
+                                        decision_params=decision_params, peaks_dir=peaks_dir,
+                                        tiles_dir=tiles_dir, identify=identify)
     
-    # Imprimir resultado como JSON
-    print(json.dumps(result, indent=2, ensure_ascii=False))
+    # Serializar resultado (JSON compacto por defecto)
+    data = serialize_result(result, output_format)
+    if output_path:
+        with open(output_path, 'wb') as f:
+            f.write(data)
+    elif output_format == 'json':
+        print(data.decode('utf-8'))
+    else:
+        sys.stdout.buffer.write(data)
+        sys.stdout.buffer.flush()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HUELLAS ACÚSTICAS POR PARES DE PICOS (LANDMARKS)
+Picos locales del espectrograma (constelación) emparejados con los picos
+siguientes; cada par (f1, f2, dt) es un hash de 32 bits. El índice invertido
+hash -> (canción, offset) está en arrays ordenados por hash, así que una
+consulta cuesta una búsqueda binaria por hash de la consulta y la votación
+por histograma de desfases es vectorizada
+"""
+
+import os
+import json
+import threading
+import numpy as np
+import librosa
+from scipy.ndimage import maximum_filter
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fingerprint_index.npz')
+
+# Espectrograma de las huellas: 11025 Hz, ventanas de ~93 ms cada ~23 ms
+FINGERPRINT_SR = 11025
+N_FFT = 1024
+HOP_LENGTH = 256
+
+# Vecindario (bins x frames) en el que un pico debe ser máximo, y nivel mínimo (dB)
+PEAK_NEIGHBORHOOD = (15, 15)
+MIN_PEAK_DB = -50.0
+
+# Cada pico se empareja con los FAN_OUT siguientes dentro de 1..MAX_DELTA_FRAMES
+FAN_OUT = 10
+MAX_DELTA_FRAMES = 63
+
+# Bits de cada campo del hash: f1 (10) | f2 (10) | dt (6)
+FREQ_BITS = 10
+DELTA_BITS = 6
+
+# Votos alineados mínimos para aceptar una coincidencia
+MIN_MATCH_VOTES = 12
+
+# Identificación incremental: diferencia de confianza entre la mejor canción y
+# la segunda para dejar de escuchar (0.6 = unos 16 votos frente a ninguno)
+EARLY_EXIT_MARGIN = 0.6
+
+# Frames tras un ancla en los que sus pares aún pueden cambiar (destinos hasta
+# MAX_DELTA_FRAMES y picos que dependen de medio vecindario), y contexto previo
+# necesario para volver a encontrar los mismos picos (vecindario y relleno de la STFT)
+_LOOKAHEAD_FRAMES = MAX_DELTA_FRAMES + PEAK_NEIGHBORHOOD[1] // 2 + 1
+_CONTEXT_FRAMES = PEAK_NEIGHBORHOOD[1] // 2 + N_FFT // (2 * HOP_LENGTH) + 1
+
+
+def constellation(y, sr):
+    """Picos locales (bins, frames) del espectrograma en dB"""
+    if sr != FINGERPRINT_SR:
+        y = librosa.resample(y, orig_sr=sr, target_sr=FINGERPRINT_SR)
+    S = np.abs(librosa.stft(y, n_fft=N_FFT, hop_length=HOP_LENGTH))
+    S_db = librosa.amplitude_to_db(S, ref=np.max)
+    is_peak = (maximum_filter(S_db, size=PEAK_NEIGHBORHOOD, mode='constant', cval=-np.inf) == S_db)
+    is_peak &= S_db > MIN_PEAK_DB
+    bins, frames = np.nonzero(is_peak)
+    # Orden temporal (y por frecuencia dentro de cada frame) para emparejar por vecindad
+    order = np.lexsort((bins, frames))
+    return bins[order], frames[order]
+
+
+def landmark_hashes(bins, frames):
+    """Hashes de los pares (ancla, destino) y el frame del ancla de cada uno"""
+    hashes, offsets = [], []
+    for k in range(1, FAN_OUT + 1):
+        anchors = np.arange(len(frames) - k)
+        deltas = frames[anchors + k] - frames[anchors]
+        valid = (deltas >= 1) & (deltas <= MAX_DELTA_FRAMES)
+        anchors = anchors[valid]
+        f1 = bins[anchors].astype(np.uint32)
+        f2 = bins[anchors + k].astype(np.uint32)
+        hashes.append((f1 << (FREQ_BITS + DELTA_BITS)) | (f2 << DELTA_BITS) | deltas[valid].astype(np.uint32))
+        offsets.append(frames[anchors].astype(np.int32))
+    if not hashes:
+        return np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.int32)
+    return np.concatenate(hashes), np.concatenate(offsets)
+
+
+def fingerprint(y, sr):
+    """Huella de un audio: (hashes uint32, offsets int32 en frames)"""
+    return landmark_hashes(*constellation(np.asarray(y, dtype=np.float32), sr))
+
+
+def fingerprint_file(file_path, duration=None):
+    """Huella de un archivo (completo o los primeros duration segundos)"""
+    from ffmpeg_decoder import load_audio
+    y, sr = load_audio(file_path, sr=FINGERPRINT_SR, duration=duration)
+    return fingerprint(y, sr)
+
+
+class FingerprintIndex:
+    """Índice invertido hash -> (canción, offset) en arrays ordenados por hash"""
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        self.clear()
+        if path and os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        with np.load(self.path) as data:
+            self.songs = json.loads(bytes(data['songs']).decode('utf-8'))
+            self.hashes = data['hashes']
+            self.song_idx = data['song_idx']
+            self.offsets = data['offsets']
+
+    def save(self):
+        """Escritura atómica: un lector nunca ve un índice a medias"""
+        tmp_path = f"{self.path}.{os.getpid()}.tmp.npz"
+        np.savez(
+            tmp_path,
+            songs=np.frombuffer(json.dumps(self.songs).encode('utf-8'), dtype=np.uint8),
+            hashes=self.hashes, song_idx=self.song_idx, offsets=self.offsets
+        )
+        os.replace(tmp_path, self.path)
+
+    def __contains__(self, song_id):
+        return song_id in self.songs
+
+    def clear(self):
+        """Vaciar el índice (el archivo no cambia hasta save)"""
+        self.songs = []
+        self.hashes = np.zeros(0, dtype=np.uint32)
+        self.song_idx = np.zeros(0, dtype=np.int32)
+        self.offsets = np.zeros(0, dtype=np.int32)
+
+    def add_song(self, song_id, hashes, offsets):
+        """Agregar (o reemplazar) las huellas de una canción"""
+        self.add_songs([(song_id, hashes, offsets)])
+
+    def add_songs(self, songs):
+        """
+        Agregar (o reemplazar) las huellas de varias canciones [(song_id, hashes, offsets)]
+        reordenando el índice una sola vez: reconstruirlo canción a canción es cuadrático
+        """
+        batch = {}
+        for song_id, hashes, offsets in songs:
+            batch.pop(song_id, None)
+            batch[song_id] = (np.asarray(hashes, dtype=np.uint32), np.asarray(offsets, dtype=np.int32))
+        if not batch:
+            return
+
+        # Quitar de una vez las canciones que se reemplazan
+        replaced = [self.songs.index(song_id) for song_id in batch if song_id in self.songs]
+        if replaced:
+            keep = ~np.isin(self.song_idx, replaced)
+            self.hashes, self.song_idx, self.offsets = self.hashes[keep], self.song_idx[keep], self.offsets[keep]
+            for idx in replaced:
+                self.songs[idx] = None
+
+        hashes, song_idx, offsets = [self.hashes], [self.song_idx], [self.offsets]
+        for song_id, (song_hashes, song_offsets) in batch.items():
+            self.songs.append(song_id)
+            hashes.append(song_hashes)
+            song_idx.append(np.full(len(song_offsets), len(self.songs) - 1, dtype=np.int32))
+            offsets.append(song_offsets)
+
+        hashes, song_idx, offsets = np.concatenate(hashes), np.concatenate(song_idx), np.concatenate(offsets)
+        order = np.argsort(hashes, kind='stable')
+        self.hashes, self.song_idx, self.offsets = hashes[order], song_idx[order], offsets[order]
+
+    def remove_song(self, song_id):
+        """Quitar las huellas de una canción (su posición queda libre como None)"""
+        if song_id not in self.songs:
+            return False
+        idx = self.songs.index(song_id)
+        keep = self.song_idx != idx
+        self.hashes, self.song_idx, self.offsets = self.hashes[keep], self.song_idx[keep], self.offsets[keep]
+        self.songs[idx] = None
+        return True
+
+    def matches(self, hashes, offsets):
+        """Todas las coincidencias de la consulta: (índice de canción, desfase en frames)"""
+        hashes = np.asarray(hashes, dtype=np.uint32)
+        offsets = np.asarray(offsets, dtype=np.int64)
+        empty = np.zeros(0, dtype=np.int64)
+        if len(hashes) == 0 or len(self.hashes) == 0:
+            return empty, empty
+
+        # Rango de cada hash de la consulta en el índice ordenado
+        left = np.searchsorted(self.hashes, hashes, side='left')
+        counts = np.searchsorted(self.hashes, hashes, side='right') - left
+        total = int(counts.sum())
+        if total == 0:
+            return empty, empty
+
+        # Expandir todas las coincidencias sin bucles de Python
+        query_rows = np.repeat(np.arange(len(hashes)), counts)
+        postings = np.repeat(left - (np.cumsum(counts) - counts), counts) + np.arange(total)
+        songs = self.song_idx[postings].astype(np.int64)
+        deltas = self.offsets[postings].astype(np.int64) - offsets[query_rows]
+        return songs, deltas
+
+    def lookup(self, hashes, offsets, top_k=5, min_votes=MIN_MATCH_VOTES):
+        """
+        Canciones con más hashes alineados (mismo desfase entre consulta y canción).
+        Devuelve [{'song_id', 'votes', 'offset', 'confidence'}] de mejor a peor;
+        offset es el inicio de la consulta dentro de la canción (segundos).
+        """
+        return self.rank(*self.matches(hashes, offsets), top_k=top_k, min_votes=min_votes)
+
+    def rank(self, songs, deltas, top_k=5, min_votes=MIN_MATCH_VOTES):
+        """Votación de coincidencias (de matches) como en lookup"""
+        if len(songs) == 0:
+            return []
+
+        # Histograma conjunto (canción, desfase): el pico de cada canción son sus votos
+        span = int(deltas.max() - deltas.min()) + 1
+        codes, votes = np.unique(songs * span + (deltas - deltas.min()), return_counts=True)
+        order = np.argsort(-votes, kind='stable')
+        codes, votes = codes[order], votes[order]
+        code_songs = codes // span
+        _, first = np.unique(code_songs, return_index=True)
+        first = np.sort(first)[:top_k]
+
+        matches = []
+        for i in first:
+            if votes[i] < min_votes:
+                break
+            delta = int(codes[i] % span + deltas.min())
+            matches.append({
+                'song_id': self.songs[int(code_songs[i])],
+                'votes': int(votes[i]),
+                'offset': delta * HOP_LENGTH / FINGERPRINT_SR,
+                # 0.5 justo en el umbral de votos, ~0.94 con cuatro veces más
+                'confidence': float(1.0 - 0.5 ** (votes[i] / MIN_MATCH_VOTES))
+            })
+        return matches
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def _index_signature(path):
+    """(mtime en ns, tamaño) del archivo del índice, o None si no existe"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def get_fingerprint_index(path=DEFAULT_INDEX_PATH):
+    """
+    Índice compartido por proceso, recargado solo cuando cambian la fecha o el
+    tamaño del archivo (save lo sustituye con os.replace). Es de solo lectura:
+    para modificarlo hay que crear un FingerprintIndex propio.
+    """
+    path = os.path.abspath(path)
+    signature = _index_signature(path)
+    with _indexes_lock:
+        cached = _indexes.get(path)
+        if cached is None or cached[0] != signature:
+            cached = (signature, FingerprintIndex(path))
+            _indexes[path] = cached
+        return cached[1]
+
+
+class IncrementalMatcher:
+    """
+    Identificación de un fragmento a medida que llega el audio (a FINGERPRINT_SR).
+    Las anclas cuyos pares ya no pueden cambiar se buscan una sola vez y sus
+    votos se acumulan; las del final del audio recibido se vuelven a calcular
+    en cada paso. Solo se analiza el audio nuevo más un poco de contexto.
+    Con un threading.Event cancel activado, feed deja de analizar.
+    """
+
+    def __init__(self, index, min_votes=MIN_MATCH_VOTES, margin=EARLY_EXIT_MARGIN, cancel=None):
+        self.index = index
+        self.min_votes = min_votes
+        self.margin = margin
+        self.cancel = cancel
+        self._audio = np.zeros(0, dtype=np.float32)
+        self._final_frame = 0
+        self._songs = [np.zeros(0, dtype=np.int64)]
+        self._deltas = [np.zeros(0, dtype=np.int64)]
+
+    @property
+    def seconds(self):
+        """Audio recibido hasta ahora (segundos)"""
+        return len(self._audio) / FINGERPRINT_SR
+
+    @property
+    def cancelled(self):
+        """Quien consulta ya no quiere el resultado"""
+        return self.cancel is not None and self.cancel.is_set()
+
+    def feed(self, y, final=False):
+        """
+        Agregar audio (final=True en el último bloque). Devuelve (mejor
+        coincidencia o None, concluyente): concluyente cuando la confianza de
+        la mejor supera a la de la segunda en al menos margin.
+        Cancelado, devuelve (None, False) sin analizar el bloque.
+        """
+        if self.cancelled:
+            return None, False
+        self._audio = np.concatenate([self._audio, np.asarray(y, dtype=np.float32)])
+        start_frame = max(0, self._final_frame - _CONTEXT_FRAMES)
+        bins, frames = constellation(self._audio[start_frame * HOP_LENGTH:], FINGERPRINT_SR)
+        hashes, offsets = landmark_hashes(bins, frames + start_frame)
+
+        n_frames = 1 + len(self._audio) // HOP_LENGTH
+        limit = n_frames if final else max(self._final_frame, n_frames - _LOOKAHEAD_FRAMES)
+        new = offsets >= self._final_frame
+        settled = new & (offsets < limit)
+
+        songs, deltas = self.index.matches(hashes[settled], offsets[settled])
+        self._songs.append(songs)
+        self._deltas.append(deltas)
+        self._final_frame = limit
+
+        pending_songs, pending_deltas = self.index.matches(hashes[new & ~settled], offsets[new & ~settled])
+        ranked = self.index.rank(
+            np.concatenate(self._songs + [pending_songs]),
+            np.concatenate(self._deltas + [pending_deltas]),
+            top_k=2, min_votes=1
+        )
+        if not ranked or ranked[0]['votes'] < self.min_votes:
+            return None, False
+        runner_up = ranked[1]['confidence'] if len(ranked) > 1 else 0.0
+        return ranked[0], ranked[0]['confidence'] - runner_up >= self.margin
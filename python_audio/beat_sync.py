@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AGREGACIÓN SINCRONIZADA CON EL PULSO
+Promedia el chroma por pulso (o por compás) usando la rejilla de pulsos de
+la etapa de tempo, y puntúa todas las plantillas de acordes de una vez
+"""
+
+import numpy as np
+
+
+def beat_boundaries(beat_samples, total_samples, beats_per_segment=1, phase=0):
+    """
+    Límites de segmento (en muestras) a partir de los pulsos.
+    beats_per_segment=4 agrupa por compases de 4/4; phase es el índice del
+    primer tiempo fuerte (downbeat_phase de la etapa de tempo), de modo que
+    cada grupo empieza en un tiempo fuerte y los pulsos anteriores (anacrusa)
+    quedan en el tramo inicial.
+    """
+    beats_per_segment = max(1, beats_per_segment)
+    beats = np.unique(np.asarray(beat_samples, dtype=np.int64))
+    beats = beats[(beats >= 0) & (beats < total_samples)][phase % beats_per_segment::beats_per_segment]
+    if len(beats) == 0:
+        return np.array([0, total_samples], dtype=np.int64)
+
+    # El tramo anterior al primer pulso y posterior al último también cuenta
+    bounds = beats
+    if bounds[0] > 0:
+        bounds = np.concatenate(([0], bounds))
+    return np.concatenate((bounds, [total_samples]))
+
+
+def sync_features(features, frame_positions, boundaries):
+    """
+    Promediar columnas de features (d x T) dentro de cada segmento.
+    frame_positions: posición en muestras de cada frame en la línea de tiempo original.
+    Devuelve (vectores d x S, número de frames por segmento).
+    """
+    n_segments = len(boundaries) - 1
+    segment_idx = np.searchsorted(boundaries, frame_positions, side='right') - 1
+    valid = (segment_idx >= 0) & (segment_idx < n_segments)
+    segment_idx = segment_idx[valid]
+    features = features[:, valid]
+
+    counts = np.bincount(segment_idx, minlength=n_segments)
+    sums = np.zeros((features.shape[0], n_segments), dtype=np.float64)
+    for row in range(features.shape[0]):
+        sums[row] = np.bincount(segment_idx, weights=features[row], minlength=n_segments)
+
+    means = sums / np.maximum(counts, 1)
+    return means, counts
+
+
+def score_templates(vectors, templates, method='pearson'):
+    """
+    Puntuar todas las plantillas contra todos los vectores (12 x S) de una vez.
+    method='pearson' reproduce np.corrcoef; 'cosine' la similitud coseno.
+    Devuelve (nombres de acorde, puntuaciones S, índice del mejor por vector).
+    """
+    names = list(templates.keys())
+    matrix = np.array([templates[name] for name in names], dtype=np.float64)
+    vectors = np.asarray(vectors, dtype=np.float64)
+
+    if method == 'pearson':
+        matrix = matrix - matrix.mean(axis=1, keepdims=True)
+        vectors = vectors - vectors.mean(axis=0, keepdims=True)
+
+    matrix_norm = np.linalg.norm(matrix, axis=1, keepdims=True)
+    vector_norm = np.linalg.norm(vectors, axis=0, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        scores = (matrix @ vectors) / (matrix_norm * vector_norm)
+    scores = np.nan_to_num(scores, nan=-1.0)
+
+    best = np.argmax(scores, axis=0)
+    return names, scores[best, np.arange(scores.shape[1])], best
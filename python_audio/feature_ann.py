@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ÍNDICE APROXIMADO (IVF) DE VECTORES DE CARACTERÍSTICAS
+Los vectores normalizados de la base (chroma, MFCC, tonnetz, contraste
+espectral) se agrupan con k-means en listas invertidas; una consulta solo
+visita las n_probe listas con centroide más cercano. Los candidatos se
+re-puntúan con SongFeatureMatrix, así que el umbral de coincidencia conserva
+su significado. Más listas visitadas = más recall y más latencia
+"""
+
+import os
+import numpy as np
+
+# Bloques del vector y su peso (chroma es lo que más puntúa en la comparación exacta)
+ANN_BLOCK_WEIGHTS = {
+    'chroma': 2.0,
+    'mfcc': 1.0,
+    'tonnetz': 0.5,
+    'spectral_contrast': 0.5
+}
+
+# Por debajo de este tamaño la pasada exacta ya cuesta milisegundos
+ANN_MIN_SONGS = 20000
+
+# Listas visitadas por consulta (recall / latencia)
+DEFAULT_N_PROBE = 16
+
+# k-means: iteraciones y muestra de entrenamiento por lista
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_PER_LIST = 32
+
+# Filas por bloque al asignar (acota la matriz de distancias en memoria)
+ASSIGN_CHUNK = 16384
+
+
+def ann_index_path(database_path):
+    """Archivo del índice junto a la base (dentro del directorio de un SongStore)"""
+    if os.path.isdir(database_path):
+        return os.path.join(database_path, 'ann_index.npz')
+    return f"{database_path}.ann.npz"
+
+
+def _blocks_from_matrix(matrix):
+    return {
+        'chroma': matrix.chroma,
+        'mfcc': matrix.mfcc,
+        'tonnetz': matrix.tonnetz,
+        'spectral_contrast': matrix.spectral_contrast
+    }
+
+
+def _blocks_from_features(features, matrix):
+    """Bloques (1 x dim) de una consulta; NaN en los que no trae"""
+    blocks = {}
+    for name, db_block in _blocks_from_matrix(matrix).items():
+        dim = db_block.shape[1]
+        values = features.get(name)
+        values = None if values is None else np.asarray(values, dtype=np.float64).ravel()
+        blocks[name] = (values if values is not None and len(values) == dim else np.full(dim, np.nan))[None, :]
+    return blocks
+
+
+def _normalize(blocks, mean, std):
+    """
+    Vector concatenado: chroma centrado y de norma 1 (la distancia equivale a
+    la correlación), el resto estandarizado por dimensión con la media y la
+    desviación de la base. Cada bloque pesa lo mismo sea cual sea su tamaño,
+    escalado por ANN_BLOCK_WEIGHTS. Devuelve (vectores float32, máscara de
+    valores presentes).
+    """
+    parts = []
+    start = 0
+    for name, weight in ANN_BLOCK_WEIGHTS.items():
+        block = np.asarray(blocks[name], dtype=np.float64)
+        dim = block.shape[1]
+        if name == 'chroma':
+            centered = block - block.mean(axis=1, keepdims=True)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                block = centered / np.linalg.norm(centered, axis=1, keepdims=True)
+        else:
+            block = (block - mean[start:start + dim]) / std[start:start + dim]
+        parts.append(block * np.sqrt(weight / dim))
+        start += dim
+    vectors = np.concatenate(parts, axis=1)
+    present = np.isfinite(vectors)
+    return np.where(present, vectors, 0.0).astype(np.float32), present
+
+
+def _nearest(vectors, centroids):
+    """Centroide más cercano de cada fila, por bloques"""
+    centroid_norms = np.einsum('ij,ij->i', centroids, centroids)
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ASSIGN_CHUNK):
+        chunk = vectors[start:start + ASSIGN_CHUNK]
+        labels[start:start + ASSIGN_CHUNK] = np.argmin(centroid_norms - 2.0 * chunk @ centroids.T, axis=1)
+    return labels
+
+
+def _kmeans(vectors, n_lists, rng):
+    """k-means de Lloyd sobre una muestra; los grupos vacíos se re-siembran"""
+    sample_size = min(len(vectors), n_lists * KMEANS_SAMPLE_PER_LIST)
+    sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+    centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+
+    for _ in range(KMEANS_ITERATIONS):
+        labels = _nearest(sample, centroids)
+        counts = np.bincount(labels, minlength=n_lists)
+        sums = np.stack([
+            np.bincount(labels, weights=sample[:, d], minlength=n_lists) for d in range(sample.shape[1])
+        ], axis=1)
+        empty = counts == 0
+        centroids[~empty] = (sums[~empty] / counts[~empty, None]).astype(np.float32)
+        if empty.any():
+            centroids[empty] = sample[rng.choice(sample_size, int(empty.sum()), replace=False)]
+    return centroids
+
+
+class IVFIndex:
+    """Listas invertidas: filas de la matriz agrupadas por centroide"""
+
+    def __init__(self, centroids, mean, std, list_offsets, list_rows, signature=None):
+        self.centroids = centroids
+        self.mean = mean
+        self.std = std
+        self.list_offsets = list_offsets
+        self.list_rows = list_rows
+        self.signature = signature
+
+    def __len__(self):
+        return len(self.list_rows)
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    @classmethod
+    def _from_labels(cls, centroids, mean, std, labels, signature):
+        list_rows = np.argsort(labels, kind='stable').astype(np.int64)
+        list_offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=len(centroids)))])
+        return cls(centroids, mean, std, list_offsets.astype(np.int64), list_rows, signature)
+
+    @classmethod
+    def build(cls, matrix, n_lists=None, signature=None, seed=0):
+        """Entrenar k-means sobre los vectores de una SongFeatureMatrix"""
+        blocks = _blocks_from_matrix(matrix)
+        standardized = np.concatenate([blocks[name] for name in ANN_BLOCK_WEIGHTS], axis=1)
+        with np.errstate(invalid='ignore'):
+            mean = np.nan_to_num(np.nanmean(standardized, axis=0))
+            std = np.nan_to_num(np.nanstd(standardized, axis=0))
+        std[std == 0] = 1.0
+
+        vectors, _ = _normalize(blocks, mean, std)
+        if n_lists is None:
+            n_lists = int(4 * np.sqrt(len(vectors)))
+        n_lists = max(1, min(n_lists, len(vectors)))
+        centroids = _kmeans(vectors, n_lists, np.random.default_rng(seed))
+        return cls._from_labels(centroids, mean, std, _nearest(vectors, centroids), signature)
+
+    def refit(self, matrix, signature=None):
+        """
+        Reasignar las filas de una base modificada a los centroides existentes
+        (una pasada, sin reentrenar); sirve mientras la base no cambie de escala
+        """
+        vectors, _ = _normalize(_blocks_from_matrix(matrix), self.mean, self.std)
+        return self._from_labels(self.centroids, self.mean, self.std, _nearest(vectors, self.centroids), signature)
+
+    def candidates(self, features, matrix, n_probe=DEFAULT_N_PROBE):
+        """
+        Filas (ordenadas) de las n_probe listas más cercanas a la consulta. La
+        distancia a los centroides solo usa los bloques que trae la consulta.
+        """
+        query, present = _normalize(_blocks_from_features(features, matrix), self.mean, self.std)
+        query, present = query[0], present[0]
+        diff = (self.centroids[:, present] - query[present])
+        distances = np.einsum('ij,ij->i', diff, diff)
+        n_probe = min(n_probe, self.n_lists)
+        lists = np.argpartition(distances, n_probe - 1)[:n_probe] if n_probe < self.n_lists else np.arange(self.n_lists)
+        rows = [self.list_rows[self.list_offsets[i]:self.list_offsets[i + 1]] for i in lists]
+        return np.sort(np.concatenate(rows)) if rows else np.zeros(0, dtype=np.int64)
+
+    def save(self, path):
+        """Escritura atómica, como el índice de huellas"""
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(
+            tmp_path,
+            centroids=self.centroids, mean=self.mean, std=self.std,
+            list_offsets=self.list_offsets, list_rows=self.list_rows,
+            signature=np.asarray(self.signature if self.signature is not None else [], dtype=np.int64)
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            signature = tuple(int(value) for value in data['signature']) or None
+            return cls(
+                data['centroids'], data['mean'], data['std'],
+                data['list_offsets'], data['list_rows'], signature
+            )
+
+
+def load_or_build_index(matrix, path, signature=None):
+    """
+    Índice para la versión de la base identificada por signature: el guardado
+    si coincide, reasignado si la base cambió poco, reentrenado si no
+    """
+    index = None
+    if os.path.exists(path):
+        try:
+            index = IVFIndex.load(path)
+        except Exception:
+            index = None
+
+    wanted = tuple(signature) if signature else None
+    if index is not None and index.signature == wanted and len(index) == len(matrix):
+        return index
+    # Se reentrena cuando el tamaño cambia más del doble (las listas se desequilibran)
+    if index is not None and len(index) // 2 <= len(matrix) <= 2 * len(index):
+        index = index.refit(matrix, signature)
+    else:
+        index = IVFIndex.build(matrix, signature=signature)
+    index.save(path)
+    return index
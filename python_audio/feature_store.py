@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ALMACÉN DE CARACTERÍSTICAS INTERMEDIAS
+Guarda chroma, envolvente de onsets, pulsos y estadísticas espectrales por
+hash de archivo y conjunto de parámetros, para que los cambios en la lógica
+de decisión (umbrales, segmentos, plantillas) no repitan decodificación ni STFT
+"""
+
+import os
+import io
+import sys
+import json
+import hashlib
+import numpy as np
+
+DEFAULT_STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'feature_cache')
+
+# Versión del formato: cambiarla invalida todas las entradas anteriores
+STORE_VERSION = 5
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def file_hash(file_path):
+    """SHA-1 del contenido del archivo (independiente de nombre y ruta)"""
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def params_hash(params):
+    """Hash estable de los parámetros de extracción"""
+    payload = json.dumps({'version': STORE_VERSION, **params}, sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+
+class FeatureStore:
+    """Características por frame en archivos .npz dentro de un directorio"""
+
+    def __init__(self, root=DEFAULT_STORE_DIR):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def _entry_path(self, content_hash, params):
+        return os.path.join(self.root, f"{content_hash}_{params_hash(params)}.npz")
+
+    def load(self, file_path, params, content_hash=None):
+        """Características guardadas para este archivo y parámetros, o None"""
+        content_hash = content_hash or file_hash(file_path)
+        path = self._entry_path(content_hash, params)
+        if not os.path.exists(path):
+            return None
+        try:
+            return self._read(path)
+        except Exception as e:
+            print(f"Entrada de caché ilegible, se recalcula: {e}", file=sys.stderr)
+            return None
+
+    def save(self, file_path, params, features, content_hash=None):
+        """Guardar características de forma atómica (escritura + rename)"""
+        content_hash = content_hash or file_hash(file_path)
+        path = self._entry_path(content_hash, params)
+
+        arrays = {}
+        meta = {'source_path': os.path.abspath(file_path), 'params': params}
+        for name, value in features.items():
+            if isinstance(value, np.ndarray):
+                arrays[name] = value
+            elif isinstance(value, dict):
+                # Diccionarios de arrays (sumas espectrales): prefijo "nombre__clave"
+                for key, item in value.items():
+                    if isinstance(item, np.ndarray) or np.isscalar(item):
+                        arrays[f"{name}__{key}"] = np.asarray(item)
+            else:
+                meta[name] = value
+
+        arrays['meta'] = np.frombuffer(json.dumps(meta).encode('utf-8'), dtype=np.uint8)
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **arrays)
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(buffer.getvalue())
+        os.replace(tmp_path, path)
+        return path
+
+    def entries(self):
+        """Iterar todas las entradas guardadas (para re-analizar la biblioteca)"""
+        for name in sorted(os.listdir(self.root)):
+            if not name.endswith('.npz'):
+                continue
+            try:
+                yield self._read(os.path.join(self.root, name))
+            except Exception as e:
+                print(f"Entrada de caché ilegible ({name}): {e}", file=sys.stderr)
+
+    @staticmethod
+    def _read(path):
+        features = {}
+        with np.load(path, allow_pickle=False) as archive:
+            meta = json.loads(archive['meta'].tobytes().decode('utf-8'))
+            for name in archive.files:
+                if name == 'meta':
+                    continue
+                if '__' in name:
+                    group, key = name.split('__', 1)
+                    value = archive[name]
+                    features.setdefault(group, {})[key] = value if value.ndim else value.item()
+                else:
+                    features[name] = archive[name]
+        features.update(meta)
+        return features
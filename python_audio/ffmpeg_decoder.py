@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DECODIFICADOR FFMPEG - DECODIFICACIÓN Y REMUESTREO EN UNA SOLA PASADA
+Lee MP3/M4A/OGG/WebM mediante un subproceso local de ffmpeg que entrega
+float32 mono a la frecuencia objetivo directamente a un buffer NumPy
+"""
+
+import os
+import subprocess
+import shutil
+import sys
+import tempfile
+import numpy as np
+
+# Formatos comprimidos que librosa tendría que leer por audioread
+COMPRESSED_EXTENSIONS = ('.mp3', '.m4a', '.aac', '.ogg', '.oga', '.opus', '.webm', '.wma')
+
+# Tamaño de bloque por defecto para lectura en streaming (muestras)
+DEFAULT_BLOCK_SIZE = 65536
+
+BYTES_PER_SAMPLE = 4  # float32
+
+
+def ffmpeg_available():
+    """Verificar si ffmpeg está disponible en el PATH"""
+    return shutil.which('ffmpeg') is not None
+
+
+def is_compressed_format(file_path):
+    """Indicar si el archivo es un formato comprimido que conviene pasar por ffmpeg"""
+    return os.path.splitext(file_path)[1].lower() in COMPRESSED_EXTENSIONS
+
+
+def probe_sample_rate(file_path):
+    """Obtener la frecuencia de muestreo nativa del primer stream de audio"""
+    try:
+        if shutil.which('ffprobe'):
+            output = subprocess.run(
+                ['ffprobe', '-v', 'error', '-select_streams', 'a:0',
+                 '-show_entries', 'stream=sample_rate',
+                 '-of', 'default=noprint_wrappers=1:nokey=1', file_path],
+                capture_output=True, check=True, timeout=30
+            ).stdout.decode('utf-8', 'ignore').strip()
+            return int(output.splitlines()[0])
+
+        # Sin ffprobe: ffmpeg imprime la cabecera del stream en stderr
+        stderr = subprocess.run(
+            ['ffmpeg', '-hide_banner', '-i', file_path],
+            capture_output=True, timeout=30
+        ).stderr.decode('utf-8', 'ignore')
+        for line in stderr.splitlines():
+            if 'Audio:' in line and ' Hz' in line:
+                for part in line.split(','):
+                    part = part.strip()
+                    if part.endswith(' Hz'):
+                        return int(part[:-3])
+    except Exception as e:
+        print(f"Error obteniendo frecuencia de muestreo: {e}", file=sys.stderr)
+    return None
+
+
+class FFmpegDecoder:
+    """Decodificador basado en un pipe de ffmpeg (mono, float32, sr objetivo)"""
+
+    def __init__(self, file_path, sr=22050, offset=0.0, duration=None):
+        self.file_path = file_path
+        self.offset = offset or 0.0
+        self.duration = duration
+
+        # sr=None conserva la frecuencia nativa, igual que librosa.load
+        if sr is None:
+            sr = probe_sample_rate(file_path)
+            if sr is None:
+                raise RuntimeError(f"No se pudo determinar la frecuencia de muestreo: {file_path}")
+        self.sr = int(sr)
+
+    def _command(self):
+        """Construir la línea de comandos de ffmpeg"""
+        cmd = ['ffmpeg', '-nostdin', '-hide_banner', '-loglevel', 'error']
+        if self.offset > 0:
+            cmd += ['-ss', f'{self.offset:.6f}']
+        if self.duration is not None:
+            cmd += ['-t', f'{self.duration:.6f}']
+        cmd += [
+            '-i', self.file_path,
+            '-vn',
+            '-ac', '1',
+            '-ar', str(self.sr),
+            '-f', 'f32le',
+            '-acodec', 'pcm_f32le',
+            'pipe:1'
+        ]
+        return cmd
+
+    def read(self):
+        """Decodificar el archivo completo a un array float32"""
+        process = subprocess.run(self._command(), capture_output=True)
+        if process.returncode != 0:
+            error = process.stderr.decode('utf-8', 'ignore').strip()
+            raise RuntimeError(f"ffmpeg falló ({process.returncode}): {error}")
+
+        data = process.stdout
+        usable = len(data) - (len(data) % BYTES_PER_SAMPLE)
+        # np.frombuffer no copia; el array resultante queda de solo lectura
+        return np.frombuffer(data[:usable], dtype=np.float32)
+
+    def blocks(self, block_size=DEFAULT_BLOCK_SIZE):
+        """
+        Iterar bloques de muestras a medida que ffmpeg los produce.
+        Si ffmpeg termina con error se lanza RuntimeError con su salida de error
+        (en un archivo temporal: un pipe sin leer podría bloquear a ffmpeg).
+        """
+        errors = tempfile.TemporaryFile()
+        process = subprocess.Popen(
+            self._command(),
+            stdout=subprocess.PIPE,
+            stderr=errors,
+            bufsize=block_size * BYTES_PER_SAMPLE
+        )
+        block_bytes = block_size * BYTES_PER_SAMPLE
+        pending = b''
+        try:
+            while True:
+                chunk = process.stdout.read(block_bytes - len(pending))
+                if not chunk:
+                    break
+                pending += chunk
+                if len(pending) < block_bytes:
+                    continue
+                yield np.frombuffer(pending, dtype=np.float32)
+                pending = b''
+
+            if process.wait() != 0:
+                errors.seek(0)
+                error = errors.read().decode('utf-8', 'ignore').strip()
+                raise RuntimeError(f"ffmpeg falló ({process.returncode}): {error}")
+
+            usable = len(pending) - (len(pending) % BYTES_PER_SAMPLE)
+            if usable:
+                yield np.frombuffer(pending[:usable], dtype=np.float32)
+        finally:
+            process.stdout.close()
+            if process.poll() is None:
+                process.kill()
+            process.wait()
+            errors.close()
+
+
+def load_audio(file_path, sr=22050, offset=0.0, duration=None):
+    """
+    Cargar audio mono a la frecuencia objetivo.
+    Los formatos comprimidos se decodifican y remuestrean en una sola pasada
+    con ffmpeg; el resto (o si ffmpeg no está disponible) usa librosa.load.
+    """
+    if is_compressed_format(file_path) and ffmpeg_available():
+        try:
+            decoder = FFmpegDecoder(file_path, sr=sr, offset=offset, duration=duration)
+            return decoder.read(), decoder.sr
+        except Exception as e:
+            print(f"Decodificador ffmpeg no disponible, usando librosa: {e}", file=sys.stderr)
+
+    import librosa
+    return librosa.load(file_path, sr=sr, mono=True, offset=offset, duration=duration)
+
+
+def stream_audio_blocks(file_path, sr=22050, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Iterar el audio en bloques mono a la frecuencia objetivo.
+    Devuelve (sr, generador). Sin ffmpeg se lee con soundfile por bloques y se
+    remuestrea con soxr en streaming; solo si soundfile no reconoce el formato
+    se carga el archivo completo con librosa.
+    """
+    if ffmpeg_available():
+        decoder = FFmpegDecoder(file_path, sr=sr)
+        return decoder.sr, decoder.blocks(block_size)
+
+    import soundfile as sf
+    try:
+        native_sr = sf.info(file_path).samplerate
+    except RuntimeError as e:
+        print(f"soundfile no lee el archivo, se carga completo con librosa: {e}", file=sys.stderr)
+        import librosa
+        y, sr = librosa.load(file_path, sr=sr, mono=True)
+        return sr, (y[i:i + block_size] for i in range(0, len(y), block_size))
+
+    target_sr = native_sr if sr is None else sr
+    return target_sr, _soundfile_blocks(file_path, native_sr, target_sr, block_size)
+
+
+def _soundfile_blocks(file_path, native_sr, sr, block_size):
+    """Bloques de block_size muestras: lectura con soundfile y remuestreo incremental"""
+    import soundfile as sf
+    resampler = None
+    if sr != native_sr:
+        import soxr
+        resampler = soxr.ResampleStream(native_sr, sr, 1, dtype='float32')
+
+    pending = np.zeros(0, dtype=np.float32)
+    for frames in sf.blocks(file_path, blocksize=block_size, dtype='float32', always_2d=True):
+        # Mono como librosa: media de los canales
+        samples = frames.mean(axis=1)
+        if resampler is not None:
+            samples = resampler.resample_chunk(samples)
+        pending = np.concatenate([pending, samples])
+        while len(pending) >= block_size:
+            yield pending[:block_size]
+            pending = pending[block_size:]
+
+    if resampler is not None:
+        pending = np.concatenate([pending, resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True)])
+    if len(pending):
+        yield pending
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CLIENTE HTTP COMPARTIDO PARA LLAMADAS SALIENTES
+Una sesión de requests por proceso (conexiones reutilizadas con keep-alive),
+concurrencia limitada por host, reintentos con espera exponencial aleatoria
+dentro de un plazo total y cortocircuito por host: tras varios fallos seguidos
+las llamadas fallan al instante durante un tiempo en lugar de esperar timeouts.
+Las URL base de los proveedores se pueden cambiar por variables de entorno
+(p. ej. para apuntar a un servidor local de pruebas)
+"""
+
+import os
+import sys
+import time
+import random
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# URL base de cada proveedor y la variable de entorno que la sustituye
+PROVIDER_BASE_URLS = {
+    'audd': ('AUDD_API_URL', 'https://api.audd.io/'),
+    'lyrics_ovh': ('LYRICS_OVH_API_URL', 'https://api.lyrics.ovh/v1/'),
+    'acoustid': ('ACOUSTID_API_URL', 'https://api.acoustid.org/v2/lookup'),
+    'musicbrainz': ('MUSICBRAINZ_API_URL', 'https://musicbrainz.org/ws/2/')
+}
+
+# Conexiones abiertas por host en el pool y peticiones simultáneas por host
+POOL_MAXSIZE = 8
+MAX_CONCURRENCY_PER_HOST = 4
+
+# Timeouts por intento: (conexión, lectura) en segundos
+DEFAULT_TIMEOUT = (3.05, 10.0)
+
+# Reintentos ante errores de red, 429 y 5xx: espera aleatoria en [0, base * 2**intento]
+MAX_RETRIES = 2
+BACKOFF_BASE = 0.25
+BACKOFF_MAX = 4.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Cortocircuito: fallos seguidos para abrirlo y segundos que permanece abierto
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RESET_SECONDS = 30.0
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """El host falló demasiadas veces seguidas; no se intenta hasta que pase el plazo"""
+
+
+class RequestCancelled(requests.exceptions.RequestException):
+    """Quien llama ya no quiere la respuesta (evento cancel activado)"""
+
+
+def provider_url(name):
+    """URL base de un proveedor (la variable de entorno tiene prioridad)"""
+    env_var, default = PROVIDER_BASE_URLS[name]
+    return os.environ.get(env_var) or default
+
+
+class _Circuit:
+    """Estado de un host: cerrado, abierto hasta opened_until, o medio abierto (un intento)"""
+
+    def __init__(self):
+        self.failures = 0
+        self.opened_until = 0.0
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.failures < CIRCUIT_FAILURE_THRESHOLD:
+                return True
+            if time.monotonic() < self.opened_until or self.trial_running:
+                return False
+            # Medio abierto: deja pasar una sola petición de prueba
+            self.trial_running = True
+            return True
+
+    def record(self, success):
+        with self.lock:
+            self.trial_running = False
+            if success:
+                self.failures = 0
+                return
+            self.failures += 1
+            if self.failures >= CIRCUIT_FAILURE_THRESHOLD:
+                self.opened_until = time.monotonic() + CIRCUIT_RESET_SECONDS
+
+
+class HttpClient:
+    """Sesión compartida con límites, reintentos y cortocircuito por host"""
+
+    def __init__(self):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(PROVIDER_BASE_URLS), pool_maxsize=POOL_MAXSIZE, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._hosts = {}
+        self._hosts_lock = threading.Lock()
+
+    def _host_state(self, url):
+        host = urlsplit(url).netloc
+        with self._hosts_lock:
+            if host not in self._hosts:
+                self._hosts[host] = (threading.BoundedSemaphore(MAX_CONCURRENCY_PER_HOST), _Circuit())
+            return self._hosts[host]
+
+    def request(self, method, url, timeout=DEFAULT_TIMEOUT, deadline=None, retries=MAX_RETRIES,
+                cancel=None, **kwargs):
+        """
+        Igual que requests.request, con reintentos dentro de deadline segundos
+        en total (sin límite si es None). Los cuerpos se reenvían en cada intento,
+        así que los archivos deben pasarse como bytes. Devuelve la última
+        respuesta (aunque sea un 5xx) o lanza la última excepción de red.
+        Con un threading.Event cancel, activarlo evita el siguiente intento y
+        corta la espera entre reintentos (RequestCancelled); un intento ya
+        enviado termina con su timeout.
+        """
+        semaphore, circuit = self._host_state(url)
+        end = None if deadline is None else time.monotonic() + deadline
+
+        for attempt in range(retries + 1):
+            if cancel is not None and cancel.is_set():
+                raise RequestCancelled(f"Petición cancelada: {url}")
+            if not circuit.allow():
+                raise CircuitOpenError(f"Servicio no disponible temporalmente: {urlsplit(url).netloc}")
+
+            attempt_timeout = timeout
+            if end is not None:
+                remaining = end - time.monotonic()
+                if remaining <= 0:
+                    raise requests.exceptions.Timeout(f"Plazo agotado: {url}")
+                connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+                attempt_timeout = (min(connect, remaining), min(read, remaining))
+
+            # La espera por un hueco del host también cuenta dentro del plazo
+            if not semaphore.acquire(timeout=None if end is None else max(0.0, end - time.monotonic())):
+                raise requests.exceptions.Timeout(f"Plazo agotado esperando conexión: {url}")
+            error, response = None, None
+            try:
+                response = self.session.request(method, url, timeout=attempt_timeout, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = e
+            except BaseException:
+                # Cualquier otro error (URL inválida, SSL, interrupción) cuenta como
+                # fallo: si no, una prueba en medio abierto dejaría el host bloqueado
+                circuit.record(False)
+                raise
+            finally:
+                semaphore.release()
+
+            failed = error is not None or response.status_code in RETRY_STATUSES
+            circuit.record(not failed)
+            if not failed or attempt == retries:
+                break
+
+            # Espera exponencial con jitter completo (Retry-After numérico si lo hay)
+            wait = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+            retry_after = response.headers.get('Retry-After') if response is not None else None
+            if retry_after and retry_after.isdigit():
+                wait = min(float(retry_after), BACKOFF_MAX)
+            if end is not None and time.monotonic() + wait >= end:
+                break
+            print(f"⚠️  Reintentando {urlsplit(url).netloc} ({attempt + 1}/{retries})", file=sys.stderr)
+            if cancel is not None:
+                cancel.wait(wait)
+            else:
+                time.sleep(wait)
+
+        if error is not None:
+            raise error
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_http_client():
+    """Cliente único por proceso (comparte conexiones entre hilos)"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
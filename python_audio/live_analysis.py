@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ANÁLISIS EN TIEMPO REAL (MICRÓFONO)
+Estado incremental por sesión: solo se procesan las muestras nuevas de cada
+bloque; chroma y envolvente de onsets viven en buffers circulares de tamaño
+fijo, así que el coste por actualización no crece con la duración
+"""
+
+import time
+import librosa
+import numpy as np
+
+from beat_sync import score_templates
+from analyze_audio_ultimate import estimate_key, classify_tempo, TIMELINE_CHORD_TEMPLATES
+
+# Historia de la envolvente de onsets para el tempo (segundos)
+ONSET_HISTORY = 8.0
+
+# Ventana de chroma para el acorde actual (segundos)
+CHORD_WINDOW = 1.0
+
+# Vida media del chroma acumulado para la tonalidad (segundos)
+KEY_HALF_LIFE = 30.0
+
+# Cada cuánto audio se emite una actualización (segundos)
+UPDATE_INTERVAL = 0.25
+
+# Rango de tempo buscado en la autocorrelación
+MIN_BPM = 40.0
+MAX_BPM = 240.0
+
+N_MELS = 40
+
+
+class LiveAnalyzer:
+    """Acorde, tonalidad y BPM de un flujo de audio mono, bloque a bloque"""
+
+    def __init__(self, sr=22050, n_fft=2048, hop_length=512):
+        self.sr = sr
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.frame_rate = sr / hop_length
+
+        # Bancos de filtros precalculados
+        self._window = np.hanning(n_fft).astype(np.float32)
+        self._chroma_filter = librosa.filters.chroma(sr=sr, n_fft=n_fft).astype(np.float32)
+        self._mel_filter = librosa.filters.mel(sr=sr, n_fft=n_fft, n_mels=N_MELS).astype(np.float32)
+
+        # Muestras pendientes (menos de un hop) más el contexto de la ventana
+        self._pending = np.zeros(n_fft - hop_length, dtype=np.float32)
+
+        # Buffers circulares
+        self._chroma_frames = max(1, int(CHORD_WINDOW * self.frame_rate))
+        self._chroma_ring = np.zeros((12, self._chroma_frames), dtype=np.float32)
+        self._onset_frames = max(2, int(ONSET_HISTORY * self.frame_rate))
+        self._onset_ring = np.zeros(self._onset_frames, dtype=np.float32)
+        self._frame_count = 0
+        self._previous_mel = None
+
+        # Chroma con decaimiento exponencial para la tonalidad
+        self._key_decay = 0.5 ** (1.0 / (KEY_HALF_LIFE * self.frame_rate))
+        self._key_chroma = np.zeros(12)
+
+        self._samples_seen = 0
+        self._next_update = int(UPDATE_INTERVAL * sr)
+
+    def _process_frames(self, frames):
+        """Frames (n x n_fft) de un bloque: una FFT por lote y dos productos matriciales"""
+        spectrum = np.abs(np.fft.rfft(frames * self._window, axis=1)) ** 2
+        slots = self._frame_count + np.arange(len(frames))
+
+        chroma = spectrum @ self._chroma_filter.T
+        chroma = chroma / np.maximum(chroma.max(axis=1, keepdims=True), 1e-10)
+        self._chroma_ring[:, slots % self._chroma_frames] = chroma.T
+
+        # Decaimiento exponencial frame a frame, aplicado al lote de una vez
+        decay = self._key_decay ** np.arange(len(frames) - 1, -1, -1)
+        self._key_chroma = self._key_chroma * self._key_decay ** len(frames) + decay @ chroma
+
+        # Flujo espectral positivo sobre mel en dB (como onset_strength)
+        mel_db = 10.0 * np.log10(np.maximum(spectrum @ self._mel_filter.T, 1e-10))
+        previous = self._previous_mel if self._previous_mel is not None else mel_db[0]
+        flux = np.mean(np.maximum(np.diff(np.vstack([previous, mel_db]), axis=0), 0.0), axis=1)
+        self._previous_mel = mel_db[-1]
+        self._onset_ring[slots % self._onset_frames] = flux
+
+        self._frame_count += len(frames)
+
+    def push(self, samples):
+        """
+        Añadir un bloque de muestras (float32, mono). Devuelve una actualización
+        cada UPDATE_INTERVAL segundos de audio, o None. latency_ms mide el
+        tiempo de proceso del bloque más el de la actualización.
+        """
+        started = time.perf_counter()
+        buffer = np.concatenate([self._pending, np.asarray(samples, dtype=np.float32)])
+        n_frames = max(0, (len(buffer) - self.n_fft) // self.hop_length + 1)
+        if n_frames:
+            frames = np.lib.stride_tricks.sliding_window_view(buffer, self.n_fft)[::self.hop_length][:n_frames]
+            self._process_frames(frames)
+        self._pending = buffer[n_frames * self.hop_length:]
+
+        self._samples_seen += len(samples)
+        if self._samples_seen < self._next_update:
+            return None
+        self._next_update = self._samples_seen + int(UPDATE_INTERVAL * self.sr)
+        update = self.snapshot()
+        update['latency_ms'] = (time.perf_counter() - started) * 1000.0
+        return update
+
+    def _current_bpm(self):
+        """Autocorrelación de la envolvente reciente con prior log-normal en 120 BPM"""
+        frames = min(self._frame_count, self._onset_frames)
+        if frames < self.frame_rate * 2:
+            return None
+        envelope = np.roll(self._onset_ring, -(self._frame_count % self._onset_frames))[-frames:]
+        envelope = envelope - envelope.mean()
+        autocorrelation = librosa.autocorrelate(envelope)
+
+        lags = np.arange(1, len(autocorrelation))
+        bpms = 60.0 * self.frame_rate / lags
+        valid = (bpms >= MIN_BPM) & (bpms <= MAX_BPM)
+        if not np.any(valid):
+            return None
+        prior = np.exp(-0.5 * (np.log2(bpms[valid] / 120.0)) ** 2)
+        weighted = np.maximum(autocorrelation[1:][valid], 0.0) * prior
+        if weighted.max() <= 0:
+            return None
+        return float(bpms[valid][np.argmax(weighted)])
+
+    def snapshot(self):
+        """Acorde actual, tonalidad y BPM con el estado acumulado"""
+        frames = min(self._frame_count, self._chroma_frames)
+        chord, chord_confidence = 'N', 0.0
+        if frames > 0:
+            chroma_mean = self._chroma_ring[:, :frames].mean(axis=1, keepdims=True)
+            names, scores, best = score_templates(chroma_mean, TIMELINE_CHORD_TEMPLATES)
+            chord, chord_confidence = names[best[0]], float(scores[0])
+
+        key_analysis = estimate_key(self._key_chroma) if self._key_chroma.any() else None
+        bpm = self._current_bpm()
+
+        return {
+            'time': self._samples_seen / self.sr,
+            'chord': chord,
+            'chord_confidence': chord_confidence,
+            'key': key_analysis['key'] if key_analysis else None,
+            'key_confidence': key_analysis['confidence'] if key_analysis else 0.0,
+            'bpm': bpm,
+            'tempo_classification': classify_tempo(bpm) if bpm else None
+        }
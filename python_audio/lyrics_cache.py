@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CACHÉ PERSISTENTE DE LETRAS
+Tabla SQLite por (artista, título) normalizados: las letras encontradas
+caducan a los LYRICS_TTL segundos y los "no encontrada" antes
+(NEGATIVE_TTL), para volver a preguntar sin repetir la consulta en cada
+identificación. Por encima de MAX_ENTRIES se eliminan las menos usadas. Las
+letras incluidas con la aplicación (BUNDLED_LYRICS) viven en la misma tabla
+y nunca caducan
+"""
+
+import os
+import re
+import time
+import sqlite3
+import threading
+import unicodedata
+from contextlib import closing, contextmanager
+
+DEFAULT_LYRICS_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lyrics_cache.sqlite')
+
+# Caducidad de una letra encontrada y de un "no encontrada" (segundos)
+LYRICS_TTL = 30 * 24 * 3600
+NEGATIVE_TTL = 24 * 3600
+
+# Entradas que caducan como máximo (las incluidas no cuentan)
+MAX_ENTRIES = 5000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS lyrics (
+    key TEXT PRIMARY KEY,
+    title TEXT,
+    artist TEXT,
+    lyrics TEXT,
+    source TEXT,
+    expires_at REAL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS lyrics_last_access ON lyrics(last_access);
+"""
+
+
+def normalize_key(title, artist):
+    """
+    Clave artista|título sin mayúsculas, acentos, puntuación ni añadidos entre
+    paréntesis o corchetes ("(Remastered 2009)", "[Live]")
+    """
+    def normalize(text):
+        text = unicodedata.normalize('NFKD', text or '')
+        text = ''.join(c for c in text if not unicodedata.combining(c)).lower()
+        text = re.sub(r'\([^)]*\)|\[[^\]]*\]', ' ', text)
+        text = re.sub(r'[^\w\s]', ' ', text)
+        return ' '.join(text.split())
+    return f"{normalize(artist)}|{normalize(title)}"
+
+
+class LyricsCache:
+    """Caché de letras en un archivo SQLite (seguro entre hilos y procesos)"""
+
+    def __init__(self, path=DEFAULT_LYRICS_CACHE_PATH):
+        self.path = path
+        bundled = {
+            normalize_key(title, artist): (title, artist, text)
+            for (title, artist), text in BUNDLED_LYRICS.items()
+        }
+        with self._connect() as connection:
+            connection.executescript(_SCHEMA)
+            # Letras incluidas: sin caducidad, no se desalojan. Solo se escribe si
+            # falta alguna o cambió; un arranque normal no abre transacción de escritura
+            stored = {
+                key: (lyrics, expires_at) for key, lyrics, expires_at in connection.execute(
+                    f"SELECT key, lyrics, expires_at FROM lyrics WHERE key IN ({', '.join('?' * len(bundled))})",
+                    list(bundled)
+                )
+            }
+            now = time.time()
+            missing = [
+                (key, title, artist, text, now)
+                for key, (title, artist, text) in bundled.items() if key not in stored
+            ]
+            changed = [
+                (title, artist, text, now, key)
+                for key, (title, artist, text) in bundled.items()
+                if key in stored and stored[key] != (text, None)
+            ]
+            if missing:
+                connection.executemany(
+                    "INSERT OR IGNORE INTO lyrics VALUES (?, ?, ?, ?, 'local', NULL, ?)", missing
+                )
+            if changed:
+                # Texto nuevo de una letra incluida, o un resultado remoto con su misma clave
+                connection.executemany(
+                    "UPDATE lyrics SET title = ?, artist = ?, lyrics = ?, source = 'local', "
+                    "expires_at = NULL, last_access = ? WHERE key = ?", changed
+                )
+
+    @contextmanager
+    def _connect(self):
+        """Conexión de una operación: commit (o rollback) al salir y cierre siempre"""
+        with closing(sqlite3.connect(self.path, timeout=5.0)) as connection, connection:
+            yield connection
+
+    def get(self, title, artist):
+        """Letra guardada, '' si se sabe que no existe, None si no hay dato vigente"""
+        key = normalize_key(title, artist)
+        now = time.time()
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT lyrics, expires_at FROM lyrics WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            lyrics, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                connection.execute("DELETE FROM lyrics WHERE key = ?", (key,))
+                return None
+            connection.execute("UPDATE lyrics SET last_access = ? WHERE key = ?", (now, key))
+        return lyrics or ''
+
+    def put(self, title, artist, lyrics, source='lyrics.ovh'):
+        """Guardar una letra (o '' / None: no encontrada, con caducidad más corta)"""
+        now = time.time()
+        ttl = LYRICS_TTL if lyrics else NEGATIVE_TTL
+        with self._connect() as connection:
+            # Las incluidas no se sustituyen por resultados remotos
+            connection.execute(
+                "INSERT OR REPLACE INTO lyrics "
+                "SELECT ?, ?, ?, ?, ?, ?, ? WHERE NOT EXISTS "
+                "(SELECT 1 FROM lyrics WHERE key = ? AND expires_at IS NULL)",
+                (normalize_key(title, artist), title, artist, lyrics or None, source, now + ttl, now,
+                 normalize_key(title, artist))
+            )
+            self._evict(connection)
+
+    def _evict(self, connection):
+        """Dejar como máximo MAX_ENTRIES entradas con caducidad (fuera las menos usadas)"""
+        connection.execute(
+            "DELETE FROM lyrics WHERE key IN ("
+            "SELECT key FROM lyrics WHERE expires_at IS NOT NULL "
+            "ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (MAX_ENTRIES,)
+        )
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_lyrics_cache(path=DEFAULT_LYRICS_CACHE_PATH):
+    """Caché única por proceso"""
+    global _cache
+    with _cache_lock:
+        if _cache is None or _cache.path != path:
+            _cache = LyricsCache(path)
+        return _cache
+
+
+# Letras incluidas con la aplicación: {(título, artista): letra}
+BUNDLED_LYRICS = {
+    ('What a Fool Believes', 'The Doobie Brothers'): """What a fool believes
+He sees
+No wise man has the power
+To reason away
+What seems to be
+Is always better than nothing
+And nothing at all keeps sending him
+
+Somewhere back in her long ago
+Where he can still believe there's a place in her life
+Someday, somewhere, she will return
+
+She had a place in his life
+He never made her think twice
+As he rises to her apology
+Anybody else would surely know
+He's watching her go
+
+But what a fool believes he sees
+No wise man has the power to reason away
+What seems to be
+Is always better than nothing
+There's nothing at all
+But what a fool believes he sees""",
+    
+    ('Hotel California', 'Eagles'): """On a dark desert highway, cool wind in my hair
+Warm smell of colitas, rising up through the air
+Up ahead in the distance, I saw a shimmering light
+My head grew heavy and my sight grew dim
+I had to stop for the night
+
+There she stood in the doorway
+I heard the mission bell
+And I was thinking to myself
+This could be Heaven or this could be Hell
+Then she lit up a candle and she showed me the way
+There were voices down the corridor
+I thought I heard them say
+
+Welcome to the Hotel California
+Such a lovely place (Such a lovely place)
+Such a lovely face
+Plenty of room at the Hotel California
+Any time of year (Any time of year)
+You can find it here""",
+    
+    ('Bohemian Rhapsody', 'Queen'): """Is this the real life?
+Is this just fantasy?
+Caught in a landslide
+No escape from reality
+Open your eyes, look up to the skies and see
+I'm just a poor boy, I need no sympathy
+Because I'm easy come, easy go, little high, little low
+Any way the wind blows doesn't really matter to me, to me
+
+Mama, just killed a man
+Put a gun against his head, pulled my trigger, now he's dead
+Mama, life had just begun
+But now I've gone and thrown it all away"""
+}
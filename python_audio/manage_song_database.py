@@ -5,43 +5,47 @@ Permite agregar, eliminar y gestionar canciones en la base de datos local
 """
 
 import os
-import json
 import librosa
 import numpy as np
 from shazam_integration import ShazamIntegration
+from ffmpeg_decoder import load_audio
+from audio_fingerprint import FingerprintIndex, fingerprint_file
+from song_database import DEFAULT_DATABASE_PATH
+from song_store import SongStore, DEFAULT_SONG_STORE_DIR
+
+# Las rutas de la base (y de sus audios) son relativas a este directorio, no al de trabajo
+MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 class SongDatabaseManager:
     def __init__(self):
-        self.db_file = 'local_songs_database.json'
+        self.db_file = DEFAULT_DATABASE_PATH
+        self.store_dir = DEFAULT_SONG_STORE_DIR
         self.audio_folder = 'database_audio'
         self.shazam = ShazamIntegration()
+        self.fingerprints = FingerprintIndex()
         
         # Crear carpeta para audios si no existe
-        if not os.path.exists(self.audio_folder):
-            os.makedirs(self.audio_folder)
+        os.makedirs(self.resolve_path(self.audio_folder), exist_ok=True)
         
         # Cargar base de datos existente
-        self.database = self.load_database()
+        self.store = self.load_database()
     
     def load_database(self):
-        """Cargar base de datos desde archivo JSON"""
-        if os.path.exists(self.db_file):
+        """Abrir el almacén binario; la primera vez importa el JSON anterior si existe"""
+        is_new = not SongStore.exists(self.store_dir)
+        store = SongStore(self.store_dir)
+        if is_new and os.path.exists(self.db_file):
             try:
-                with open(self.db_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                imported = store.import_json(self.db_file)
+                print(f"📦 Migradas {imported} canciones de {os.path.basename(self.db_file)}")
             except Exception as e:
-                print(f"Error cargando base de datos: {e}")
-                return {}
-        return {}
+                print(f"Error importando base de datos JSON: {e}")
+        return store
     
-    def save_database(self):
-        """Guardar base de datos en archivo JSON"""
-        try:
-            with open(self.db_file, 'w', encoding='utf-8') as f:
-                json.dump(self.database, f, indent=2, ensure_ascii=False)
-            print("✅ Base de datos guardada correctamente")
-        except Exception as e:
-            print(f"❌ Error guardando base de datos: {e}")
+    def resolve_path(self, path):
+        """Ruta guardada en la base (relativa a este directorio, quizá con '\\') a ruta real"""
+        path = path.replace('\\', os.sep)
+        return path if os.path.isabs(path) else os.path.join(MODULE_DIR, path)
     
     def add_song_from_file(self, audio_path, title=None, artist=None, album=None):
         """Agregar canción desde archivo de audio"""
@@ -79,7 +83,7 @@ class SongDatabaseManager:
             import shutil
             filename = f"{song_id}.{audio_path.split('.')[-1]}"
             dest_path = os.path.join(self.audio_folder, filename)
-            shutil.copy2(audio_path, dest_path)
+            shutil.copy2(audio_path, self.resolve_path(dest_path))
             
             # Crear entrada en base de datos
             song_entry = {
@@ -91,8 +95,12 @@ class SongDatabaseManager:
                 'added_date': self.get_current_date()
             }
             
-            self.database[song_id] = song_entry
-            self.save_database()
+            # Una fila nueva en el almacén (no se reescribe la base completa)
+            self.store.add_song(song_id, song_entry)
+            
+            # Huellas de la canción completa en el índice invertido
+            self.index_song_fingerprints(song_id, self.resolve_path(dest_path))
+            self.fingerprints.save()
             
             print(f"✅ Canción agregada: {title} - {artist}")
             return True
@@ -105,7 +113,7 @@ class SongDatabaseManager:
         """Extraer características de audio para identificación"""
         try:
             # Cargar audio
-            y, sr = librosa.load(audio_path, sr=22050, duration=60)  # Primeros 60 segundos
+            y, sr = load_audio(audio_path, sr=22050, duration=60)  # Primeros 60 segundos
             
             # Extraer características
             features = self.shazam._extract_audio_features(y, sr)
@@ -134,22 +142,61 @@ class SongDatabaseManager:
             print(f"Error extrayendo características: {e}")
             return None
     
+    def index_song_fingerprints(self, song_id, audio_path):
+        """Calcular las huellas de una canción y agregarlas al índice (sin guardarlo)"""
+        fingerprints = self.compute_song_fingerprints(audio_path)
+        if fingerprints is None:
+            return False
+        self.fingerprints.add_song(song_id, *fingerprints)
+        return True
+    
+    def compute_song_fingerprints(self, audio_path):
+        """Huellas (hashes, offsets) de un archivo, o None si no se pueden calcular"""
+        try:
+            hashes, offsets = fingerprint_file(audio_path)
+            print(f"🔑 Huellas indexadas: {len(hashes)}")
+            return hashes, offsets
+        except Exception as e:
+            print(f"❌ Error calculando huellas: {e}")
+            return None
+    
+    def rebuild_fingerprint_index(self):
+        """Recalcular el índice de huellas de todas las canciones de la base de datos"""
+        songs = []
+        for song_id, song in self.store.entries().items():
+            audio_path = self.resolve_path(song['file_path'])
+            if not os.path.exists(audio_path):
+                print(f"⚠️  Archivo no encontrado: {audio_path}")
+                continue
+            print(f"🎵 {song['title']} - {song['artist']}")
+            fingerprints = self.compute_song_fingerprints(audio_path)
+            if fingerprints is not None:
+                songs.append((song_id, *fingerprints))
+        
+        # Una sola ordenación del índice para toda la base
+        self.fingerprints.clear()
+        self.fingerprints.add_songs(songs)
+        self.fingerprints.save()
+        print(f"✅ Índice de huellas reconstruido: {len(songs)} canciones")
+    
     def remove_song(self, song_id):
         """Eliminar canción de la base de datos"""
         try:
-            if song_id not in self.database:
+            song = self.store.get(song_id)
+            if song is None:
                 print(f"❌ Canción no encontrada: {song_id}")
                 return False
             
-            song = self.database[song_id]
-            
             # Eliminar archivo de audio
-            if os.path.exists(song['file_path']):
-                os.remove(song['file_path'])
+            audio_path = self.resolve_path(song['file_path'])
+            if os.path.exists(audio_path):
+                os.remove(audio_path)
             
             # Eliminar de base de datos
-            del self.database[song_id]
-            self.save_database()
+            self.store.remove_song(song_id)
+            
+            if self.fingerprints.remove_song(song_id):
+                self.fingerprints.save()
             
             print(f"✅ Canción eliminada: {song['title']} - {song['artist']}")
             return True
@@ -160,14 +207,15 @@ class SongDatabaseManager:
     
     def list_songs(self):
         """Listar todas las canciones en la base de datos"""
-        if not self.database:
+        songs = self.store.entries()
+        if not songs:
             print("📭 Base de datos vacía")
             return
         
-        print(f"🎵 CANCIONES EN BASE DE DATOS ({len(self.database)} canciones)")
+        print(f"🎵 CANCIONES EN BASE DE DATOS ({len(songs)} canciones)")
         print("=" * 60)
         
-        for song_id, song in self.database.items():
+        for song_id, song in songs.items():
             print(f"ID: {song_id}")
             print(f"  🎵 {song['title']} - {song['artist']}")
             if song['album']:
@@ -178,14 +226,8 @@ class SongDatabaseManager:
     
     def search_songs(self, query):
         """Buscar canciones por título o artista"""
-        query = query.lower()
-        results = []
-        
-        for song_id, song in self.database.items():
-            if (query in song['title'].lower() or 
-                query in song['artist'].lower() or 
-                query in song.get('album', '').lower()):
-                results.append((song_id, song))
+        # LIKE de SQLite: sin distinguir mayúsculas (ASCII)
+        results = list(self.store.search(query).items())
         
         if results:
             print(f"🔍 RESULTADOS DE BÚSQUEDA: '{query}' ({len(results)} encontradas)")
@@ -205,8 +247,7 @@ class SongDatabaseManager:
     def export_database(self, export_path):
         """Exportar base de datos a archivo"""
         try:
-            with open(export_path, 'w', encoding='utf-8') as f:
-                json.dump(self.database, f, indent=2, ensure_ascii=False)
+            self.store.export_json(export_path)
             print(f"✅ Base de datos exportada a: {export_path}")
         except Exception as e:
             print(f"❌ Error exportando: {e}")
@@ -214,15 +255,11 @@ class SongDatabaseManager:
     def import_database(self, import_path):
         """Importar base de datos desde archivo"""
         try:
-            with open(import_path, 'r', encoding='utf-8') as f:
-                imported_db = json.load(f)
-            
             # Fusionar con base de datos actual
-            self.database.update(imported_db)
-            self.save_database()
+            self.store.import_json(import_path)
             
             print(f"✅ Base de datos importada desde: {import_path}")
-            print(f"   Total de canciones: {len(self.database)}")
+            print(f"   Total de canciones: {len(self.store)}")
         except Exception as e:
             print(f"❌ Error importando: {e}")
 
@@ -241,6 +278,7 @@ def main():
         print("5. Exportar base de datos")
         print("6. Importar base de datos")
         print("7. Agregar múltiples canciones desde carpeta")
+        print("8. Reconstruir índice de huellas acústicas")
         print("0. Salir")
         print()
         
@@ -285,6 +323,9 @@ def main():
                 if folder_path and os.path.exists(folder_path):
                     add_songs_from_folder(manager, folder_path)
             
+            elif choice == '8':
+                manager.rebuild_fingerprint_index()
+            
             else:
                 print("❌ Opción no válida")
         
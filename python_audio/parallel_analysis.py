@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ANÁLISIS PARALELO POR FRAGMENTOS
+Divide un archivo largo en fragmentos solapados, los analiza en un pool de
+procesos y une timelines, rejillas de pulsos, tempo y estadísticas de
+tonalidad en los bordes para obtener un documento equivalente al del análisis
+en serie: idéntico con un solo fragmento; con varios, pulsos y bordes de
+sección pueden moverse un frame y las medias variar ligeramente
+"""
+
+import os
+import sys
+import json
+from concurrent.futures import ProcessPoolExecutor
+import librosa
+import numpy as np
+
+from ffmpeg_decoder import load_audio
+from shared_pcm import SharedPCM
+from silence_detection import detect_activity
+from structure_segmentation import segment_structure
+from tempo_map import rhythm_envelopes, analyze_rhythm, tempo_curve, beat_grid, bar_phase, trim_weak_beats, beat_local_score
+from waveform_peaks import compute_peak_pyramid, write_peaks
+from analyze_audio_ultimate import (
+    analyze_chords_advanced, create_chord_timeline, chords_from_synced_chroma,
+    basic_feature_sums, summarize_basic_features, estimate_key,
+    main_notes_from_chroma, combine_tempo_estimates, unique_progression,
+    build_result, silent_result, structure_features, SYNC_BEATS_PER_SEGMENT, STRUCTURE_HOP_LENGTH
+)
+
+# Los bloques del timeline (4 s) y de la progresión (2 s) deben caer igual que en serie
+SEGMENT_ALIGNMENT_SECONDS = 4
+
+# Duración del núcleo de cada fragmento y contexto a cada lado (segundos)
+DEFAULT_CHUNK_DURATION = 120.0
+DEFAULT_OVERLAP = 8.0
+
+HOP_LENGTH = 512
+
+# Audio activo mínimo de un fragmento para buscar pulsos (segundos)
+MIN_RHYTHM_SECONDS = 1.0
+
+# Filas de structure_features: 12 de chroma + 12 MFCC sin el de energía
+STRUCTURE_FEATURE_ROWS = 24
+
+
+def plan_chunks(total_samples, sr, chunk_duration=DEFAULT_CHUNK_DURATION, overlap=DEFAULT_OVERLAP):
+    """
+    Núcleos contiguos alineados a múltiplos de 4 s, con contexto solapado.
+    Devuelve tuplas (inicio, inicio_núcleo, fin_núcleo, fin) en muestras.
+    """
+    align = SEGMENT_ALIGNMENT_SECONDS * sr
+    core = max(1, int(round(chunk_duration / SEGMENT_ALIGNMENT_SECONDS))) * align
+    context = int(overlap * sr)
+
+    chunks = []
+    for core_start in range(0, total_samples, core):
+        core_end = min(core_start + core, total_samples)
+        chunks.append((
+            max(0, core_start - context),
+            core_start,
+            core_end,
+            min(total_samples, core_end + context)
+        ))
+    return chunks
+
+
+def _analyze_chunk(task):
+    """Trabajo de un proceso: analizar un fragmento y devolver resultados parciales"""
+    y_chunk, sr, chunk_start, core_start, core_end, activity, sync = task
+
+    core = y_chunk[core_start - chunk_start:core_end - chunk_start]
+    core_activity = activity.slice(core_start, core_end) if activity is not None else None
+
+    partial = {
+        'core_start': core_start,
+        'core_end': core_end,
+        'timeline': [],
+        'detected_chords': []
+    }
+
+    # Bloques fijos de 2 s / 4 s: el núcleo alineado basta, el resultado es idéntico
+    if sync not in SYNC_BEATS_PER_SEGMENT:
+        timeline = create_chord_timeline(core, sr, core_activity)
+        for entry in timeline:
+            entry['start'] += core_start / sr
+        partial['timeline'] = timeline
+        partial['detected_chords'] = analyze_chords_advanced(core, sr, core_activity)['detected_chords']
+
+    # Todo se calcula con contexto y se conservan solo los resultados del núcleo
+    def in_core(positions):
+        return (positions >= core_start) & (positions < core_end)
+
+    # Chroma, pulsos, onsets, tempo local y estructura sobre el audio activo del
+    # fragmento, como en serie; las posiciones vuelven a la línea de tiempo original
+    chunk_activity = activity.slice(chunk_start, chunk_start + len(y_chunk)) if activity is not None else None
+    y_active = chunk_activity.active_audio(y_chunk) if chunk_activity is not None else y_chunk
+
+    def to_original(positions):
+        positions = np.asarray(positions, dtype=np.int64)
+        local = chunk_activity.to_original(positions) if chunk_activity is not None else positions
+        return chunk_start + local
+
+    partial['chroma'] = np.zeros((12, 0), dtype=np.float32)
+    partial['frame_positions'] = np.zeros(0, dtype=np.int64)
+    if len(y_active) > 0:
+        chroma = librosa.feature.chroma_stft(y=y_active, sr=sr, hop_length=HOP_LENGTH)
+        frame_positions = to_original(np.arange(chroma.shape[1]) * HOP_LENGTH)
+        partial['chroma'] = chroma[:, in_core(frame_positions)].astype(np.float32)
+        partial['frame_positions'] = frame_positions[in_core(frame_positions)]
+
+    partial.update({
+        'beats': np.zeros(0, dtype=np.int64),
+        'beat_strength': np.zeros(0, dtype=np.float32),
+        'onset_positions': np.zeros(0, dtype=np.int64),
+        'onset_envelope': np.zeros(0, dtype=np.float32),
+        'tempo': None,
+        'tempo_positions': np.zeros(0, dtype=np.int64),
+        'local_tempo': np.zeros(0, dtype=np.float32),
+        'onsets': np.zeros(0, dtype=np.int64),
+        'structure_features': np.zeros((STRUCTURE_FEATURE_ROWS, 0), dtype=np.float32),
+        'structure_energy': np.zeros(0, dtype=np.float32),
+        'structure_positions': np.zeros(0, dtype=np.int64)
+    })
+    # Un fragmento en silencio (o casi) no aporta pulsos
+    if len(y_active) >= MIN_RHYTHM_SECONDS * sr:
+        # Un solo espectrograma mel y un solo tempograma
+        envelopes = rhythm_envelopes(y_active, sr, HOP_LENGTH)
+        rhythm = analyze_rhythm(
+            envelopes['onset_envelope'], sr, HOP_LENGTH, envelopes['bass_envelope'], trim=False
+        )
+        beat_frames = rhythm['beat_frames']
+        beats = to_original(librosa.frames_to_samples(beat_frames, hop_length=HOP_LENGTH))
+        partial['beats'] = beats[in_core(beats)]
+        partial['beat_strength'] = envelopes['bass_envelope'][
+            np.minimum(beat_frames, len(envelopes['bass_envelope']) - 1)
+        ][in_core(beats)]
+        onset_positions = to_original(np.arange(len(envelopes['onset_envelope'])) * HOP_LENGTH)
+        partial['onset_positions'] = onset_positions[in_core(onset_positions)]
+        partial['onset_envelope'] = beat_local_score(
+            envelopes['onset_envelope'], rhythm['tempo'], sr, HOP_LENGTH
+        )[in_core(onset_positions)].astype(np.float32)
+        partial['tempo'] = rhythm['tempo']
+
+        tempo_positions = to_original(np.arange(len(rhythm['local_tempo'])) * HOP_LENGTH)
+        partial['tempo_positions'] = tempo_positions[in_core(tempo_positions)]
+        partial['local_tempo'] = rhythm['local_tempo'][in_core(tempo_positions)]
+
+        onsets = to_original(librosa.frames_to_samples(envelopes['onset_frames'], hop_length=HOP_LENGTH))
+        partial['onsets'] = onsets[in_core(onsets)]
+
+        features, energy = structure_features(y_active, sr)
+        positions = to_original(np.arange(features.shape[1]) * STRUCTURE_HOP_LENGTH)
+        partial['structure_features'] = features[:, in_core(positions)].astype(np.float32)
+        partial['structure_energy'] = energy[in_core(positions)].astype(np.float32)
+        partial['structure_positions'] = positions[in_core(positions)]
+
+    # Estadísticas espectrales sobre el audio activo del núcleo (sumas combinables)
+    active_core = core_activity.active_audio(core) if core_activity is not None else core
+    if len(active_core) > 0:
+        partial['basic_sums'], partial['basic_counts'] = basic_feature_sums(active_core, sr)
+
+    return partial
+
+
+def _analyze_shared_chunk(task):
+    """Igual que _analyze_chunk, leyendo el fragmento del bloque compartido sin copiarlo"""
+    descriptor, chunk_start, chunk_end, core_start, core_end, activity, sync = task
+    pcm = SharedPCM.attach(descriptor)
+    try:
+        return _analyze_chunk((
+            pcm.array[chunk_start:chunk_end], pcm.sr, chunk_start, core_start, core_end, activity, sync
+        ))
+    finally:
+        pcm.close()
+
+
+def stitch_beats(parts, sr):
+    """Unir las rejillas de pulsos eliminando duplicados en los bordes"""
+    beats = np.sort(np.concatenate([part['beats'] for part in parts])) if parts else np.array([])
+    if len(beats) < 3:
+        return beats
+
+    min_spacing = 0.5 * np.median(np.diff(beats))
+    keep = [beats[0]]
+    for beat in beats[1:]:
+        if beat - keep[-1] >= min_spacing:
+            keep.append(beat)
+    return np.array(keep, dtype=np.int64)
+
+
+def merge_chunk_results(parts, total_samples, sr, activity=None, sync=None):
+    """Combinar los resultados parciales en el documento final"""
+    parts = sorted(parts, key=lambda part: part['core_start'])
+
+    chroma = np.concatenate([part['chroma'] for part in parts], axis=1)
+    frame_positions = np.concatenate([part['frame_positions'] for part in parts])
+
+    # Tonalidad y notas: chroma medio de los frames (solo hay activos; suma exacta entre fragmentos)
+    chroma_mean = np.mean(chroma, axis=1)
+    key_analysis = estimate_key(chroma_mean)
+    notes = main_notes_from_chroma(chroma_mean)
+
+    # Tempo: rejilla unida (sin los pulsos débiles de los extremos, como en serie)
+    # + onsets de todos los fragmentos
+    beats = stitch_beats(parts, sr)
+    beats = beats[trim_weak_beats(
+        beats,
+        np.concatenate([part['onset_positions'] for part in parts]),
+        np.concatenate([part['onset_envelope'] for part in parts])
+    )]
+    # Tempo global: mediana del tempo de cada fragmento ponderada por sus pulsos
+    # (con un solo fragmento, el mismo tempo que en serie)
+    rhythmic = [part for part in parts if part['tempo'] is not None]
+    if rhythmic:
+        weights = [max(1, len(part['beats'])) for part in rhythmic]
+        tempo1 = float(np.median(np.repeat([part['tempo'] for part in rhythmic], weights)))
+    else:
+        tempo1 = 120.0
+    # Intervalos entre onsets en el audio activo, como en serie
+    onsets = np.concatenate([part['onsets'] for part in parts])
+    onset_times = (activity.to_active(onsets) if activity is not None else onsets) / sr
+
+    # Tiempos fuertes: fase del compás con más graves sobre la rejilla unida
+    all_beats = np.concatenate([part['beats'] for part in parts])
+    all_strength = np.concatenate([part['beat_strength'] for part in parts])
+    order = np.argsort(all_beats, kind='stable')
+    phase = bar_phase(all_strength[order][np.searchsorted(all_beats[order], beats)])
+
+    tempo_analysis = {
+        'bpm': combine_tempo_estimates(tempo1, onset_times),
+        'confidence': 0.8,
+        'beat_grid': beat_grid(beats, phase, sr),
+        'tempo_curve': tempo_curve(
+            np.concatenate([part['tempo_positions'] for part in parts]),
+            np.concatenate([part['local_tempo'] for part in parts]),
+            sr, total_samples
+        )
+    }
+
+    # Acordes: sincronizados con la rejilla unida o bloques fijos concatenados
+    if sync in SYNC_BEATS_PER_SEGMENT and len(beats) > 1:
+        chord_analysis = chords_from_synced_chroma(
+            chroma, frame_positions, beats, total_samples, sr,
+            activity, SYNC_BEATS_PER_SEGMENT[sync], phase=phase
+        )
+        timeline = chord_analysis['timeline']
+    else:
+        sync = None
+        timeline = [entry for part in parts for entry in part['timeline']]
+        detected_chords = [chord for part in parts for chord in part['detected_chords']]
+        chord_analysis = {
+            'progression': unique_progression(detected_chords),
+            'detected_chords': detected_chords
+        }
+
+    # Estructura (chroma + timbre, como en serie) sobre la rejilla de pulsos unida
+    structure = segment_structure(
+        np.concatenate([part['structure_features'] for part in parts], axis=1),
+        np.concatenate([part['structure_positions'] for part in parts]),
+        beats, total_samples, sr, activity,
+        energy=np.concatenate([part['structure_energy'] for part in parts])
+    )
+
+    # Características básicas: sumar sumas y conteos
+    sums, counts = {}, {}
+    for part in parts:
+        if 'basic_sums' not in part:
+            continue
+        for name, value in part['basic_sums'].items():
+            sums[name] = sums.get(name, 0) + value
+            counts[name] = counts.get(name, 0) + part['basic_counts'][name]
+    basic_analysis = summarize_basic_features(sums, counts) if sums else {}
+
+    result = build_result(
+        total_samples / sr, sr, key_analysis, tempo_analysis, chord_analysis,
+        timeline, notes, basic_analysis, activity, sync, structure,
+        analysis_method='ultimate_v2_parallel'
+    )
+    result['chunks'] = len(parts)
+    return result
+
+
+def analyze_audio_parallel(file_path, workers=None, chunk_duration=DEFAULT_CHUNK_DURATION,
+                           overlap=DEFAULT_OVERLAP, skip_silence=True, sync=None, peaks_dir=None):
+    """
+    Análisis completo de un archivo largo repartido en un pool de procesos.
+    Produce un documento equivalente al de analyze_audio_complete (ver el
+    docstring del módulo para las diferencias con varios fragmentos).
+    """
+    try:
+        print(f"Iniciando analisis paralelo de: {file_path}", file=sys.stderr)
+
+        y, sr = load_audio(file_path, sr=None)
+        print(f"Audio cargado: {len(y) / sr:.2f}s, {sr}Hz", file=sys.stderr)
+
+        if peaks_dir:
+            write_peaks(peaks_dir, compute_peak_pyramid(y), sr, len(y))
+
+        activity = detect_activity(y, sr) if skip_silence else None
+        if activity is not None and not activity.has_activity:
+            print("Audio sin actividad: se omite el analisis", file=sys.stderr)
+            return silent_result(len(y), sr, activity, analysis_method='ultimate_v2_parallel')
+
+        chunks = plan_chunks(len(y), sr, chunk_duration, overlap)
+        # Más procesos que núcleos solo añade cambios de contexto
+        cpus = os.cpu_count() or 1
+        workers = min(workers or cpus, cpus, len(chunks))
+        print(f"Fragmentos: {len(chunks)}, procesos: {workers}", file=sys.stderr)
+
+        if workers <= 1:
+            parts = [
+                _analyze_chunk((y[start:end], sr, start, core_start, core_end, activity, sync))
+                for start, core_start, core_end, end in chunks
+            ]
+        else:
+            # Los procesos reciben un descriptor del audio compartido, no copias de los fragmentos
+            with SharedPCM.create(y, sr) as pcm:
+                tasks = [
+                    (pcm.descriptor(), start, end, core_start, core_end, activity, sync)
+                    for start, core_start, core_end, end in chunks
+                ]
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    parts = list(pool.map(_analyze_shared_chunk, tasks))
+
+        result = merge_chunk_results(parts, len(y), sr, activity, sync)
+        print("Analisis completado exitosamente", file=sys.stderr)
+        return result
+
+    except Exception as e:
+        print(f"Error en analisis paralelo: {e}", file=sys.stderr)
+        return {
+            'success': False,
+            'error': str(e),
+            'analysis_method': 'ultimate_v2_parallel'
+        }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Uso: python parallel_analysis.py <archivo_audio> [procesos]")
+        sys.exit(1)
+
+    result = analyze_audio_parallel(
+        sys.argv[1],
+        workers=int(sys.argv[2]) if len(sys.argv) > 2 else None
+    )
+    print(json.dumps(result, ensure_ascii=False, separators=(',', ':')))
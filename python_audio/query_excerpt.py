@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FRAGMENTO COMPACTO PARA IDENTIFICACIÓN REMOTA
+En lugar de subir el archivo original se envían EXCERPT_SECONDS segundos en
+mono a EXCERPT_SR Hz, tomados de la zona con más energía de la canción y
+codificados en MP3 con ffmpeg (WAV de 16 bits si ffmpeg no está). Un archivo
+de varios MB queda en unas decenas de KB y ya no hay límite de tamaño
+"""
+
+import io
+import sys
+import wave
+import subprocess
+import numpy as np
+
+EXCERPT_SR = 16000
+EXCERPT_SECONDS = 12.0
+EXCERPT_BITRATE = '48k'
+
+# Resolución con la que se busca la ventana de más energía (segundos)
+ENERGY_HOP_SECONDS = 0.5
+
+
+def loudest_window(y, sr, seconds=EXCERPT_SECONDS):
+    """Tramo de seconds segundos con más energía (el audio completo si es más corto)"""
+    window = int(seconds * sr)
+    if len(y) <= window:
+        return y
+    hop = int(ENERGY_HOP_SECONDS * sr)
+    n_hops = len(y) // hop
+    energy = np.square(y[:n_hops * hop], dtype=np.float64).reshape(n_hops, hop).sum(axis=1)
+    # Energía de cada ventana que empieza en un múltiplo de hop (suma deslizante)
+    hops_per_window = window // hop
+    cumulative = np.concatenate([[0.0], np.cumsum(energy)])
+    window_energy = cumulative[hops_per_window:] - cumulative[:-hops_per_window]
+    start = int(np.argmax(window_energy)) * hop
+    return y[start:start + window]
+
+
+def _encode_wav(y, sr):
+    pcm = (np.clip(y, -1.0, 1.0) * 32767).astype('<i2')
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sr)
+        f.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+def encode_excerpt(y, sr):
+    """Codificar en MP3 por un pipe de ffmpeg; WAV de 16 bits si falla. Devuelve (bytes, extensión)"""
+    from ffmpeg_decoder import ffmpeg_available
+    if ffmpeg_available():
+        cmd = [
+            'ffmpeg', '-nostdin', '-hide_banner', '-loglevel', 'error',
+            '-f', 'f32le', '-ar', str(sr), '-ac', '1', '-i', 'pipe:0',
+            '-c:a', 'libmp3lame', '-b:a', EXCERPT_BITRATE, '-f', 'mp3', 'pipe:1'
+        ]
+        try:
+            process = subprocess.run(
+                cmd, input=np.asarray(y, dtype='<f4').tobytes(), capture_output=True, check=True
+            )
+            if process.stdout:
+                return process.stdout, 'mp3'
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"⚠️  No se pudo codificar en MP3, se envía WAV: {e}", file=sys.stderr)
+    return _encode_wav(y, sr), 'wav'
+
+
+def make_query_excerpt(audio_path, audio=None):
+    """
+    Fragmento listo para subir: (bytes, extensión). audio=(y, sr) ya
+    decodificado evita volver a leer el archivo.
+    """
+    if audio is not None:
+        y, sr = audio
+        # Elegir la ventana antes de remuestrear: solo se convierten esos segundos
+        y = loudest_window(np.asarray(y, dtype=np.float32), sr)
+        if sr != EXCERPT_SR:
+            import librosa
+            y = librosa.resample(y, orig_sr=sr, target_sr=EXCERPT_SR)
+    else:
+        from ffmpeg_decoder import load_audio
+        y, _ = load_audio(audio_path, sr=EXCERPT_SR)
+        y = loudest_window(y, EXCERPT_SR)
+    return encode_excerpt(y, EXCERPT_SR)
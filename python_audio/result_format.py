@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FORMATO DE RESULTADOS - TIMELINES COLUMNARES Y SERIALIZACIÓN BINARIA
+Codifica timelines completos como columnas (tiempo, id de acorde, confianza)
+con una tabla de vocabulario, y serializa el resultado a JSON, msgpack o npz
+"""
+
+import io
+import json
+import numpy as np
+
+# Entradas del timeline "clásico" que se mantienen por compatibilidad
+TIMELINE_PREVIEW_ENTRIES = 15
+
+# Acordes de la progresión "clásica" que se muestran en la interfaz
+PROGRESSION_PREVIEW_CHORDS = 8
+
+SUPPORTED_FORMATS = ('json', 'msgpack', 'npz')
+
+# Claves del timeline columnar que se guardan como arrays en npz
+_COLUMN_DTYPES = {
+    'time': np.float32,
+    'chord': np.uint16,
+    'confidence': np.float32,
+    'progression': np.uint16
+}
+
+
+def format_time(seconds):
+    """Formatear segundos como m:ss"""
+    minutes = int(seconds // 60)
+    secs = int(seconds % 60)
+    return f"{minutes}:{secs:02d}"
+
+
+def encode_timeline_columnar(entries, progression=None):
+    """
+    Codificar entradas {'start', 'chord', 'confidence'} como columnas.
+    Los acordes se guardan como índices a la tabla 'vocabulary'.
+    """
+    vocabulary = []
+    index = {}
+
+    def chord_id(chord):
+        if chord not in index:
+            index[chord] = len(vocabulary)
+            vocabulary.append(chord)
+        return index[chord]
+
+    columnar = {
+        'vocabulary': vocabulary,
+        'time': [round(float(entry['start']), 3) for entry in entries],
+        'chord': [chord_id(entry['chord']) for entry in entries],
+        'confidence': [round(float(entry['confidence']), 4) for entry in entries]
+    }
+
+    if progression is not None:
+        columnar['progression'] = [chord_id(chord) for chord in progression]
+
+    return columnar
+
+
+def decode_timeline_columnar(columnar):
+    """Reconstruir las entradas {'start', 'chord', 'confidence'} desde columnas"""
+    vocabulary = list(columnar['vocabulary'])
+    return [
+        {'start': float(t), 'chord': vocabulary[int(c)], 'confidence': float(conf)}
+        for t, c, conf in zip(columnar['time'], columnar['chord'], columnar['confidence'])
+    ]
+
+
+def legacy_timeline(entries, limit=TIMELINE_PREVIEW_ENTRIES):
+    """Timeline con el formato clásico {'time': 'm:ss', 'chord', 'confidence'}"""
+    selected = entries if limit is None else entries[:limit]
+    return [
+        {
+            'time': format_time(entry['start']),
+            'chord': entry['chord'],
+            'confidence': entry['confidence']
+        }
+        for entry in selected
+    ]
+
+
+def serialize_result(result, fmt='json'):
+    """Serializar un resultado de análisis a bytes en el formato indicado"""
+    if fmt == 'json':
+        return json.dumps(result, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    if fmt == 'msgpack':
+        try:
+            import msgpack
+        except ImportError:
+            raise RuntimeError("msgpack no está instalado. Ejecuta: pip install msgpack")
+        return msgpack.packb(result, use_bin_type=True, use_single_float=True)
+
+    if fmt == 'npz':
+        # Columnas como arrays tipados; el resto del resultado como JSON embebido
+        meta = dict(result)
+        arrays = {}
+        columnar = meta.pop('chord_timeline', None)
+        if columnar:
+            arrays['chord_vocabulary'] = np.array(columnar['vocabulary'], dtype=np.str_)
+            for key, dtype in _COLUMN_DTYPES.items():
+                if key in columnar:
+                    arrays[f'chord_{key}'] = np.asarray(columnar[key], dtype=dtype)
+        arrays['meta'] = np.frombuffer(
+            json.dumps(meta, ensure_ascii=False).encode('utf-8'), dtype=np.uint8
+        )
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **arrays)
+        return buffer.getvalue()
+
+    raise ValueError(f"Formato no soportado: {fmt}")
+
+
+def deserialize_result(data, fmt='json'):
+    """Leer un resultado serializado con serialize_result"""
+    if fmt == 'json':
+        return json.loads(data.decode('utf-8') if isinstance(data, bytes) else data)
+
+    if fmt == 'msgpack':
+        import msgpack
+        return msgpack.unpackb(data, raw=False)
+
+    if fmt == 'npz':
+        with np.load(io.BytesIO(data), allow_pickle=False) as archive:
+            result = json.loads(archive['meta'].tobytes().decode('utf-8'))
+            if 'chord_vocabulary' in archive.files:
+                columnar = {'vocabulary': archive['chord_vocabulary'].tolist()}
+                for key in _COLUMN_DTYPES:
+                    if f'chord_{key}' in archive.files:
+                        columnar[key] = archive[f'chord_{key}'].tolist()
+                result['chord_timeline'] = columnar
+        return result
+
+    raise ValueError(f"Formato no soportado: {fmt}")
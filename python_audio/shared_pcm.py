@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AUDIO PCM EN MEMORIA COMPARTIDA
+El proceso coordinador decodifica una vez a un bloque de
+multiprocessing.shared_memory y pasa a los procesos trabajadores un
+descriptor (nombre, muestras, sr) en lugar de la ruta. Los trabajadores se
+conectan sin copiar y el bloque se libera cuando el coordinador termina.
+El mapeo de cada proceso se deshace cuando muere la última vista del array,
+nunca antes: leer una vista después de close() no puede acabar en segfault
+"""
+
+import weakref
+from multiprocessing import shared_memory
+import numpy as np
+
+PCM_DTYPE = np.float32
+
+
+class SharedPCM:
+    """Audio mono float32 en un bloque de memoria compartida"""
+
+    def __init__(self, shm, samples, sr, owner):
+        self._shm = shm
+        self.samples = int(samples)
+        self.sr = int(sr)
+        self.owner = owner
+        self.array = np.ndarray((self.samples,), dtype=PCM_DTYPE, buffer=shm.buf)
+        # Las vistas (cortes, np.asarray) mantienen vivo self.array a través de
+        # .base; el mapeo se cierra cuando el recolector libera el último
+        self._unmap = weakref.finalize(self.array, shm.close)
+        # Al salir del intérprete el sistema libera el mapeo; cerrarlo antes
+        # dejaría colgando vistas que aún se usen durante el apagado
+        self._unmap.atexit = False
+
+    @classmethod
+    def create(cls, y, sr):
+        """Copiar un audio ya decodificado a un bloque nuevo (una sola copia)"""
+        y = np.asarray(y, dtype=PCM_DTYPE)
+        # Un bloque de 0 bytes no es válido
+        shm = shared_memory.SharedMemory(create=True, size=max(1, y.nbytes))
+        pcm = cls(shm, len(y), sr, owner=True)
+        pcm.array[:] = y
+        return pcm
+
+    @classmethod
+    def attach(cls, descriptor):
+        """Conectarse desde otro proceso al bloque de un descriptor"""
+        try:
+            # Python 3.13+: el bloque pertenece al coordinador, no al rastreador de este proceso
+            shm = shared_memory.SharedMemory(name=descriptor['name'], track=False)
+        except TypeError:
+            shm = shared_memory.SharedMemory(name=descriptor['name'])
+        return cls(shm, descriptor['samples'], descriptor['sr'], owner=False)
+
+    def descriptor(self):
+        """Lo único que viaja a los trabajadores (serializable con pickle o JSON)"""
+        return {'name': self._shm.name, 'samples': self.samples, 'sr': self.sr}
+
+    def close(self):
+        """
+        Soltar la vista de este proceso (el mapeo se deshace en cuanto no
+        quede ninguna otra viva); el coordinador además destruye el nombre
+        del bloque. Se puede llamar más de una vez.
+        """
+        if self.array is None:
+            return
+        self.array = None
+        if self.owner:
+            self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
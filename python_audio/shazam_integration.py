@@ -7,91 +7,277 @@ INTEGRACIÓN COMPLETA TIPO SHAZAM
 - Descarga de YouTube
 """
 
-import requests
-import json
+import importlib
 import os
 import re
+import sys
 import tempfile
+import time
+import queue
+import threading
 from urllib.parse import quote_plus
+from http_client import get_http_client, provider_url
+
+# Las firmas de la base local se calculan sobre los primeros 60 s a 22050 Hz
+LOCAL_MATCH_SR = 22050
+LOCAL_MATCH_SECONDS = 60
+
+# Fragmentos cortos (grabaciones del micrófono) se identifican segundo a segundo
+SHORT_CLIP_SECONDS = 15
+CLIP_STEP_SECONDS = 1.0
+
+# Canciones de ejemplo si no existe la base local
+DEFAULT_SONG_DATABASE = {
+    'what_a_fool_believes': {
+        'title': 'What a Fool Believes',
+        'artist': 'The Doobie Brothers',
+        'album': 'Minute by Minute',
+        'features': {
+            'tempo': 126.0,
+            'chroma': [0.8, 0.3, 0.6, 0.2, 0.7, 0.4, 0.5, 0.9, 0.3, 0.6, 0.2, 0.4],
+            'spectral_centroid': 2100.0
+        }
+    },
+    'hotel_california': {
+        'title': 'Hotel California',
+        'artist': 'Eagles',
+        'album': 'Hotel California',
+        'features': {
+            'tempo': 75.0,
+            'chroma': [0.6, 0.8, 0.3, 0.7, 0.2, 0.5, 0.4, 0.6, 0.9, 0.3, 0.5, 0.2],
+            'spectral_centroid': 1800.0
+        }
+    },
+    'bohemian_rhapsody': {
+        'title': 'Bohemian Rhapsody',
+        'artist': 'Queen',
+        'album': 'A Night at the Opera',
+        'features': {
+            'tempo': 72.0,
+            'chroma': [0.9, 0.4, 0.7, 0.3, 0.8, 0.5, 0.6, 0.7, 0.4, 0.8, 0.3, 0.6],
+            'spectral_centroid': 2300.0
+        }
+    }
+}
+
+# Métodos de identificación (se ejecutan a la vez): plazo en segundos y confianza
+# mínima para ganar sin esperar a los demás
+IDENTIFICATION_BACKENDS = {
+    'audd': {'deadline': 30.0, 'min_confidence': 0.9},
+    'acrcloud': {'deadline': 30.0, 'min_confidence': 0.9},
+    'local': {'deadline': 60.0, 'min_confidence': 0.5}
+}
+
+# Segundos que se espera, tras elegir ganador, a que los demás métodos paren
+# en su siguiente comprobación de cancelación (si no, quedan 'abandoned')
+CANCEL_GRACE_SECONDS = 0.1
+
+# Catálogo de las canciones de ejemplo (se construye la primera vez que se usa)
+_default_catalog = None
+
+def _cancelled(cancel):
+    """Otro método ya ganó: no vale la pena seguir"""
+    return cancel is not None and cancel.is_set()
 
 class ShazamIntegration:
     def __init__(self):
+        # URL base configurables por entorno (AUDD_API_URL, LYRICS_OVH_API_URL, ...)
         self.apis = {
-            'audd': 'https://api.audd.io/',
-            'acoustid': 'https://api.acoustid.org/v2/lookup',
-            'musicbrainz': 'https://musicbrainz.org/ws/2/'
+            name: provider_url(name) for name in ('audd', 'lyrics_ovh', 'acoustid', 'musicbrainz')
         }
+        self.http = get_http_client()
         
-    def identify_song_complete(self, audio_path):
-        """Identificación completa de canción con múltiples métodos"""
+    def identify_song_complete(self, audio_path, audio=None, frame_features=None, defer_lyrics=True):
+        """
+        Identificación completa de canción con múltiples métodos.
+        audio=(y, sr) ya decodificado evita decodificar otra vez para el análisis local,
+        y frame_features (de extract_frame_features o identification_features) evita
+        recalcular tempo, chroma y MFCC.
+        Con defer_lyrics la respuesta no espera a la letra (ver _enrich_song_data).
+        """
         try:
-            # Método 1: AudD API (más preciso)
-            result = self._identify_with_audd(audio_path)
-            if result.get('identified'):
-                return self._enrich_song_data(result)
-            
-            # Método 2: ACRCloud (alternativo)
-            result = self._identify_with_acrcloud(audio_path)
-            if result.get('identified'):
-                return self._enrich_song_data(result)
-            
-            # Método 3: Análisis local mejorado
-            result = self._identify_local_enhanced(audio_path)
-            if result.get('identified'):
-                return self._enrich_song_data(result)
+            self._preload_backend_modules()
+            audd_audio, local_audio = self._backend_audio(audio)
+            
+            # AudD API (más preciso), ACRCloud (alternativo) y análisis local mejorado, a la vez
+            result, backends = self._identify_concurrently({
+                'audd': lambda cancel: self._identify_with_audd(audio_path, audd_audio, cancel),
+                'acrcloud': lambda cancel: self._identify_with_acrcloud(audio_path),
+                'local': lambda cancel: self._identify_local_enhanced(
+                    audio_path, local_audio, frame_features, cancel
+                )
+            })
+            if result is not None:
+                result = self._enrich_song_data(result, defer_lyrics)
+                result['backends'] = backends
+                return result
             
             return {
                 'identified': False,
                 'title': 'No identificado',
                 'artist': 'No identificado',
-                'confidence': 0.0
+                'confidence': 0.0,
+                'backends': backends
             }
             
         except Exception as e:
             print(f"Error en identificación: {e}")
             return {'identified': False}
     
-    def _identify_with_audd(self, audio_path):
-        """Identificar con AudD API"""
+    @staticmethod
+    def _preload_backend_modules():
+        """
+        Importar en este hilo lo que usan los métodos: librosa y scipy cargan
+        submódulos de forma perezosa y, si dos hilos hacen la primera
+        importación a la vez, uno puede ver un módulo a medio inicializar
+        """
+        for name in ('librosa.beat', 'librosa.feature', 'audio_fingerprint', 'query_excerpt'):
+            importlib.import_module(name)  # audio_fingerprint: scipy.ndimage
+    
+    @staticmethod
+    def _backend_audio(audio):
+        """
+        Copias propias del tramo que lee cada método: (ventana de AudD, inicio
+        para el análisis local). Los métodos que pierden pueden seguir
+        ejecutándose hasta su siguiente comprobación de cancelación, cuando
+        quien llama ya puede haber reutilizado o liberado su audio.
+        """
+        if audio is None:
+            return None, None
+        import numpy as np
+        from query_excerpt import loudest_window
+        
+        y, sr = audio
+        return (
+            (np.array(loudest_window(y, sr), dtype=np.float32), sr),
+            (np.array(y[:int(LOCAL_MATCH_SECONDS * sr)], dtype=np.float32), sr)
+        )
+    
+    def _identify_concurrently(self, backends):
+        """
+        Ejecutar los métodos {nombre: función(cancel)} a la vez, cada uno con el
+        plazo de IDENTIFICATION_BACKENDS. Gana el primero que identifica con la
+        confianza mínima de su método; entonces se activa el threading.Event
+        cancel compartido y los demás paran en su siguiente comprobación. Los que
+        paran en CANCEL_GRACE_SECONDS quedan como 'cancelled'; los que no (p. ej.
+        una subida ya en vuelo) como 'abandoned': siguen en su hilo daemon y sus
+        errores van a stderr porque pueden llegar después de devolver el
+        resultado. Si ninguno llega al mínimo vale el de más confianza.
+        Devuelve (resultado o None, latencias).
+        """
+        start = time.perf_counter()
+        results = queue.Queue()
+        cancel = threading.Event()
+        
+        def run(name, identify):
+            try:
+                result = identify(cancel) or {'identified': False}
+                status = 'identified' if result.get('identified') else 'not_identified'
+            except Exception as e:
+                result, status = {'identified': False}, 'error'
+                print(f"Error en identificación ({name}): {e}", file=sys.stderr)
+            if cancel.is_set():
+                status = 'cancelled'
+            results.put((name, result, status, time.perf_counter() - start))
+        
+        for name, identify in backends.items():
+            threading.Thread(target=run, args=(name, identify), daemon=True).start()
+        
+        deadlines = {name: start + IDENTIFICATION_BACKENDS[name]['deadline'] for name in backends}
+        timings = {}
+        pending = set(backends)
+        winner, best = None, None
+        while pending and winner is None:
+            timeout = min(deadlines[name] for name in pending) - time.perf_counter()
+            try:
+                name, result, status, latency = results.get(timeout=max(0.0, timeout))
+            except queue.Empty:
+                now = time.perf_counter()
+                for name in [name for name in pending if deadlines[name] <= now]:
+                    pending.discard(name)
+                    timings[name] = {'status': 'timeout', 'latency': round(now - start, 3)}
+                continue
+            
+            pending.discard(name)
+            timings[name] = {'status': status, 'latency': round(latency, 3)}
+            if result.get('identified'):
+                confidence = result.get('confidence', 0.0)
+                if confidence >= IDENTIFICATION_BACKENDS[name]['min_confidence']:
+                    winner = result
+                elif best is None or confidence > best.get('confidence', 0.0):
+                    best = result
+        
+        # Los que siguen (solo quedan si hay ganador) deben parar; los que
+        # agotaron su plazo también, aunque ya no se espere su resultado
+        cancel.set()
+        grace_end = time.perf_counter() + CANCEL_GRACE_SECONDS
+        while pending:
+            try:
+                name, _, status, latency = results.get(timeout=max(0.0, grace_end - time.perf_counter()))
+            except queue.Empty:
+                break
+            if name in pending:
+                pending.discard(name)
+                timings[name] = {'status': status, 'latency': round(latency, 3)}
+        
+        for name in pending:
+            timings[name] = {'status': 'abandoned', 'latency': round(time.perf_counter() - start, 3)}
+        return winner or best, timings
+    
+    def _identify_with_audd(self, audio_path, audio=None, cancel=None):
+        """
+        Identificar con AudD API. Se sube un fragmento compacto (mono, 16 kHz,
+        los 12 s con más energía, MP3) en lugar del archivo: cualquier tamaño
+        de archivo sirve y la subida es decenas de veces menor.
+        Con cancel activado no se sube ni se reintenta.
+        """
         try:
-            # Verificar tamaño del archivo
-            if os.path.getsize(audio_path) > 3 * 1024 * 1024:  # Max 3MB
+            from query_excerpt import make_query_excerpt
+            from http_client import RequestCancelled
+            
+            if _cancelled(cancel):
                 return {'identified': False}
             
-            with open(audio_path, 'rb') as f:
-                files = {'file': f}
-                data = {
-                    'return': 'apple_music,spotify,lyrics,deezer',
-                    'api_token': 'test'  # Usar token real en producción
-                }
-                
-                response = requests.post(
-                    self.apis['audd'], 
-                    files=files, 
-                    data=data, 
-                    timeout=30
-                )
+            # En memoria: un reintento vuelve a enviar el fragmento completo
+            excerpt, extension = make_query_excerpt(audio_path, audio)
+            name = f"{os.path.splitext(os.path.basename(audio_path or 'audio'))[0]}.{extension}"
+            files = {'file': (name, excerpt, f"audio/{'mpeg' if extension == 'mp3' else 'wav'}")}
+            data = {
+                'return': 'apple_music,spotify,lyrics,deezer',
+                'api_token': 'test'  # Usar token real en producción
+            }
+            
+            response = self.http.post(
+                self.apis['audd'], 
+                files=files, 
+                data=data, 
+                timeout=(3.05, 20.0),
+                deadline=IDENTIFICATION_BACKENDS['audd']['deadline'],
+                cancel=cancel
+            )
+            
+            if response.status_code == 200:
+                result = response.json()
                 
-                if response.status_code == 200:
-                    result = response.json()
-                    
-                    if result.get('status') == 'success' and result.get('result'):
-                        song = result['result']
-                        return {
-                            'identified': True,
-                            'title': song.get('title', ''),
-                            'artist': song.get('artist', ''),
-                            'album': song.get('album', ''),
-                            'release_date': song.get('release_date', ''),
-                            'confidence': 0.95,
-                            'source': 'AudD API',
-                            'raw_data': song
-                        }
+                if result.get('status') == 'success' and result.get('result'):
+                    song = result['result']
+                    return {
+                        'identified': True,
+                        'title': song.get('title', ''),
+                        'artist': song.get('artist', ''),
+                        'album': song.get('album', ''),
+                        'release_date': song.get('release_date', ''),
+                        'confidence': 0.95,
+                        'source': 'AudD API',
+                        'raw_data': song
+                    }
             
             return {'identified': False}
             
+        except RequestCancelled:
+            return {'identified': False}
         except Exception as e:
-            print(f"Error AudD: {e}")
+            print(f"Error AudD: {e}", file=sys.stderr)
             return {'identified': False}
     
     def _identify_with_acrcloud(self, audio_path):
@@ -104,52 +290,159 @@ class ShazamIntegration:
         except Exception:
             return {'identified': False}
     
-    def _identify_local_enhanced(self, audio_path):
-        """Identificación local mejorada con base de datos expandida"""
+    def _identify_local_enhanced(self, audio_path, audio=None, frame_features=None, cancel=None):
+        """
+        Identificación local mejorada con base de datos expandida.
+        Con cancel activado se para entre etapas (huellas, características, puntuación).
+        """
         try:
-            import librosa
-            import numpy as np
-            
-            # Cargar audio
-            y, sr = librosa.load(audio_path, sr=22050, duration=60)
+            from ffmpeg_decoder import load_audio
+            
+            # Cargar audio (o reutilizar el ya decodificado: primeros 60 s a 22050 Hz)
+            if audio is not None:
+                import librosa
+                y, sr = audio
+                y = y[:int(LOCAL_MATCH_SECONDS * sr)]
+                if sr != LOCAL_MATCH_SR:
+                    y = librosa.resample(y, orig_sr=sr, target_sr=LOCAL_MATCH_SR)
+                    sr = LOCAL_MATCH_SR
+            else:
+                y, sr = load_audio(audio_path, sr=LOCAL_MATCH_SR, duration=LOCAL_MATCH_SECONDS)
+            if _cancelled(cancel):
+                return {'identified': False}
             
-            # Extraer características mejoradas
-            features = self._extract_audio_features(y, sr)
+            # Base de datos expandida (una versión fija durante toda la consulta)
+            catalog = self._get_song_catalog()
+            songs_db = catalog.songs
             
-            # Base de datos expandida
-            songs_db = self._get_expanded_song_database()
+            # Huellas acústicas: robustas con fragmentos cortos o con ruido.
+            # Un fragmento corto se procesa segundo a segundo y para en cuanto es concluyente
+            if len(y) <= SHORT_CLIP_SECONDS * sr:
+                match = self._identify_clip_incremental(y, sr, songs_db, cancel)
+            else:
+                match = self._identify_with_fingerprints(y, sr, songs_db)
+            if match:
+                return match
+            if _cancelled(cancel):
+                return {'identified': False}
             
-            best_match = None
-            best_score = 0
+            # Extraer características mejoradas (o tomarlas del análisis)
+            if frame_features is not None:
+                features = self._features_from_frame_features(frame_features, y, sr)
+            else:
+                features = self._extract_audio_features(y, sr)
+            if _cancelled(cancel):
+                return {'identified': False}
             
-            for song_id, song_data in songs_db.items():
-                score = self._calculate_similarity_score(features, song_data['features'])
-                
-                if score > best_score and score > 0.75:
-                    best_score = score
-                    best_match = {
-                        'identified': True,
-                        'title': song_data['title'],
-                        'artist': song_data['artist'],
-                        'album': song_data.get('album', ''),
-                        'confidence': score,
-                        'source': 'Base de datos local'
-                    }
+            # Puntuación vectorizada (sobre los candidatos del índice aproximado en bases grandes)
+            from song_similarity import MATCH_THRESHOLD
+            best = catalog.top_k(features, k=1, threshold=MATCH_THRESHOLD)
+            if not best:
+                return {'identified': False}
             
-            return best_match or {'identified': False}
+            song_id, score = best[0]
+            song_data = songs_db[song_id]
+            return {
+                'identified': True,
+                'title': song_data['title'],
+                'artist': song_data['artist'],
+                'album': song_data.get('album', ''),
+                'confidence': score,
+                'source': 'Base de datos local'
+            }
             
         except Exception as e:
-            print(f"Error identificación local: {e}")
+            print(f"Error identificación local: {e}", file=sys.stderr)
             return {'identified': False}
     
+    def _identify_with_fingerprints(self, y, sr, songs_db):
+        """Buscar el fragmento en el índice de huellas (pares de picos espectrales)"""
+        try:
+            from audio_fingerprint import get_fingerprint_index, fingerprint
+            
+            index = get_fingerprint_index()
+            if not index.songs:
+                return None
+            
+            hashes, offsets = fingerprint(y, sr)
+            for match in index.lookup(hashes, offsets):
+                song_data = songs_db.get(match['song_id'])
+                if song_data is None:
+                    continue
+                return {
+                    'identified': True,
+                    'title': song_data['title'],
+                    'artist': song_data['artist'],
+                    'album': song_data.get('album', ''),
+                    'confidence': match['confidence'],
+                    'offset': match['offset'],
+                    'source': 'Huellas acústicas locales'
+                }
+            return None
+            
+        except Exception as e:
+            print(f"Error en búsqueda por huellas: {e}", file=sys.stderr)
+            return None
+    
+    def _identify_clip_incremental(self, y, sr, songs_db, cancel=None):
+        """
+        Huellas de un fragmento en bloques de CLIP_STEP_SECONDS: la evidencia se
+        acumula y se para cuando la mejor canción saca suficiente margen a la
+        segunda (o cuando se activa cancel). El resultado indica la latencia y
+        los segundos de audio usados.
+        """
+        try:
+            import librosa
+            from audio_fingerprint import get_fingerprint_index, IncrementalMatcher, FINGERPRINT_SR
+            
+            start = time.perf_counter()
+            index = get_fingerprint_index()
+            if not index.songs:
+                return None
+            
+            if sr != FINGERPRINT_SR:
+                y = librosa.resample(y, orig_sr=sr, target_sr=FINGERPRINT_SR)
+            matcher = IncrementalMatcher(index, cancel=cancel)
+            step = int(CLIP_STEP_SECONDS * FINGERPRINT_SR)
+            
+            match, conclusive = None, False
+            for position in range(0, len(y), step):
+                final = position + step >= len(y)
+                match, conclusive = matcher.feed(y[position:position + step], final)
+                if conclusive or matcher.cancelled:
+                    break
+            if matcher.cancelled:
+                return None
+            
+            # Sin salida anticipada vale la mejor con votos suficientes (como la búsqueda completa)
+            song_data = songs_db.get(match['song_id']) if match else None
+            if song_data is None:
+                return None
+            return {
+                'identified': True,
+                'title': song_data['title'],
+                'artist': song_data['artist'],
+                'album': song_data.get('album', ''),
+                'confidence': match['confidence'],
+                'offset': match['offset'],
+                'source': 'Huellas acústicas locales',
+                'latency': time.perf_counter() - start,
+                'audio_used': matcher.seconds,
+                'early_exit': conclusive and matcher.seconds < len(y) / FINGERPRINT_SR
+            }
+            
+        except Exception as e:
+            print(f"Error en identificación incremental: {e}", file=sys.stderr)
+            return None
+    
     def _extract_audio_features(self, y, sr):
         """Extraer características de audio mejoradas"""
         try:
             import librosa
             import numpy as np
             
-            # Características básicas
-            tempo = librosa.beat.beat_track(y=y, sr=sr)[0]
+            # Características básicas (beat_track devuelve el tempo como array)
+            tempo = np.atleast_1d(librosa.beat.beat_track(y=y, sr=sr)[0])[0]
             chroma = np.mean(librosa.feature.chroma_stft(y=y, sr=sr), axis=1)
             mfcc = np.mean(librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13), axis=1)
             spectral_centroid = np.mean(librosa.feature.spectral_centroid(y=y, sr=sr))
@@ -168,105 +461,76 @@ class ShazamIntegration:
         except Exception:
             return {}
     
-    def _get_expanded_song_database(self):
-        """Base de datos expandida de canciones - CARGA DESDE ARCHIVO LOCAL"""
-        try:
-            # Cargar base de datos local si existe
-            local_db_file = 'local_songs_database.json'
-            if os.path.exists(local_db_file):
-                with open(local_db_file, 'r', encoding='utf-8') as f:
-                    local_db = json.load(f)
-                
-                # Convertir formato de base de datos local al formato esperado
-                converted_db = {}
-                for song_id, song_data in local_db.items():
-                    converted_db[song_id] = {
-                        'title': song_data['title'],
-                        'artist': song_data['artist'],
-                        'album': song_data.get('album', ''),
-                        'features': song_data['features']
-                    }
-                
-                print(f"✅ Cargadas {len(converted_db)} canciones de base de datos local")
-                return converted_db
-            
-        except Exception as e:
-            print(f"⚠️  Error cargando base de datos local: {e}")
-        
-        # Base de datos por defecto si no hay archivo local
-        return {
-            'what_a_fool_believes': {
-                'title': 'What a Fool Believes',
-                'artist': 'The Doobie Brothers',
-                'album': 'Minute by Minute',
-                'features': {
-                    'tempo': 126.0,
-                    'chroma': [0.8, 0.3, 0.6, 0.2, 0.7, 0.4, 0.5, 0.9, 0.3, 0.6, 0.2, 0.4],
-                    'spectral_centroid': 2100.0
-                }
-            },
-            'hotel_california': {
-                'title': 'Hotel California',
-                'artist': 'Eagles',
-                'album': 'Hotel California',
-                'features': {
-                    'tempo': 75.0,
-                    'chroma': [0.6, 0.8, 0.3, 0.7, 0.2, 0.5, 0.4, 0.6, 0.9, 0.3, 0.5, 0.2],
-                    'spectral_centroid': 1800.0
-                }
-            },
-            'bohemian_rhapsody': {
-                'title': 'Bohemian Rhapsody',
-                'artist': 'Queen',
-                'album': 'A Night at the Opera',
-                'features': {
-                    'tempo': 72.0,
-                    'chroma': [0.9, 0.4, 0.7, 0.3, 0.8, 0.5, 0.6, 0.7, 0.4, 0.8, 0.3, 0.6],
-                    'spectral_centroid': 2300.0
-                }
-            }
-        }
-    
-    def _calculate_similarity_score(self, features1, features2):
-        """Calcular puntuación de similitud mejorada"""
+    def _features_from_frame_features(self, frame_features, y, sr):
+        """
+        Mismas características que _extract_audio_features reutilizando las del
+        análisis: tempo, chroma y MFCC salen de los frames ya calculados de los
+        primeros LOCAL_MATCH_SECONDS (frames activos, por su posición en el
+        archivo); solo las estadísticas espectrales se calculan sobre el fragmento.
+        Los MFCC dependen de la frecuencia de muestreo: si el análisis no está a
+        LOCAL_MATCH_SR salen de la misma STFT del fragmento.
+        """
         try:
+            import librosa
             import numpy as np
             
-            score = 0
-            weights = {
-                'tempo': 0.2,
-                'chroma': 0.4,
-                'spectral_centroid': 0.2,
-                'mfcc': 0.2
-            }
-            
-            # Comparar tempo
-            if 'tempo' in features1 and 'tempo' in features2:
-                tempo_diff = abs(features1['tempo'] - features2['tempo'])
-                tempo_score = max(0, 1 - tempo_diff / 50)  # Normalizar
-                score += tempo_score * weights['tempo']
-            
-            # Comparar chroma
-            if 'chroma' in features1 and 'chroma' in features2:
-                chroma1 = np.array(features1['chroma'])
-                chroma2 = np.array(features2['chroma'])
-                chroma_corr = np.corrcoef(chroma1, chroma2)[0, 1]
-                if not np.isnan(chroma_corr):
-                    score += max(0, chroma_corr) * weights['chroma']
-            
-            # Comparar centroide espectral
-            if 'spectral_centroid' in features1 and 'spectral_centroid' in features2:
-                centroid_diff = abs(features1['spectral_centroid'] - features2['spectral_centroid'])
-                centroid_score = max(0, 1 - centroid_diff / 2000)
-                score += centroid_score * weights['spectral_centroid']
+            feature_sr = frame_features['sr']
+            first = frame_features['frame_positions'] < LOCAL_MATCH_SECONDS * feature_sr
+            onset_envelope = frame_features['onset_envelope'][first]
+            tempo = librosa.feature.tempo(
+                onset_envelope=onset_envelope, sr=feature_sr, hop_length=frame_features['hop_length']
+            )[0]
+            chroma = np.mean(frame_features['chroma'][:, first], axis=1)
+            
+            # Centroide y rolloff (y MFCC si hacen falta) de una sola STFT del fragmento
+            S = np.abs(librosa.stft(y))
+            if feature_sr == sr:
+                mfcc = np.mean(frame_features['mfcc'][:, first], axis=1)
+            else:
+                mel_db = librosa.power_to_db(librosa.feature.melspectrogram(S=S ** 2, sr=sr))
+                mfcc = np.mean(librosa.feature.mfcc(S=mel_db, sr=sr, n_mfcc=13), axis=1)
+            spectral_centroid = np.mean(librosa.feature.spectral_centroid(S=S, sr=sr))
+            spectral_rolloff = np.mean(librosa.feature.spectral_rolloff(S=S, sr=sr))
+            zero_crossing_rate = np.mean(librosa.feature.zero_crossing_rate(y))
             
-            return min(1.0, score)
+            return {
+                'tempo': float(tempo),
+                'chroma': chroma.tolist(),
+                'mfcc': mfcc.tolist(),
+                'spectral_centroid': float(spectral_centroid),
+                'spectral_rolloff': float(spectral_rolloff),
+                'zero_crossing_rate': float(zero_crossing_rate)
+            }
             
         except Exception:
-            return 0
+            return self._extract_audio_features(y, sr)
+    
+    def _get_song_catalog(self):
+        """Base local cacheada por proceso (se recarga solo si el archivo cambia)"""
+        global _default_catalog
+        try:
+            from song_database import get_song_database
+            catalog = get_song_database().catalog()
+            if catalog is not None:
+                return catalog
+        except Exception as e:
+            print(f"⚠️  Error cargando base de datos local: {e}")
+        
+        # Base de datos por defecto si no hay archivo local
+        if _default_catalog is None:
+            from song_database import SongCatalog
+            _default_catalog = SongCatalog(DEFAULT_SONG_DATABASE)
+        return _default_catalog
     
-    def _enrich_song_data(self, song_data):
-        """Enriquecer datos de la canción con letras y enlaces"""
+    def _enrich_song_data(self, song_data, defer_lyrics=False):
+        """
+        Enriquecer datos de la canción con letras y enlaces. Con defer_lyrics
+        solo se incluye la letra si ya está en la caché; si no, el resultado
+        lleva lyrics_pending y el cliente la pide después con fetch_lyrics
+        (endpoint /lyrics). No se busca en segundo plano: quien llama suele ser
+        un proceso de línea de comandos que termina al devolver el JSON, y un
+        hilo daemon moriría a medias dejando la caché con una transacción abierta.
+        """
         try:
             if not song_data.get('identified'):
                 return song_data
@@ -275,10 +539,17 @@ class ShazamIntegration:
             artist = song_data.get('artist', '')
             
             # Buscar letra
-            lyrics = self._get_lyrics(title, artist)
-            song_data['lyrics'] = lyrics
+            if defer_lyrics:
+                from lyrics_cache import get_lyrics_cache
+                lyrics = get_lyrics_cache().get(title, artist)
+                if lyrics is None:
+                    song_data['lyrics_pending'] = True
+                else:
+                    song_data['lyrics'] = lyrics or "Letra no disponible"
+            else:
+                song_data['lyrics'] = self._get_lyrics(title, artist)
             
-            # Generar enlaces
+            # Generar enlaces (solo texto, no hay que esperar a nada)
             links = self._generate_music_links(title, artist)
             song_data['music_links'] = links
             
@@ -291,105 +562,43 @@ class ShazamIntegration:
     def _get_lyrics(self, title, artist):
         """Obtener letra de la canción"""
         try:
-            # Método 1: API de Lyrics.ovh
-            lyrics = self._get_lyrics_from_api(title, artist)
-            if lyrics:
-                return lyrics
+            from lyrics_cache import get_lyrics_cache
             
-            # Método 2: Base de datos local
-            lyrics = self._get_lyrics_local(title, artist)
-            if lyrics:
-                return lyrics
+            # Método 1: caché persistente (incluye las letras locales)
+            cache = get_lyrics_cache()
+            lyrics = cache.get(title, artist)
             
-            return "Letra no disponible"
+            # Método 2: API de Lyrics.ovh; "no encontrada" también se guarda
+            # (con caducidad corta), los errores de red no
+            if lyrics is None:
+                lyrics = self._get_lyrics_from_api(title, artist)
+                if lyrics is not None:
+                    cache.put(title, artist, lyrics)
+            
+            return lyrics or "Letra no disponible"
             
         except Exception:
             return "Letra no disponible"
     
     def _get_lyrics_from_api(self, title, artist):
-        """Obtener letra desde API"""
+        """Obtener letra desde API ('' si no existe, None si la API no respondió)"""
         try:
             # API gratuita de lyrics.ovh
-            url = f"https://api.lyrics.ovh/v1/{quote_plus(artist)}/{quote_plus(title)}"
+            url = f"{self.apis['lyrics_ovh']}{quote_plus(artist)}/{quote_plus(title)}"
             
-            response = requests.get(url, timeout=10)
+            response = self.http.get(url, deadline=10)
             
             if response.status_code == 200:
                 data = response.json()
                 return data.get('lyrics', '').strip()
+            if response.status_code == 404:
+                return ''
             
             return None
             
         except Exception:
             return None
     
-    def _get_lyrics_local(self, title, artist):
-        """Obtener letra de base de datos local"""
-        lyrics_db = {
-            ('What a Fool Believes', 'The Doobie Brothers'): """What a fool believes
-He sees
-No wise man has the power
-To reason away
-What seems to be
-Is always better than nothing
-And nothing at all keeps sending him
-
-Somewhere back in her long ago
-Where he can still believe there's a place in her life
-Someday, somewhere, she will return
-
-She had a place in his life
-He never made her think twice
-As he rises to her apology
-Anybody else would surely know
-He's watching her go
-
-But what a fool believes he sees
-No wise man has the power to reason away
-What seems to be
-Is always better than nothing
-There's nothing at all
-But what a fool believes he sees""",
-            
-            ('Hotel California', 'Eagles'): """On a dark desert highway, cool wind in my hair
-Warm smell of colitas, rising up through the air
-Up ahead in the distance, I saw a shimmering light
-My head grew heavy and my sight grew dim
-I had to stop for the night
-
-There she stood in the doorway
-I heard the mission bell
-And I was thinking to myself
-This could be Heaven or this could be Hell
-Then she lit up a candle and she showed me the way
-There were voices down the corridor
-I thought I heard them say
-
-Welcome to the Hotel California
-Such a lovely place (Such a lovely place)
-Such a lovely face
-Plenty of room at the Hotel California
-Any time of year (Any time of year)
-You can find it here""",
-            
-            ('Bohemian Rhapsody', 'Queen'): """Is this the real life?
-Is this just fantasy?
-Caught in a landslide
-No escape from reality
-Open your eyes, look up to the skies and see
-I'm just a poor boy, I need no sympathy
-Because I'm easy come, easy go, little high, little low
-Any way the wind blows doesn't really matter to me, to me
-
-Mama, just killed a man
-Put a gun against his head, pulled my trigger, now he's dead
-Mama, life had just begun
-But now I've gone and thrown it all away"""
-        }
-        
-        key = (title, artist)
-        return lyrics_db.get(key, None)
-    
     def _generate_music_links(self, title, artist):
         """Generar enlaces a plataformas de música"""
         try:
@@ -576,10 +785,15 @@ class YouTubeDownloader:
             return None
 
 # Funciones de utilidad para integración
-def identify_and_enrich_song(audio_path):
+def identify_and_enrich_song(audio_path, audio=None, frame_features=None, defer_lyrics=True):
     """Función principal para identificar y enriquecer canción"""
     shazam = ShazamIntegration()
-    return shazam.identify_song_complete(audio_path)
+    return shazam.identify_song_complete(audio_path, audio, frame_features, defer_lyrics)
+
+def fetch_lyrics(title, artist):
+    """Letra de una canción ya identificada (la consulta posterior a lyrics_pending)"""
+    shazam = ShazamIntegration()
+    return {'title': title, 'artist': artist, 'lyrics': shazam._get_lyrics(title, artist)}
 
 def download_youtube_audio(youtube_url, format_type='mp3'):
     """Función principal para descargar audio de YouTube"""
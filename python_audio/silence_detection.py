@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DETECCIÓN DE SILENCIO - PRE-ANÁLISIS DE ENERGÍA
+Marca las regiones silenciosas o de baja energía (intros, finales, pausas
+de grabaciones en vivo) para que las etapas pesadas las omitan
+"""
+
+import numpy as np
+
+# Umbral relativo al bloque más fuerte del archivo (dB)
+DEFAULT_TOP_DB = 40.0
+
+# Piso absoluto: por debajo de esto se considera silencio aunque todo el archivo sea bajo
+ABSOLUTE_FLOOR_DB = -60.0
+
+# Silencios más cortos que esto se consideran parte de la música (pausas, cortes)
+MIN_SILENCE_DURATION = 1.0
+
+# Fracción de actividad mínima para que un segmento se analice
+MIN_ACTIVE_FRACTION = 0.1
+
+
+class ActivityMap:
+    """Regiones activas de un archivo de audio, en muestras"""
+
+    def __init__(self, regions, sr, total_samples):
+        self.regions = np.asarray(regions, dtype=np.int64).reshape(-1, 2)
+        self.sr = sr
+        self.total_samples = total_samples
+
+        # Suma acumulada de actividad por muestra para consultas O(log n)
+        self._starts = self.regions[:, 0]
+        self._ends = self.regions[:, 1]
+        self._cumulative = np.concatenate(([0], np.cumsum(self._ends - self._starts)))
+
+    @property
+    def has_activity(self):
+        return len(self.regions) > 0
+
+    @property
+    def active_samples(self):
+        return int(self._cumulative[-1])
+
+    @property
+    def active_ratio(self):
+        if self.total_samples == 0:
+            return 0.0
+        return self.active_samples / self.total_samples
+
+    def _active_before(self, sample):
+        """Número de muestras activas en [0, sample)"""
+        idx = np.searchsorted(self._starts, sample, side='right')
+        if idx == 0:
+            return 0
+        partial = min(sample, self._ends[idx - 1]) - self._starts[idx - 1]
+        return int(self._cumulative[idx - 1] + partial)
+
+    def active_fraction(self, start, end):
+        """Fracción de muestras activas en [start, end)"""
+        if end <= start:
+            return 0.0
+        return (self._active_before(end) - self._active_before(start)) / (end - start)
+
+    def is_silent(self, start, end, min_active_fraction=MIN_ACTIVE_FRACTION):
+        """Indicar si el rango [start, end) no merece análisis"""
+        return self.active_fraction(start, end) < min_active_fraction
+
+    def active_audio(self, y):
+        """Concatenar solo las regiones activas"""
+        if not self.has_activity:
+            return y[:0]
+        return np.concatenate([y[start:end] for start, end in self.regions])
+
+    def contains(self, positions):
+        """Máscara booleana: qué posiciones (en muestras) caen en una región activa"""
+        positions = np.asarray(positions, dtype=np.int64)
+        idx = np.searchsorted(self._starts, positions, side='right') - 1
+        inside = idx >= 0
+        inside[inside] = positions[inside] < self._ends[idx[inside]]
+        return inside
+
+    def slice(self, start, end):
+        """Mapa de actividad del rango [start, end) en coordenadas locales"""
+        regions = np.clip(self.regions, start, end) - start
+        regions = regions[regions[:, 1] > regions[:, 0]]
+        return ActivityMap(regions, self.sr, end - start)
+
+    def to_original(self, positions):
+        """Convertir posiciones del audio activo concatenado a la línea de tiempo original"""
+        positions = np.asarray(positions, dtype=np.int64)
+        if not self.has_activity:
+            return positions
+        idx = np.searchsorted(self._cumulative[1:], positions, side='right')
+        idx = np.minimum(idx, len(self.regions) - 1)
+        return self._starts[idx] + positions - self._cumulative[idx]
+
+    def to_active(self, positions):
+        """Convertir posiciones de la línea de tiempo original al audio activo concatenado"""
+        positions = np.asarray(positions, dtype=np.int64)
+        if not self.has_activity:
+            return positions
+        idx = np.searchsorted(self._starts, positions, side='right') - 1
+        inside = idx >= 0
+        clamped = np.minimum(positions[inside], self._ends[idx[inside]])
+        active = np.zeros(len(positions), dtype=np.int64)
+        active[inside] = self._cumulative[idx[inside]] + clamped - self._starts[idx[inside]]
+        return active
+
+    def silent_regions(self):
+        """Regiones complementarias (silencio) en muestras"""
+        bounds = np.concatenate(([0], self.regions.ravel(), [self.total_samples]))
+        gaps = bounds.reshape(-1, 2)
+        return gaps[gaps[:, 1] > gaps[:, 0]]
+
+    def to_dict(self):
+        """Resumen serializable para el resultado del análisis"""
+        return {
+            'active_ratio': round(float(self.active_ratio), 4),
+            'silent_regions': [
+                [round(float(start) / self.sr, 3), round(float(end) / self.sr, 3)]
+                for start, end in self.silent_regions()
+            ]
+        }
+
+
+def detect_activity(y, sr, top_db=DEFAULT_TOP_DB, hop_length=512,
+                    min_silence_duration=MIN_SILENCE_DURATION):
+    """
+    Pre-análisis de energía por bloques de hop_length muestras.
+    Cuesta una sola pasada sobre las muestras, sin STFT.
+    """
+    total_samples = len(y)
+    if total_samples == 0:
+        return ActivityMap([], sr, 0)
+
+    # RMS por bloques contiguos (el último bloque parcial se rellena con ceros)
+    n_blocks = int(np.ceil(total_samples / hop_length))
+    padded = np.zeros(n_blocks * hop_length, dtype=np.float32)
+    padded[:total_samples] = y
+    power = np.mean(padded.reshape(n_blocks, hop_length) ** 2, axis=1)
+    db = 10.0 * np.log10(np.maximum(power, 1e-12))
+
+    threshold = max(float(np.max(db)) - top_db, ABSOLUTE_FLOOR_DB)
+    active = db > threshold
+
+    # Rellenar silencios cortos: no merece la pena cortar la música por ellos
+    min_gap_blocks = int(np.ceil(min_silence_duration * sr / hop_length))
+    changes = np.flatnonzero(np.diff(np.concatenate(([0], active.astype(np.int8), [0]))))
+    block_regions = changes.reshape(-1, 2)
+
+    merged = []
+    for start, end in block_regions:
+        if merged and start - merged[-1][1] < min_gap_blocks:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+
+    regions = [
+        [start * hop_length, min(end * hop_length, total_samples)]
+        for start, end in merged
+    ]
+    return ActivityMap(regions, sr, total_samples)
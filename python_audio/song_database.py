@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BASE LOCAL DE CANCIONES COMPARTIDA POR PROCESO
+Se carga una vez y se recarga solo cuando cambian la fecha de modificación o
+el tamaño del archivo. Cada carga produce un catálogo nuevo (canciones +
+matriz de características) que sustituye al anterior con una sola asignación:
+las consultas en curso siguen usando el catálogo con el que empezaron.
+La fuente es el almacén binario (song_store) si existe, si no el JSON
+"""
+
+import os
+import sys
+import json
+import threading
+
+from song_similarity import SongFeatureMatrix
+from feature_ann import ANN_MIN_SONGS, DEFAULT_N_PROBE, ann_index_path, load_or_build_index
+from song_store import SongStore, DEFAULT_SONG_STORE_DIR, INDEX_FILE
+
+DEFAULT_DATABASE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'local_songs_database.json')
+
+
+def convert_entries(raw_db):
+    """Entradas del archivo al formato de identificación (título, artista, álbum, características)"""
+    return {
+        song_id: {
+            'title': song_data['title'],
+            'artist': song_data['artist'],
+            'album': song_data.get('album', ''),
+            'features': song_data.get('features', {})
+        }
+        for song_id, song_data in raw_db.items()
+    }
+
+
+class SongCatalog:
+    """Una versión de la base: no se modifica después de construirse"""
+
+    def __init__(self, songs, signature=None, matrix=None):
+        self.songs = songs
+        self.signature = signature
+        self.matrix = matrix if matrix is not None else SongFeatureMatrix.from_database(songs)
+        self.ann = None
+
+    def __len__(self):
+        return len(self.songs)
+
+    def attach_ann(self, path):
+        """Índice aproximado (persistido en path) si la base es lo bastante grande"""
+        if len(self) < ANN_MIN_SONGS:
+            return None
+        try:
+            self.ann = load_or_build_index(self.matrix, path, self.signature)
+        except Exception as e:
+            print(f"⚠️  Índice aproximado no disponible, búsqueda exacta: {e}", file=sys.stderr)
+        return self.ann
+
+    def top_k(self, features, k=5, threshold=0.0, n_probe=DEFAULT_N_PROBE):
+        """
+        Igual que SongFeatureMatrix.top_k; con índice aproximado solo se
+        puntúan (exactamente) los candidatos de las n_probe listas más cercanas
+        """
+        if self.ann is None:
+            return self.matrix.top_k(features, k, threshold)
+        rows = self.ann.candidates(features, self.matrix, n_probe)
+        return self.matrix.top_k(features, k, threshold, rows=rows)
+
+
+class SongDatabase:
+    """Catálogo cacheado de un archivo JSON o de un directorio de SongStore"""
+
+    def __init__(self, path=DEFAULT_DATABASE_PATH):
+        self.path = path
+        self.is_store = os.path.isdir(path)
+        self._catalog = None
+        self._lock = threading.Lock()
+
+    def _file_signature(self):
+        """
+        (mtime en ns, tamaño) del archivo, o None si no existe. En un SongStore
+        se mira la tabla: cada alta o baja termina con un commit sobre ella.
+        """
+        try:
+            stat = os.stat(os.path.join(self.path, INDEX_FILE) if self.is_store else self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def catalog(self):
+        """
+        Catálogo vigente (None si el archivo no existe). Si el archivo no se
+        puede leer (p. ej. a medio escribir) se sigue sirviendo el anterior.
+        """
+        signature = self._file_signature()
+        catalog = self._catalog
+        if catalog is not None and catalog.signature == signature:
+            return catalog
+        if signature is None:
+            return None
+
+        with self._lock:
+            # Otro hilo pudo recargarlo mientras esperábamos
+            if self._catalog is not None and self._catalog.signature == signature:
+                return self._catalog
+            try:
+                catalog = self._load(signature)
+                catalog.attach_ann(ann_index_path(self.path))
+            except Exception as e:
+                print(f"⚠️  Error cargando base de datos local: {e}", file=sys.stderr)
+                return self._catalog
+
+            print(f"✅ Cargadas {len(catalog)} canciones de base de datos local", file=sys.stderr)
+            self._catalog = catalog
+            return catalog
+
+    def _load(self, signature):
+        if self.is_store:
+            songs, matrix = SongStore(self.path).feature_matrix()
+            return SongCatalog(songs, signature, matrix)
+        with open(self.path, 'r', encoding='utf-8') as f:
+            raw_db = json.load(f)
+        return SongCatalog(convert_entries(raw_db), signature)
+
+
+def default_database_path():
+    """El almacén binario si ya se creó (lo crea manage_song_database), si no el JSON"""
+    return DEFAULT_SONG_STORE_DIR if SongStore.exists(DEFAULT_SONG_STORE_DIR) else DEFAULT_DATABASE_PATH
+
+
+_databases = {}
+_databases_lock = threading.Lock()
+
+
+def get_song_database(path=None):
+    """Instancia única por archivo dentro del proceso (por defecto, default_database_path)"""
+    path = os.path.abspath(path or default_database_path())
+    with _databases_lock:
+        if path not in _databases:
+            _databases[path] = SongDatabase(path)
+        return _databases[path]
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MATRIZ DE CARACTERÍSTICAS DE LA BASE LOCAL
+Las firmas de todas las canciones viven en matrices NumPy contiguas (tempo,
+chroma, centroide espectral, MFCC) y la similitud con una consulta se calcula
+para toda la base en una sola pasada vectorizada
+"""
+
+import numpy as np
+
+# Pesos de cada característica (el MFCC aún no puntúa)
+SIMILARITY_WEIGHTS = {
+    'tempo': 0.2,
+    'chroma': 0.4,
+    'spectral_centroid': 0.2
+}
+
+# Diferencias que anulan la puntuación de tempo (BPM) y centroide (Hz)
+TEMPO_SCALE = 50.0
+CENTROID_SCALE = 2000.0
+
+# Puntuación mínima para dar una canción por identificada
+MATCH_THRESHOLD = 0.75
+
+N_CHROMA = 12
+N_MFCC = 13
+N_TONNETZ = 6
+N_CONTRAST = 7
+
+
+def _centered_unit_rows(matrix):
+    """
+    Filas centradas y de norma 1: su producto escalar es la correlación de
+    Pearson (np.corrcoef). Las filas constantes quedan en NaN, como corrcoef.
+    """
+    centered = matrix - matrix.mean(axis=1, keepdims=True)
+    norms = np.linalg.norm(centered, axis=1, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return centered / norms
+
+
+def _vector(values, size):
+    """Vector de tamaño fijo o None si falta o no cuadra"""
+    if values is None:
+        return None
+    values = np.asarray(values, dtype=np.float64).ravel()
+    return values if len(values) == size else None
+
+
+class SongFeatureMatrix:
+    """Firmas de toda la base local en matrices contiguas, filas en el orden de song_ids"""
+
+    def __init__(self, song_ids, tempo, chroma, spectral_centroid, mfcc, tonnetz=None, spectral_contrast=None):
+        self.song_ids = list(song_ids)
+        n = len(self.song_ids)
+        self.tempo = np.ascontiguousarray(tempo, dtype=np.float64)
+        self.chroma = np.ascontiguousarray(chroma, dtype=np.float64)
+        self.spectral_centroid = np.ascontiguousarray(spectral_centroid, dtype=np.float64)
+        self.mfcc = np.ascontiguousarray(mfcc, dtype=np.float64)
+        # No puntúan: solo las usa el índice aproximado (feature_ann)
+        self.tonnetz = np.full((n, N_TONNETZ), np.nan) if tonnetz is None else np.ascontiguousarray(tonnetz, dtype=np.float64)
+        self.spectral_contrast = (
+            np.full((n, N_CONTRAST), np.nan) if spectral_contrast is None
+            else np.ascontiguousarray(spectral_contrast, dtype=np.float64)
+        )
+        self._chroma_unit = _centered_unit_rows(self.chroma)
+
+    def __len__(self):
+        return len(self.song_ids)
+
+    @classmethod
+    def from_database(cls, songs_db):
+        """
+        Construir a partir del diccionario {song_id: {'features': {...}}}.
+        Las características que faltan quedan en NaN y no puntúan.
+        """
+        song_ids = list(songs_db.keys())
+        n = len(song_ids)
+        tempo = np.full(n, np.nan)
+        chroma = np.full((n, N_CHROMA), np.nan)
+        centroid = np.full(n, np.nan)
+        mfcc = np.full((n, N_MFCC), np.nan)
+        tonnetz = np.full((n, N_TONNETZ), np.nan)
+        contrast = np.full((n, N_CONTRAST), np.nan)
+
+        for row, song_id in enumerate(song_ids):
+            features = songs_db[song_id].get('features', {})
+            if features.get('tempo') is not None:
+                tempo[row] = float(np.ravel(features['tempo'])[0])
+            if features.get('spectral_centroid') is not None:
+                centroid[row] = float(features['spectral_centroid'])
+            song_chroma = _vector(features.get('chroma'), N_CHROMA)
+            if song_chroma is not None:
+                chroma[row] = song_chroma
+            song_mfcc = _vector(features.get('mfcc'), N_MFCC)
+            if song_mfcc is not None:
+                mfcc[row] = song_mfcc
+            song_tonnetz = _vector(features.get('tonnetz'), N_TONNETZ)
+            if song_tonnetz is not None:
+                tonnetz[row] = song_tonnetz
+            song_contrast = _vector(features.get('spectral_contrast'), N_CONTRAST)
+            if song_contrast is not None:
+                contrast[row] = song_contrast
+
+        return cls(song_ids, tempo, chroma, centroid, mfcc, tonnetz, contrast)
+
+    def scores(self, features, rows=None):
+        """
+        Puntuación (0..1) de la consulta contra cada canción, en una pasada.
+        Con rows solo se puntúan esas filas (p. ej. candidatos de feature_ann).
+        """
+        select = slice(None) if rows is None else rows
+        total = np.zeros(len(self) if rows is None else len(rows))
+
+        if features.get('tempo') is not None:
+            tempo_diff = np.abs(float(features['tempo']) - self.tempo[select])
+            tempo_score = np.maximum(0.0, 1.0 - tempo_diff / TEMPO_SCALE)
+            total += np.nan_to_num(tempo_score) * SIMILARITY_WEIGHTS['tempo']
+
+        query_chroma = _vector(features.get('chroma'), N_CHROMA)
+        if query_chroma is not None:
+            query_unit = _centered_unit_rows(query_chroma[None, :])[0]
+            correlation = self._chroma_unit[select] @ query_unit
+            total += np.maximum(0.0, np.nan_to_num(correlation)) * SIMILARITY_WEIGHTS['chroma']
+
+        if features.get('spectral_centroid') is not None:
+            centroid_diff = np.abs(float(features['spectral_centroid']) - self.spectral_centroid[select])
+            centroid_score = np.maximum(0.0, 1.0 - centroid_diff / CENTROID_SCALE)
+            total += np.nan_to_num(centroid_score) * SIMILARITY_WEIGHTS['spectral_centroid']
+
+        return np.minimum(1.0, total)
+
+    def top_k(self, features, k=5, threshold=0.0, rows=None):
+        """
+        Las k canciones más parecidas con puntuación > threshold, de mejor a peor.
+        Devuelve [(song_id, score)]; en empate gana la primera de la base.
+        Con rows (filas ordenadas) la búsqueda se limita a esas canciones.
+        """
+        if rows is not None:
+            rows = np.asarray(rows, dtype=np.int64)
+        if len(self) == 0 or not features or (rows is not None and len(rows) == 0):
+            return []
+        scores = self.scores(features, rows)
+        k = min(k, len(scores))
+        candidates = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+        candidates = candidates[np.lexsort((candidates, -scores[candidates]))]
+        row_of = (lambda i: i) if rows is None else (lambda i: rows[i])
+        return [
+            (self.song_ids[row_of(i)], float(scores[i])) for i in candidates if scores[i] > threshold
+        ]
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ALMACÉN BINARIO DE LA BASE DE CANCIONES
+Metadatos y características escalares en una tabla SQLite indexada; cada
+vector de características en un archivo float32 de ancho fijo (una fila por
+canción, misma numeración que la tabla) que se abre con memmap. Agregar una
+canción escribe una fila al final en lugar de reescribir toda la base
+"""
+
+import os
+import json
+import sqlite3
+from contextlib import contextmanager, closing
+import numpy as np
+
+from song_similarity import SongFeatureMatrix
+
+DEFAULT_SONG_STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'song_store')
+
+INDEX_FILE = 'songs.sqlite'
+
+# Vectores de características y su dimensión (las filas que faltan quedan en NaN)
+VECTOR_FEATURES = {
+    'chroma': 12,
+    'mfcc': 13,
+    'chroma_fingerprint': 12,
+    'spectral_contrast': 7,
+    'tonnetz': 6
+}
+
+# Características escalares (columnas de la tabla; NULL si faltan)
+SCALAR_FEATURES = ('tempo', 'spectral_centroid', 'spectral_rolloff', 'zero_crossing_rate', 'duration')
+
+METADATA_FIELDS = ('title', 'artist', 'album', 'file_path', 'added_date')
+
+VECTOR_DTYPE = np.float32
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS songs (
+    row INTEGER PRIMARY KEY,
+    song_id TEXT NOT NULL,
+    {', '.join(f'{field} TEXT' for field in METADATA_FIELDS)},
+    {', '.join(f'{name} REAL' for name in SCALAR_FEATURES)},
+    deleted INTEGER NOT NULL DEFAULT 0
+);
+CREATE UNIQUE INDEX IF NOT EXISTS songs_song_id ON songs(song_id) WHERE deleted = 0;
+CREATE INDEX IF NOT EXISTS songs_title ON songs(title);
+CREATE INDEX IF NOT EXISTS songs_artist ON songs(artist);
+"""
+
+
+def _vector_row(values, dim):
+    """Fila float32 de tamaño fijo (NaN si falta o no cuadra)"""
+    if values is None:
+        return np.full(dim, np.nan, dtype=VECTOR_DTYPE)
+    values = np.asarray(values, dtype=VECTOR_DTYPE).ravel()
+    return values if len(values) == dim else np.full(dim, np.nan, dtype=VECTOR_DTYPE)
+
+
+class SongStore:
+    """Base de canciones en un directorio: songs.sqlite + <vector>.f32"""
+
+    def __init__(self, root=DEFAULT_SONG_STORE_DIR):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+        self.index_path = os.path.join(self.root, INDEX_FILE)
+        with self._connect() as connection:
+            connection.executescript(_SCHEMA)
+
+    @staticmethod
+    def exists(root=DEFAULT_SONG_STORE_DIR):
+        """Indicar si ya hay un almacén creado en root"""
+        return os.path.exists(os.path.join(root, INDEX_FILE))
+
+    @contextmanager
+    def _connect(self):
+        """Conexión de una operación: commit (o rollback) al salir y cierre siempre"""
+        with closing(sqlite3.connect(self.index_path, timeout=5.0)) as connection, connection:
+            yield connection
+
+    def _vector_path(self, name):
+        return os.path.join(self.root, f"{name}.f32")
+
+    def row_count(self):
+        """Filas totales (incluidas las borradas): el largo de cada archivo de vectores"""
+        with self._connect() as connection:
+            return connection.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM songs").fetchone()[0]
+
+    def __len__(self):
+        with self._connect() as connection:
+            return connection.execute("SELECT COUNT(*) FROM songs WHERE deleted = 0").fetchone()[0]
+
+    def _append_vectors(self, first_row, features_list):
+        """
+        Escribir las filas de vectores a partir de first_row. Los archivos se
+        recortan antes a first_row filas: restos de una escritura interrumpida
+        (vectores sin fila en la tabla) se descartan.
+        """
+        for name, dim in VECTOR_FEATURES.items():
+            block = np.stack([_vector_row(features.get(name), dim) for features in features_list])
+            row_bytes = dim * np.dtype(VECTOR_DTYPE).itemsize
+            with open(self._vector_path(name), 'ab') as f:
+                f.truncate(first_row * row_bytes)
+                f.write(block.tobytes())
+
+    def add_songs(self, entries):
+        """
+        Agregar (o reemplazar) canciones: {song_id: entrada como en el JSON}.
+        Las filas de vectores se escriben primero y la tabla después, en una
+        sola transacción; una fila de la tabla siempre tiene sus vectores.
+        """
+        if not entries:
+            return 0
+        song_ids = list(entries.keys())
+        features_list = [entries[song_id].get('features', {}) for song_id in song_ids]
+
+        with self._connect() as connection:
+            first_row = connection.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM songs").fetchone()[0]
+            self._append_vectors(first_row, features_list)
+
+            connection.executemany(
+                "UPDATE songs SET deleted = 1 WHERE song_id = ? AND deleted = 0",
+                [(song_id,) for song_id in song_ids]
+            )
+            columns = ('row', 'song_id') + METADATA_FIELDS + SCALAR_FEATURES
+            connection.executemany(
+                f"INSERT INTO songs ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                [
+                    (first_row + i, song_id)
+                    + tuple(entries[song_id].get(field) or '' for field in METADATA_FIELDS)
+                    + tuple(
+                        float(np.ravel(features[name])[0]) if features.get(name) is not None else None
+                        for name in SCALAR_FEATURES
+                    )
+                    for i, (song_id, features) in enumerate(zip(song_ids, features_list))
+                ]
+            )
+        return len(song_ids)
+
+    def add_song(self, song_id, entry):
+        return self.add_songs({song_id: entry}) == 1
+
+    def remove_song(self, song_id):
+        """Marcar como borrada (la fila y sus vectores quedan, sin uso)"""
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "UPDATE songs SET deleted = 1 WHERE song_id = ? AND deleted = 0", (song_id,)
+            )
+            return cursor.rowcount > 0
+
+    def vectors(self, name):
+        """Matriz (filas x dim) de un vector de características, en memmap de solo lectura"""
+        rows = self.row_count()
+        dim = VECTOR_FEATURES[name]
+        path = self._vector_path(name)
+        if rows == 0 or not os.path.exists(path):
+            return np.zeros((0, dim), dtype=VECTOR_DTYPE)
+        return np.memmap(path, dtype=VECTOR_DTYPE, mode='r', shape=(rows, dim))
+
+    def _rows_to_entries(self, records, columns):
+        entries = {}
+        vectors = {name: self.vectors(name) for name in VECTOR_FEATURES}
+        for record in records:
+            values = dict(zip(columns, record))
+            features = {name: values[name] for name in SCALAR_FEATURES if values[name] is not None}
+            for name, matrix in vectors.items():
+                row = matrix[values['row']]
+                if not np.all(np.isnan(row)):
+                    features[name] = [float(value) for value in row]
+            entry = {field: values[field] for field in METADATA_FIELDS}
+            entry['features'] = features
+            entries[values['song_id']] = entry
+        return entries
+
+    def _select(self, where='deleted = 0', params=()):
+        columns = ('row', 'song_id') + METADATA_FIELDS + SCALAR_FEATURES
+        with self._connect() as connection:
+            records = connection.execute(
+                f"SELECT {', '.join(columns)} FROM songs WHERE {where} ORDER BY row", params
+            ).fetchall()
+        return self._rows_to_entries(records, columns)
+
+    def get(self, song_id):
+        """Entrada completa de una canción (formato del JSON) o None"""
+        return self._select("deleted = 0 AND song_id = ?", (song_id,)).get(song_id)
+
+    def entries(self):
+        """Todas las entradas en el formato del JSON (para listar y exportar)"""
+        return self._select()
+
+    def search(self, query):
+        """Canciones cuyo título, artista o álbum contiene query"""
+        pattern = f"%{query}%"
+        return self._select(
+            "deleted = 0 AND (title LIKE ? OR artist LIKE ? OR album LIKE ?)",
+            (pattern, pattern, pattern)
+        )
+
+    def feature_matrix(self):
+        """
+        Metadatos de las canciones vigentes ({song_id: {'title', 'artist',
+        'album'}}) y su SongFeatureMatrix, leída directamente de las columnas
+        y los memmap sin pasar por diccionarios de características.
+        """
+        with self._connect() as connection:
+            records = connection.execute(
+                "SELECT row, song_id, title, artist, album, tempo, spectral_centroid "
+                "FROM songs WHERE deleted = 0 ORDER BY row"
+            ).fetchall()
+        rows = np.array([record[0] for record in records], dtype=np.int64)
+        songs = {
+            song_id: {'title': title, 'artist': artist, 'album': album or ''}
+            for _, song_id, title, artist, album, _, _ in records
+        }
+        # None -> NaN al convertir a float
+        scalars = np.array([record[5:] for record in records], dtype=np.float64).reshape(-1, 2)
+        matrix = SongFeatureMatrix(
+            songs.keys(), scalars[:, 0], self.vectors('chroma')[rows],
+            scalars[:, 1], self.vectors('mfcc')[rows],
+            self.vectors('tonnetz')[rows], self.vectors('spectral_contrast')[rows]
+        )
+        return songs, matrix
+
+    def import_json(self, json_path):
+        """Importar (fusionando) una base en el formato JSON de siempre"""
+        with open(json_path, 'r', encoding='utf-8') as f:
+            return self.add_songs(json.load(f))
+
+    def export_json(self, json_path):
+        """Exportar al formato JSON de siempre"""
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries(), f, indent=2, ensure_ascii=False)
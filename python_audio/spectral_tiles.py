@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PIRÁMIDE DE TESELAS DE CHROMA Y ESPECTROGRAMA
+Guarda chroma y espectrograma logarítmico cuantizados a uint8 en varias
+resoluciones temporales. Cada nivel es un archivo binario ordenado por frame,
+de modo que una tesela (nivel, índice) es un rango contiguo de bytes
+"""
+
+import os
+import sys
+import json
+import librosa
+import numpy as np
+
+# Frames (columnas) por tesela
+TILE_FRAMES = 256
+
+# Factor de reducción temporal entre niveles consecutivos
+LEVEL_FACTOR = 4
+
+TILES_INDEX_FILE = 'tiles.json'
+
+# Rango de valores de cada tipo antes de cuantizar
+VALUE_RANGES = {
+    'chroma': (0.0, 1.0),
+    'spectrogram': (-80.0, 0.0)
+}
+
+N_MELS = 128
+
+
+def log_spectrogram(y, sr, hop_length=512, n_mels=N_MELS):
+    """Espectrograma mel en dB relativo al máximo (rango -80..0)"""
+    mel = librosa.feature.melspectrogram(y=y, sr=sr, hop_length=hop_length, n_mels=n_mels)
+    return librosa.power_to_db(mel, ref=np.max, top_db=80.0)
+
+
+def quantize(matrix, value_range):
+    """Llevar una matriz (bins x frames) al rango 0..255"""
+    low, high = value_range
+    scaled = (np.asarray(matrix, dtype=np.float32) - low) / (high - low)
+    return np.round(np.clip(scaled, 0.0, 1.0) * 255.0).astype(np.uint8)
+
+
+def _downsample(frames, factor):
+    """Promediar grupos de factor frames (frames x bins); el último puede ser parcial"""
+    n = len(frames)
+    n_out = int(np.ceil(n / factor))
+    starts = np.arange(0, n, factor)
+    sums = np.add.reduceat(frames.astype(np.float32), starts, axis=0)
+    counts = np.minimum(factor, n - starts).astype(np.float32)
+    return np.round(sums / counts[:, None]).astype(np.uint8)[:n_out]
+
+
+class TileStore:
+    """Teselas uint8 por tipo y nivel en un directorio"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(self.directory, exist_ok=True)
+        self._index = self._read_index()
+
+    def _read_index(self):
+        path = os.path.join(self.directory, TILES_INDEX_FILE)
+        if not os.path.exists(path):
+            return {'tile_frames': TILE_FRAMES, 'kinds': {}}
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_index(self):
+        path = os.path.join(self.directory, TILES_INDEX_FILE)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _level_file(kind, level):
+        return f"{kind}_{int(level)}.bin"
+
+    def write(self, kind, matrix, sr, hop_length):
+        """
+        Guardar todos los niveles de una matriz (bins x frames).
+        Si la matriz ya es uint8 se toma como cuantizada.
+        """
+        if matrix.dtype != np.uint8:
+            matrix = quantize(matrix, VALUE_RANGES[kind])
+
+        # Orden por frame: cada tesela es un bloque contiguo del archivo
+        frames = np.ascontiguousarray(matrix.T)
+        bins = frames.shape[1]
+        levels = []
+        level = 0
+        while True:
+            with open(os.path.join(self.directory, self._level_file(kind, level)), 'wb') as f:
+                f.write(frames.tobytes())
+            levels.append({
+                'frames': int(len(frames)),
+                'hop_length': int(hop_length * LEVEL_FACTOR ** level),
+                'tiles': int(np.ceil(len(frames) / TILE_FRAMES)),
+                'file': self._level_file(kind, level)
+            })
+            if len(frames) <= TILE_FRAMES:
+                break
+            frames = _downsample(frames, LEVEL_FACTOR)
+            level += 1
+
+        self._index['kinds'][kind] = {
+            'sample_rate': int(sr),
+            'bins': int(bins),
+            'value_range': list(VALUE_RANGES[kind]),
+            'levels': levels
+        }
+        self._write_index()
+        return self._index['kinds'][kind]
+
+    def index(self):
+        """Índice completo: tipos, bins, niveles y número de teselas"""
+        return self._index
+
+    def tile(self, kind, level, index):
+        """
+        Tesela (frames x bins, uint8) del nivel e índice pedidos.
+        Solo se lee del disco el rango de la tesela.
+        """
+        info = self._index['kinds'].get(kind)
+        if info is None:
+            raise KeyError(f"Tipo de tesela desconocido: {kind}")
+        if not 0 <= level < len(info['levels']):
+            raise IndexError(f"Nivel fuera de rango: {level}")
+        level_info = info['levels'][level]
+        if not 0 <= index < level_info['tiles']:
+            raise IndexError(f"Tesela fuera de rango: {index}")
+
+        bins = info['bins']
+        frames = np.memmap(
+            os.path.join(self.directory, level_info['file']), dtype=np.uint8, mode='r',
+            shape=(level_info['frames'], bins)
+        )
+        return np.array(frames[index * TILE_FRAMES:(index + 1) * TILE_FRAMES])
+
+    def tile_time_range(self, kind, level, index):
+        """Inicio y fin (segundos) que cubre una tesela"""
+        info = self._index['kinds'][kind]
+        level_info = info['levels'][level]
+        seconds_per_frame = level_info['hop_length'] / info['sample_rate']
+        start = index * TILE_FRAMES
+        end = min(start + TILE_FRAMES, level_info['frames'])
+        return start * seconds_per_frame, end * seconds_per_frame
+
+
+def write_tiles(tiles, kind, matrix, sr, hop_length):
+    """Guardar teselas; un fallo aquí no debe tumbar el análisis"""
+    try:
+        return tiles.write(kind, matrix, sr, hop_length)
+    except Exception as e:
+        print(f"Error al guardar teselas de {kind}: {e}", file=sys.stderr)
+        return None
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SEGMENTACIÓN DE ESTRUCTURA (INTRO / VERSO / ESTRIBILLO)
+Detecta los límites de sección con la novedad de un núcleo en damero sobre
+la banda diagonal de la matriz de auto-similitud sincronizada con el pulso.
+Solo se calcula la banda, así que la memoria queda acotada por
+MAX_STRUCTURE_VECTORS x (2 * KERNEL_HALF_WIDTH + 1) sin importar la duración
+"""
+
+import numpy as np
+from scipy import signal
+
+from beat_sync import beat_boundaries, sync_features
+
+# Máximo de vectores (pulsos o grupos de pulsos) en la matriz de auto-similitud
+MAX_STRUCTURE_VECTORS = 1024
+
+# Semiancho del núcleo en damero, en vectores (16 pulsos = 4 compases de 4/4)
+KERNEL_HALF_WIDTH = 16
+
+# Separación mínima entre límites, en vectores (4 compases)
+MIN_SECTION_VECTORS = 16
+
+# Similitud coseno mínima para que dos secciones reciban la misma etiqueta
+LABEL_SIMILARITY = 0.7
+
+# Fracción máxima de la canción para considerar intro u outro
+EDGE_SECTION_FRACTION = 0.15
+
+
+def _normalize_columns(matrix):
+    """Centrar y normalizar cada fila (característica) y luego cada columna"""
+    matrix = np.asarray(matrix, dtype=np.float64)
+    matrix = matrix - matrix.mean(axis=1, keepdims=True)
+    matrix = matrix / np.maximum(matrix.std(axis=1, keepdims=True), 1e-9)
+    return matrix / np.maximum(np.linalg.norm(matrix, axis=0, keepdims=True), 1e-9)
+
+
+def banded_similarity(vectors, max_lag):
+    """
+    Similitud coseno entre cada vector y los max_lag siguientes.
+    band[i, d] = sim(i, i + d); fuera de rango vale 0. Memoria O(T * max_lag).
+    """
+    n = vectors.shape[1]
+    band = np.zeros((n, max_lag + 1))
+    for lag in range(min(max_lag, n - 1) + 1):
+        band[:n - lag, lag] = np.sum(vectors[:, :n - lag] * vectors[:, lag:], axis=0)
+    return band
+
+
+def checkerboard_novelty(band, half_width):
+    """
+    Novedad de Foote: correlación con un núcleo en damero gaussiano centrado
+    en cada punto de la diagonal, leyendo solo la banda de similitud.
+    """
+    n = band.shape[0]
+    offsets = np.arange(-half_width, half_width)
+    taper = np.exp(-0.5 * ((offsets + 0.5) / (0.5 * half_width)) ** 2)
+    sign = np.where(offsets < 0, -1.0, 1.0)
+
+    novelty = np.zeros(n)
+    for a, weight_a in zip(offsets, taper * sign):
+        for b, weight_b in zip(offsets, taper * sign):
+            if b < a:
+                continue
+            # S(i + a, i + b) = band[i + a, b - a] (simétrica: b >= a)
+            rows = np.arange(n) + a
+            valid = (rows >= 0) & (rows < n)
+            weight = weight_a * weight_b * (1.0 if a == b else 2.0)
+            novelty[valid] += weight * band[rows[valid], b - a]
+    novelty = np.maximum(novelty, 0.0)
+    return novelty / novelty.max() if novelty.max() > 0 else novelty
+
+
+def _label_name(index):
+    """A, B, ..., Z, A2, B2, ..."""
+    return chr(ord('A') + index % 26) + (str(index // 26 + 1) if index >= 26 else '')
+
+
+def _section_names(labels, starts, ends, energies, duration):
+    """Nombres heurísticos: el grupo repetido más enérgico es el estribillo"""
+    counts = {label: labels.count(label) for label in labels}
+    repeated = [label for label in counts if counts[label] > 1]
+
+    chorus = None
+    if repeated:
+        chorus = max(repeated, key=lambda label: np.mean(
+            [energy for energy, other in zip(energies, labels) if other == label]
+        ))
+    verse = next((label for label in labels if label in repeated and label != chorus), None)
+
+    names = []
+    for i, label in enumerate(labels):
+        short = (ends[i] - starts[i]) <= EDGE_SECTION_FRACTION * duration
+        if label == chorus:
+            names.append('estribillo')
+        elif label == verse:
+            names.append('verso')
+        elif i == 0 and short and counts[label] == 1:
+            names.append('intro')
+        elif i == len(labels) - 1 and short and counts[label] == 1:
+            names.append('outro')
+        else:
+            names.append('puente')
+    return names
+
+
+def segment_structure(features, frame_positions, beat_positions, total_samples, sr,
+                      activity=None, energy=None):
+    """
+    Secciones de la canción a partir de características por frame (d x T).
+    frame_positions y beat_positions están en muestras de la línea de tiempo
+    original; energy (opcional, por frame) decide cuál es el estribillo.
+    Devuelve [{'start', 'end', 'label', 'section'}] con tiempos en segundos.
+    """
+    beats = np.asarray(beat_positions, dtype=np.int64)
+    if len(beats) < 2 * MIN_SECTION_VECTORS:
+        return []
+
+    # Agrupar pulsos si hay demasiados: la memoria no crece con la duración
+    beats_per_vector = int(np.ceil(len(beats) / MAX_STRUCTURE_VECTORS))
+    boundaries = beat_boundaries(beats, total_samples, beats_per_vector)
+    vectors, counts = sync_features(features, frame_positions, boundaries)
+
+    # Los vectores sin frames (silencio omitido) no cuentan
+    keep = counts > 0
+    if activity is not None:
+        keep &= ~np.array([
+            activity.is_silent(start, end) for start, end in zip(boundaries[:-1], boundaries[1:])
+        ])
+    if np.count_nonzero(keep) < 2 * MIN_SECTION_VECTORS:
+        return []
+    starts = boundaries[:-1][keep]
+    ends = boundaries[1:][keep]
+    vectors = _normalize_columns(vectors[:, keep])
+
+    # Novedad sobre la banda diagonal y picos como límites
+    half_width = min(KERNEL_HALF_WIDTH, len(starts) // 4)
+    novelty = checkerboard_novelty(banded_similarity(vectors, 2 * half_width), half_width)
+    peaks, _ = signal.find_peaks(
+        novelty, distance=MIN_SECTION_VECTORS, height=np.mean(novelty) + np.std(novelty)
+    )
+    cuts = np.concatenate(([0], peaks[peaks >= MIN_SECTION_VECTORS], [len(starts)]))
+    cuts = np.unique(cuts)
+
+    # Vector medio de cada sección y etiquetado voraz por similitud
+    means = [vectors[:, a:b].mean(axis=1) for a, b in zip(cuts[:-1], cuts[1:])]
+    means = [mean / max(np.linalg.norm(mean), 1e-9) for mean in means]
+    references, labels = [], []
+    for mean in means:
+        scores = [float(np.dot(mean, ref)) for ref in references]
+        if scores and max(scores) >= LABEL_SIMILARITY:
+            labels.append(_label_name(int(np.argmax(scores))))
+        else:
+            references.append(mean)
+            labels.append(_label_name(len(references) - 1))
+
+    section_starts = [float(starts[a]) / sr for a in cuts[:-1]]
+    section_ends = [float(ends[b - 1]) / sr for b in cuts[1:]]
+
+    if energy is not None:
+        energy_vectors, _ = sync_features(np.atleast_2d(energy), frame_positions, boundaries)
+        energy_vectors = energy_vectors[0][keep]
+        energies = [float(np.mean(energy_vectors[a:b])) for a, b in zip(cuts[:-1], cuts[1:])]
+    else:
+        energies = [0.0] * len(labels)
+
+    names = _section_names(labels, section_starts, section_ends, energies, total_samples / sr)
+    return [
+        {'start': start, 'end': end, 'label': label, 'section': name}
+        for start, end, label, name in zip(section_starts, section_ends, labels, names)
+    ]
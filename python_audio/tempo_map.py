@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MAPA DE TEMPO Y REJILLA DE PULSOS
+Un solo espectrograma mel alimenta las envolventes de onsets y un solo
+tempograma da el tempo global, el tempo local por frame y la rejilla de
+pulsos con estimación de los tiempos fuertes (primer pulso de cada compás)
+"""
+
+import librosa
+import numpy as np
+
+# Bandas mel graves (bombo, bajo) para estimar los tiempos fuertes
+BASS_MEL_BANDS = 16
+
+# Pulsos por compás supuestos (4/4)
+BEATS_PER_BAR = 4
+
+# Ventana de autocorrelación del tempograma (segundos), igual que librosa
+TEMPOGRAM_WINDOW = 8.0
+
+# Desviación (en octavas) del tempo local respecto al global
+LOCAL_TEMPO_STD = 0.25
+
+# Resolución de la curva de tempo (segundos)
+TEMPO_CURVE_STEP = 4.0
+
+
+def rhythm_envelopes(y, sr, hop_length=512):
+    """
+    Envolventes de onsets de un único espectrograma mel: la mediana para los
+    pulsos y la media para los onsets (igual que beat_track y onset_detect
+    con y=), más la de las bandas graves para los tiempos fuertes.
+    """
+    mel_db = librosa.power_to_db(librosa.feature.melspectrogram(y=y, sr=sr, hop_length=hop_length))
+    onset_envelope = librosa.onset.onset_strength(S=mel_db, sr=sr, aggregate=np.median)
+    onset_frames = librosa.onset.onset_detect(
+        onset_envelope=librosa.onset.onset_strength(S=mel_db, sr=sr),
+        sr=sr, hop_length=hop_length
+    )
+    bass_envelope = librosa.onset.onset_strength(S=mel_db[:BASS_MEL_BANDS], sr=sr)
+    return {
+        'mel_db': mel_db,
+        'onset_envelope': onset_envelope,
+        'onset_frames': onset_frames,
+        'bass_envelope': bass_envelope
+    }
+
+
+def bar_phase(beat_strengths, beats_per_bar=BEATS_PER_BAR):
+    """Fase del compás (0..beats_per_bar-1) cuyos pulsos son más fuertes"""
+    beat_strengths = np.asarray(beat_strengths)
+    if len(beat_strengths) < beats_per_bar:
+        return 0
+    return int(np.argmax([
+        np.mean(beat_strengths[phase::beats_per_bar]) for phase in range(beats_per_bar)
+    ]))
+
+
+def downbeat_phase(beat_frames, strength_envelope, beats_per_bar=BEATS_PER_BAR):
+    """Fase de los tiempos fuertes según la energía de graves en cada pulso"""
+    beat_frames = np.asarray(beat_frames, dtype=np.int64)
+    beat_frames = beat_frames[beat_frames < len(strength_envelope)]
+    return bar_phase(strength_envelope[beat_frames], beats_per_bar)
+
+
+def beat_local_score(onset_envelope, tempo, sr, hop_length=512):
+    """
+    Envolvente de onsets suavizada como la que usa beat_track para puntuar los
+    pulsos (su convolución nunca suma el primer frame de la envolvente).
+    """
+    frames_per_beat = max(1.0, np.round(sr / hop_length * 60.0 / tempo))
+    offsets = np.arange(-frames_per_beat, frames_per_beat + 1)
+    window = np.exp(-0.5 * (offsets * 32.0 / frames_per_beat) ** 2)
+    onset_envelope = np.array(onset_envelope, dtype=np.float64)
+    onset_envelope[:1] = 0.0
+    return np.convolve(onset_envelope, window, mode='same')
+
+
+def trim_weak_beats(beat_positions, frame_positions, onset_envelope):
+    """
+    Máscara de pulsos sin los débiles del principio y del final (fundidos,
+    colas), con la regla de beat_track: el umbral es la mitad del RMS de la
+    envolvente en los pulsos suavizada con una ventana de Hann de 5 (la
+    convolución completa sin las dos primeras muestras, cola incluida) y se
+    quitan los pulsos anteriores al primer frame que lo supera y posteriores
+    al último. Sirve para recortar la rejilla unida de varios fragmentos con
+    el criterio del archivo entero.
+    """
+    beat_positions = np.asarray(beat_positions, dtype=np.int64)
+    frame_positions = np.asarray(frame_positions, dtype=np.int64)
+    onset_envelope = np.asarray(onset_envelope, dtype=np.float64)
+    if len(beat_positions) == 0 or len(frame_positions) == 0:
+        return np.ones(len(beat_positions), dtype=bool)
+
+    at_beats = onset_envelope[np.clip(np.searchsorted(frame_positions, beat_positions), 0, len(frame_positions) - 1)]
+    window = np.hanning(5)
+    smooth = np.convolve(at_beats, window)[len(window) // 2:]
+    strong = frame_positions[onset_envelope > 0.5 * np.sqrt(np.mean(smooth ** 2))]
+    if len(strong) == 0:
+        return np.zeros(len(beat_positions), dtype=bool)
+    return (beat_positions >= strong[0]) & (beat_positions <= strong[-1])
+
+
+def analyze_rhythm(onset_envelope, sr, hop_length=512, bass_envelope=None, trim=True):
+    """
+    Tempo global, pulsos, tempo local por frame y fase de los tiempos fuertes
+    a partir de un solo tempograma (beat_track recibe el tempo ya calculado).
+    Con trim=False no se quitan los pulsos débiles de los extremos (el análisis
+    por fragmentos los recorta después sobre la rejilla unida).
+    """
+    win_length = librosa.time_to_frames(TEMPOGRAM_WINDOW, sr=sr, hop_length=hop_length).item()
+    tempogram = librosa.feature.tempogram(
+        onset_envelope=onset_envelope, sr=sr, hop_length=hop_length, win_length=win_length
+    )
+    tempo = float(librosa.feature.tempo(
+        onset_envelope=onset_envelope, tg=tempogram, sr=sr, hop_length=hop_length
+    )[0])
+    # Tempo local: prior centrado en el global para no saltar de octava o a tresillos
+    local_tempo = librosa.feature.tempo(
+        onset_envelope=onset_envelope, tg=tempogram, sr=sr, hop_length=hop_length,
+        start_bpm=tempo, std_bpm=LOCAL_TEMPO_STD, aggregate=None
+    )
+    _, beat_frames = librosa.beat.beat_track(
+        onset_envelope=onset_envelope, sr=sr, hop_length=hop_length, bpm=tempo, trim=trim
+    )
+    strength = bass_envelope if bass_envelope is not None else onset_envelope
+    return {
+        'tempo': tempo,
+        'beat_frames': np.asarray(beat_frames, dtype=np.int64),
+        'local_tempo': np.asarray(local_tempo, dtype=np.float32),
+        'downbeat_phase': downbeat_phase(beat_frames, strength)
+    }
+
+
+def tempo_curve(frame_positions, local_tempo, sr, total_samples, step=TEMPO_CURVE_STEP):
+    """
+    Curva de tempo compacta: mediana del tempo local en ventanas de step segundos.
+    frame_positions en muestras de la línea de tiempo original.
+    """
+    frame_positions = np.asarray(frame_positions, dtype=np.int64)
+    local_tempo = np.asarray(local_tempo)[:len(frame_positions)]
+    window = int(step * sr)
+    window_idx = frame_positions[:len(local_tempo)] // window
+    n_windows = int(np.ceil(total_samples / window))
+
+    times, bpms = [], []
+    for idx in range(n_windows):
+        values = local_tempo[window_idx == idx]
+        if len(values) == 0:
+            continue
+        times.append(round(idx * step, 3))
+        bpms.append(round(float(np.median(values)), 1))
+    return {'time': times, 'bpm': bpms}
+
+
+def beat_grid(beat_positions, phase, sr, beats_per_bar=BEATS_PER_BAR):
+    """Tiempos de pulso y de tiempos fuertes (segundos, al milisegundo)"""
+    beat_times = np.round(np.asarray(beat_positions, dtype=np.float64) / sr, 3)
+    return {
+        'beats': beat_times.tolist(),
+        'downbeats': beat_times[phase::beats_per_bar].tolist(),
+        'beats_per_bar': beats_per_bar
+    }
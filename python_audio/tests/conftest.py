@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""Los módulos de python_audio se importan por nombre, como al ejecutarlos desde su carpeta"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
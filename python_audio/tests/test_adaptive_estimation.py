@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""Estimación adaptativa: envolvente por bloques, bloques alineados al hop y parada"""
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+import adaptive_estimation
+from adaptive_estimation import OnsetEnvelopeStream, onset_envelope, estimate_key_tempo_adaptive, HOP_LENGTH
+
+SR = 22050
+
+
+# Progresión I-IV-V-I de do mayor, dos segundos por acorde
+PROGRESSION = [(261.63, 329.63, 392.0), (349.23, 440.0, 523.25), (392.0, 493.88, 587.33), (261.63, 329.63, 392.0)]
+
+
+def progression_with_clicks(seconds, bpm=120, sr=SR):
+    """Progresión en do mayor con clics a bpm"""
+    t = np.arange(int(seconds * sr)) / sr
+    y = np.zeros_like(t)
+    for i in range(int(np.ceil(seconds / 2))):
+        span = slice(i * 2 * sr, (i + 1) * 2 * sr)
+        y[span] = sum(0.2 * np.sin(2 * np.pi * f * t[span]) for f in PROGRESSION[i % len(PROGRESSION)])
+    for beat in np.arange(0, seconds, 60.0 / bpm):
+        start = int(beat * sr)
+        y[start:start + 200] += 0.8
+    return y.astype(np.float32)
+
+
+@pytest.mark.parametrize('block_size', [HOP_LENGTH * 40, 11025, 3000])
+def test_streamed_envelope_matches_whole_signal(block_size):
+    rng = np.random.default_rng(0)
+    y = progression_with_clicks(8) + 0.01 * rng.standard_normal(8 * SR).astype(np.float32)
+    stream = OnsetEnvelopeStream(SR)
+    streamed = np.concatenate([stream.push(y[i:i + block_size]) for i in range(0, len(y), block_size)])
+    whole = onset_envelope(y, SR)
+    assert streamed.shape == whole.shape
+    np.testing.assert_allclose(streamed, whole, atol=1e-4)
+
+
+def test_converges_on_stable_signal(tmp_path):
+    path = tmp_path / 'chord.wav'
+    sf.write(path, progression_with_clicks(60), SR)
+    result = estimate_key_tempo_adaptive(str(path), sr=SR, min_duration=10.0)
+    assert result['success'] and result['converged']
+    assert result['key'] == 'C Major'
+    assert result['bpm'] == pytest.approx(120, rel=0.05)
+    assert result['audio_consumed'] < 60
+    # Los incrementos se redondean a múltiplos del hop
+    assert round(result['audio_consumed'] * SR) % HOP_LENGTH == 0
+
+
+def test_key_estimation_failure_does_not_raise(tmp_path, monkeypatch):
+    path = tmp_path / 'chord.wav'
+    sf.write(path, progression_with_clicks(12), SR)
+    monkeypatch.setattr(adaptive_estimation, 'estimate_key', lambda chroma: {'key': 'Unknown', 'confidence': 0.0})
+    result = estimate_key_tempo_adaptive(str(path), sr=SR)
+    assert result['success'] and not result['converged']
+    assert result['key'] == 'Unknown' and result['key_margin'] == 0.0
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""Huellas acústicas: votación por desfase, búsqueda y caché del índice por proceso"""
+
+import numpy as np
+import pytest
+
+from audio_fingerprint import (
+    FingerprintIndex, fingerprint, get_fingerprint_index,
+    FINGERPRINT_SR, HOP_LENGTH, MIN_MATCH_VOTES
+)
+
+
+def votes_at(song, delta, count):
+    return np.full(count, song, dtype=np.int64), np.full(count, delta, dtype=np.int64)
+
+
+def test_rank_orders_songs_by_aligned_votes():
+    index = FingerprintIndex(path=None)
+    index.songs = ['a', 'b', 'c']
+    parts = [votes_at(0, 40, 20), votes_at(1, -3, 30), votes_at(2, 7, 5), votes_at(0, 41, 15)]
+    songs = np.concatenate([p[0] for p in parts])
+    deltas = np.concatenate([p[1] for p in parts])
+
+    ranked = index.rank(songs, deltas)
+    # Solo cuentan los votos del desfase más votado de cada canción; 'c' no llega al mínimo
+    assert [(m['song_id'], m['votes']) for m in ranked] == [('b', 30), ('a', 20)]
+    assert ranked[1]['offset'] == pytest.approx(40 * HOP_LENGTH / FINGERPRINT_SR)
+    assert ranked[0]['confidence'] > ranked[1]['confidence'] > 0.5
+
+    assert [m['song_id'] for m in index.rank(songs, deltas, top_k=1)] == ['b']
+    assert [m['song_id'] for m in index.rank(songs, deltas, min_votes=1)] == ['b', 'a', 'c']
+    assert index.rank(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)) == []
+
+
+def noise_song(seed, seconds=20):
+    return np.random.default_rng(seed).standard_normal(seconds * FINGERPRINT_SR).astype(np.float32) * 0.1
+
+
+def test_lookup_finds_excerpt_and_offset(tmp_path):
+    index = FingerprintIndex(path=str(tmp_path / 'index.npz'))
+    songs = {song_id: noise_song(seed) for seed, song_id in enumerate(['uno', 'dos', 'tres'])}
+    for song_id, y in songs.items():
+        index.add_song(song_id, *fingerprint(y, FINGERPRINT_SR))
+
+    start = 6 * FINGERPRINT_SR
+    matches = index.lookup(*fingerprint(songs['dos'][start:start + 5 * FINGERPRINT_SR], FINGERPRINT_SR))
+    assert matches[0]['song_id'] == 'dos'
+    assert matches[0]['votes'] >= MIN_MATCH_VOTES
+    assert matches[0]['offset'] == pytest.approx(6.0, abs=2 * HOP_LENGTH / FINGERPRINT_SR)
+
+
+def test_shared_index_is_reloaded_only_when_the_file_changes(tmp_path):
+    path = str(tmp_path / 'index.npz')
+    index = FingerprintIndex(path=path)
+    index.add_song('uno', *fingerprint(noise_song(0, 5), FINGERPRINT_SR))
+    index.save()
+
+    shared = get_fingerprint_index(path)
+    assert shared.songs == ['uno']
+    assert get_fingerprint_index(path) is shared
+
+    index.add_song('dos', *fingerprint(noise_song(1, 5), FINGERPRINT_SR))
+    index.save()
+    reloaded = get_fingerprint_index(path)
+    assert reloaded is not shared
+    assert reloaded.songs == ['uno', 'dos']
+
+
+def test_batch_add_matches_one_by_one_and_replaces():
+    rng = np.random.default_rng(4)
+    songs = [
+        (song_id, rng.integers(0, 1 << 20, 500).astype(np.uint32), np.arange(500))
+        for song_id in ('uno', 'dos', 'tres')
+    ]
+    one_by_one = FingerprintIndex(path=None)
+    for song in songs:
+        one_by_one.add_song(*song)
+    batch = FingerprintIndex(path=None)
+    batch.add_songs(songs)
+
+    assert batch.songs == one_by_one.songs
+    for name in ('hashes', 'song_idx', 'offsets'):
+        np.testing.assert_array_equal(getattr(batch, name), getattr(one_by_one, name))
+    assert np.all(np.diff(batch.hashes.astype(np.int64)) >= 0)
+
+    # Reemplazar una canción ya indexada y repetir otra dentro del lote: gana la última
+    new_hashes = np.arange(10, dtype=np.uint32)
+    batch.add_songs([('dos', new_hashes, np.arange(10)), ('cuatro', new_hashes, np.arange(10)),
+                     ('cuatro', new_hashes[:5], np.arange(5))])
+    assert batch.songs == ['uno', None, 'tres', 'dos', 'cuatro']
+    assert np.sum(batch.song_idx == 3) == 10 and np.sum(batch.song_idx == 4) == 5
+    assert np.sum(batch.song_idx == 1) == 0
+    assert len(batch.hashes) == 2 * 500 + 15
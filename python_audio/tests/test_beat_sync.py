@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""Límites por pulso o compás, promedios por segmento y puntuación de plantillas"""
+
+import numpy as np
+
+from beat_sync import beat_boundaries, sync_features, score_templates
+
+BEATS = [100, 200, 300, 400, 500, 600, 700, 800, 900]
+
+
+def test_beat_boundaries_per_beat():
+    np.testing.assert_array_equal(beat_boundaries(BEATS, 1000), [0] + BEATS + [1000])
+
+
+def test_bar_boundaries_start_at_the_downbeat():
+    # Sin fase el compás empieza en el primer pulso detectado
+    np.testing.assert_array_equal(beat_boundaries(BEATS, 1000, 4), [0, 100, 500, 900, 1000])
+    # Con el primer tiempo fuerte en el pulso 2, los pulsos 0 y 1 son anacrusa
+    np.testing.assert_array_equal(beat_boundaries(BEATS, 1000, 4, phase=2), [0, 300, 700, 1000])
+
+
+def test_phase_is_ignored_per_beat():
+    np.testing.assert_array_equal(beat_boundaries(BEATS, 1000, 1, phase=3), beat_boundaries(BEATS, 1000))
+
+
+def test_beat_boundaries_without_beats():
+    np.testing.assert_array_equal(beat_boundaries([], 1000, 4, phase=1), [0, 1000])
+
+
+def test_sync_features_means_and_counts():
+    features = np.array([[1.0, 3.0, 5.0, 7.0]])
+    means, counts = sync_features(features, np.array([0, 10, 20, 30]), np.array([0, 15, 40]))
+    np.testing.assert_array_equal(counts, [2, 2])
+    np.testing.assert_allclose(means, [[2.0, 6.0]])
+
+
+def test_score_templates_matches_corrcoef():
+    rng = np.random.default_rng(0)
+    vectors = rng.random((12, 5))
+    templates = {'C': [1, 0, 0, 0, 1, 0, 0, 1, 0, 0, 0, 0], 'Am': [1, 0, 0, 1, 0, 0, 0, 0, 1, 0, 0, 0]}
+    names, scores, best = score_templates(vectors, templates)
+    for i in range(vectors.shape[1]):
+        expected = [np.corrcoef(vectors[:, i], templates[name])[0, 1] for name in names]
+        assert best[i] == int(np.argmax(expected))
+        np.testing.assert_allclose(scores[i], max(expected))
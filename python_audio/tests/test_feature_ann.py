@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""Índice IVF: recall frente a la búsqueda exacta de SongFeatureMatrix.top_k"""
+
+import numpy as np
+import pytest
+
+from song_similarity import SongFeatureMatrix
+from feature_ann import IVFIndex, DEFAULT_N_PROBE
+
+N_SONGS = 2000
+N_QUERIES = 100
+
+
+@pytest.fixture(scope='module')
+def catalog():
+    """Base sintética con chroma agrupado por "estilos" y el resto al azar"""
+    rng = np.random.default_rng(0)
+    styles = rng.random((20, 12))
+    chroma = styles[rng.integers(0, len(styles), N_SONGS)] + 0.3 * rng.random((N_SONGS, 12))
+    matrix = SongFeatureMatrix(
+        [f"song_{i}" for i in range(N_SONGS)],
+        tempo=rng.uniform(60, 180, N_SONGS),
+        chroma=chroma,
+        spectral_centroid=rng.uniform(500, 4000, N_SONGS),
+        mfcc=20 * rng.standard_normal((N_SONGS, 13)),
+        tonnetz=rng.standard_normal((N_SONGS, 6)),
+        spectral_contrast=5 * rng.standard_normal((N_SONGS, 7))
+    )
+    return matrix, IVFIndex.build(matrix)
+
+
+def queries(matrix, rng):
+    """Canciones de la base con un poco de ruido (otra grabación de la misma)"""
+    for row in rng.choice(len(matrix), N_QUERIES, replace=False):
+        yield {
+            'tempo': matrix.tempo[row] + rng.normal(0, 1),
+            'chroma': matrix.chroma[row] + rng.normal(0, 0.02, 12),
+            'spectral_centroid': matrix.spectral_centroid[row] + rng.normal(0, 20),
+            'mfcc': matrix.mfcc[row] + rng.normal(0, 1, 13),
+            'tonnetz': matrix.tonnetz[row] + rng.normal(0, 0.05, 6),
+            'spectral_contrast': matrix.spectral_contrast[row] + rng.normal(0, 0.2, 7)
+        }
+
+
+def test_best_match_recall_with_default_probes(catalog):
+    matrix, index = catalog
+    hits = 0
+    for features in queries(matrix, np.random.default_rng(1)):
+        exact = matrix.top_k(features, k=1)
+        approximate = matrix.top_k(features, k=1, rows=index.candidates(features, matrix, DEFAULT_N_PROBE))
+        hits += approximate[:1] == exact[:1]
+    assert hits / N_QUERIES >= 0.95
+
+
+def test_recall_grows_with_probes_and_is_exact_when_probing_all(catalog):
+    matrix, index = catalog
+    recalls = []
+    for n_probe in (1, DEFAULT_N_PROBE, index.n_lists):
+        found = 0
+        for features in queries(matrix, np.random.default_rng(2)):
+            exact = matrix.top_k(features, k=5)
+            approximate = matrix.top_k(features, k=5, rows=index.candidates(features, matrix, n_probe))
+            found += len(set(exact) & set(approximate))
+        recalls.append(found / (5 * N_QUERIES))
+    assert recalls == sorted(recalls)
+    assert recalls[-1] == 1.0
+
+
+def test_candidates_cover_each_row_once(catalog):
+    matrix, index = catalog
+    features = next(queries(matrix, np.random.default_rng(3)))
+    rows = index.candidates(features, matrix, index.n_lists)
+    np.testing.assert_array_equal(rows, np.arange(N_SONGS))
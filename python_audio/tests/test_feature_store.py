@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""Almacén de características por frame"""
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from feature_store import FeatureStore, params_hash
+
+PARAMS = {'hop_length': 512, 'skip_silence': True}
+
+
+def make_features():
+    return {
+        'sr': 22050,
+        'hop_length': 512,
+        'tempo': 120.5,
+        'chroma': np.random.default_rng(0).random((12, 40)).astype(np.float32),
+        'frame_positions': np.arange(40, dtype=np.int64) * 512,
+        'basic_sums': {'mfcc': np.arange(13, dtype=np.float64), 'zero_crossing_rate': 1.5},
+        'basic_counts': {'mfcc': 40, 'zero_crossing_rate': 40}
+    }
+
+
+def test_round_trip(tmp_path):
+    source = tmp_path / 'song.wav'
+    source.write_bytes(b'audio')
+    store = FeatureStore(str(tmp_path / 'store'))
+    features = make_features()
+    store.save(str(source), PARAMS, features)
+
+    loaded = store.load(str(source), PARAMS)
+    assert loaded['sr'] == 22050 and loaded['tempo'] == 120.5
+    np.testing.assert_array_equal(loaded['chroma'], features['chroma'])
+    np.testing.assert_array_equal(loaded['frame_positions'], features['frame_positions'])
+    np.testing.assert_array_equal(loaded['basic_sums']['mfcc'], features['basic_sums']['mfcc'])
+    assert loaded['basic_counts'] == {'mfcc': 40, 'zero_crossing_rate': 40}
+    assert loaded['source_path'] == str(source)
+    assert [entry['tempo'] for entry in store.entries()] == [120.5]
+
+
+def test_key_depends_on_content_and_params(tmp_path):
+    source = tmp_path / 'song.wav'
+    source.write_bytes(b'audio')
+    store = FeatureStore(str(tmp_path / 'store'))
+    store.save(str(source), PARAMS, make_features())
+
+    assert store.load(str(source), {**PARAMS, 'hop_length': 1024}) is None
+    assert params_hash(PARAMS) != params_hash({**PARAMS, 'skip_silence': False})
+    source.write_bytes(b'otro audio')
+    assert store.load(str(source), PARAMS) is None
+
+
+def test_corrupt_entry_is_recomputed_quietly_on_stdout(tmp_path, capsys):
+    source = tmp_path / 'song.wav'
+    source.write_bytes(b'audio')
+    store = FeatureStore(str(tmp_path / 'store'))
+    path = store.save(str(source), PARAMS, make_features())
+    with open(path, 'wb') as f:
+        f.write(b'no es un npz')
+
+    assert store.load(str(source), PARAMS) is None
+    assert list(store.entries()) == []
+    captured = capsys.readouterr()
+    # stdout lleva el JSON del resultado
+    assert captured.out == ''
+    assert 'ilegible' in captured.err
+
+
+def test_frame_features_skip_silence_and_keep_original_positions():
+    from analyze_audio_ultimate import extract_frame_features, analyze_from_features
+
+    sr = 22050
+    y = np.zeros(30 * sr, dtype=np.float32)
+    click = np.sin(2 * np.pi * 1000 * np.arange(int(0.02 * sr)) / sr).astype(np.float32)
+    for t in np.arange(0, 30, 0.5):
+        if not 10 <= t < 20:
+            y[int(t * sr):int(t * sr) + len(click)] = click
+
+    features = extract_frame_features(y, sr)
+    positions = features['frame_positions']
+    assert np.all(np.diff(positions) > 0)
+    assert not np.any((positions > 10.1 * sr) & (positions < 19.9 * sr))
+    beats = features['beat_positions'] / sr
+    assert not np.any((beats > 10.1) & (beats < 19.9))
+    assert features['log_spectrogram'].shape[1] == 1 + len(y) // 512
+
+    result = analyze_from_features(features)
+    assert abs(result['bpm'] - 120) < 3
+
+
+@pytest.fixture(scope='module')
+def two_section_file(tmp_path_factory):
+    """Silencio, 16 s de Do con clics, 16 s de La menor con ruido y silencio"""
+    sr = 22050
+    t = np.arange(40 * sr) / sr
+    click = np.sin(2 * np.pi * 1000 * np.arange(int(0.02 * sr)) / sr)
+    y = np.zeros(len(t))
+    for beat in np.arange(0, 40, 0.5):
+        y[int(beat * sr):int(beat * sr) + len(click)] += click
+    first = (t >= 3) & (t < 19)
+    second = (t >= 19) & (t < 35)
+    y[first] += 0.1 * sum(np.sin(2 * np.pi * f * t[first]) for f in (261.63, 329.63, 392.0))
+    y[second] += 0.1 * sum(np.sin(2 * np.pi * f * t[second]) for f in (220.0, 261.63, 329.63))
+    y[second] += 0.05 * np.random.default_rng(0).standard_normal(second.sum())
+    y[~(first | second)] = 0.0
+    path = tmp_path_factory.mktemp('audio') / 'sections.wav'
+    sf.write(str(path), y.astype(np.float32), sr)
+    return str(path)
+
+
+@pytest.mark.parametrize('sync', [None, 'bar'])
+def test_cached_analysis_matches_serial(two_section_file, tmp_path, sync):
+    from analyze_audio_ultimate import analyze_audio_complete
+
+    serial = analyze_audio_complete(two_section_file, sync=sync)
+    store = FeatureStore(str(tmp_path / 'store'))
+    uncached = analyze_audio_complete(two_section_file, sync=sync, store=store)
+    cached = analyze_audio_complete(two_section_file, sync=sync, store=store)
+    assert len(list(store.entries())) == 1
+
+    # Mismos acordes (STFT por bloque) y misma estructura (structure_features)
+    for result in (uncached, cached):
+        assert result['analysis_method'] == 'ultimate_v2_features'
+        for name in serial:
+            if name != 'analysis_method':
+                assert result[name] == serial[name], name
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""Decodificador ffmpeg (con subprocess sustituido) y lectura por bloques con soundfile"""
+
+import io
+import subprocess
+
+import numpy as np
+import pytest
+import soundfile as sf
+import soxr
+
+import ffmpeg_decoder
+from ffmpeg_decoder import FFmpegDecoder, _soundfile_blocks, ffmpeg_available
+
+
+class FakePopen:
+    """Proceso de ffmpeg que entrega data por stdout, escribe error y sale con returncode"""
+
+    def __init__(self, data, returncode=0, error=b''):
+        self.data, self.final_returncode, self.error = data, returncode, error
+        self.command = None
+        self.returncode = None
+
+    def __call__(self, command, stdout=None, stderr=None, bufsize=None):
+        self.command = command
+        self.stdout = io.BytesIO(self.data)
+        stderr.write(self.error)
+        return self
+
+    def poll(self):
+        return self.returncode
+
+    def kill(self):
+        self.final_returncode = -9
+
+    def wait(self):
+        self.returncode = self.final_returncode
+        return self.returncode
+
+
+def samples_bytes(count):
+    return np.arange(count, dtype=np.float32).tobytes()
+
+
+def test_command_seeks_trims_and_resamples():
+    command = FFmpegDecoder('cancion.mp3', sr=16000, offset=1.5, duration=2)._command()
+    assert command[:5] == ['ffmpeg', '-nostdin', '-hide_banner', '-loglevel', 'error']
+    assert command[command.index('-ss') + 1] == '1.500000'
+    assert command[command.index('-t') + 1] == '2.000000'
+    assert command[command.index('-i') + 1] == 'cancion.mp3'
+    assert command[command.index('-ar') + 1] == '16000'
+    assert command[command.index('-ac') + 1] == '1'
+    assert command[-3:] == ['-acodec', 'pcm_f32le', 'pipe:1']
+
+    command = FFmpegDecoder('cancion.mp3', sr=22050)._command()
+    assert '-ss' not in command and '-t' not in command
+
+
+def test_native_rate_requires_a_probe(monkeypatch):
+    monkeypatch.setattr(ffmpeg_decoder, 'probe_sample_rate', lambda path: None)
+    with pytest.raises(RuntimeError):
+        FFmpegDecoder('cancion.mp3', sr=None)
+    monkeypatch.setattr(ffmpeg_decoder, 'probe_sample_rate', lambda path: 44100)
+    assert FFmpegDecoder('cancion.mp3', sr=None).sr == 44100
+
+
+def test_read_drops_partial_samples(monkeypatch):
+    def run(command, capture_output):
+        return subprocess.CompletedProcess(command, 0, samples_bytes(10) + b'\x00\x00', b'')
+
+    monkeypatch.setattr(ffmpeg_decoder.subprocess, 'run', run)
+    np.testing.assert_array_equal(FFmpegDecoder('cancion.mp3').read(), np.arange(10))
+
+
+def test_read_raises_with_ffmpeg_error(monkeypatch):
+    def run(command, capture_output):
+        return subprocess.CompletedProcess(command, 1, b'', b'cancion.mp3: Invalid data found')
+
+    monkeypatch.setattr(ffmpeg_decoder.subprocess, 'run', run)
+    with pytest.raises(RuntimeError, match='Invalid data found'):
+        FFmpegDecoder('cancion.mp3').read()
+
+
+def test_blocks_have_block_size_samples(monkeypatch):
+    process = FakePopen(samples_bytes(10) + b'\x00')
+    monkeypatch.setattr(ffmpeg_decoder.subprocess, 'Popen', process)
+    blocks = list(FFmpegDecoder('cancion.mp3', sr=8000).blocks(block_size=4))
+    assert [len(block) for block in blocks] == [4, 4, 2]
+    np.testing.assert_array_equal(np.concatenate(blocks), np.arange(10))
+    assert process.command[process.command.index('-ar') + 1] == '8000'
+
+
+def test_failed_decode_raises_instead_of_ending(monkeypatch):
+    process = FakePopen(samples_bytes(6), returncode=1, error=b'moov atom not found')
+    monkeypatch.setattr(ffmpeg_decoder.subprocess, 'Popen', process)
+    blocks = FFmpegDecoder('cancion.m4a').blocks(block_size=4)
+    assert len(next(blocks)) == 4
+    with pytest.raises(RuntimeError, match='moov atom not found'):
+        next(blocks)
+
+
+def test_closing_early_kills_ffmpeg(monkeypatch):
+    process = FakePopen(samples_bytes(12))
+    monkeypatch.setattr(ffmpeg_decoder.subprocess, 'Popen', process)
+    blocks = FFmpegDecoder('cancion.mp3').blocks(block_size=4)
+    next(blocks)
+    blocks.close()
+    assert process.returncode == -9
+
+
+@pytest.mark.skipif(not ffmpeg_available(), reason='ffmpeg no está instalado')
+def test_ffmpeg_decodes_and_resamples(tmp_path):
+    sr = 44100
+    y = 0.1 * np.sin(2 * np.pi * 440 * np.arange(2 * sr) / sr)
+    path = tmp_path / 'tono.wav'
+    sf.write(path, y.astype(np.float32), sr)
+    decoded = FFmpegDecoder(str(path), sr=22050).read()
+    assert abs(len(decoded) - sr) <= 64
+    streamed = np.concatenate(list(FFmpegDecoder(str(path), sr=22050).blocks(block_size=4096)))
+    np.testing.assert_array_equal(streamed, decoded)
+    with pytest.raises(RuntimeError):
+        list(FFmpegDecoder(str(tmp_path / 'no_existe.mp3')).blocks())
+
+
+def write_stereo(path, sr, seconds):
+    t = np.arange(int(seconds * sr)) / sr
+    left = 0.2 * np.sin(2 * np.pi * 440 * t)
+    right = 0.2 * np.sin(2 * np.pi * 660 * t)
+    sf.write(path, np.stack([left, right], axis=1).astype(np.float32), sr, subtype='FLOAT')
+    return ((left + right) / 2).astype(np.float32)
+
+
+def test_soundfile_blocks_at_native_rate(tmp_path):
+    path = tmp_path / 'estereo.wav'
+    mono = write_stereo(path, 8000, 2.5)
+    blocks = list(_soundfile_blocks(str(path), 8000, 8000, 4096))
+    assert [len(block) for block in blocks] == [4096] * 4 + [20000 - 4 * 4096]
+    np.testing.assert_allclose(np.concatenate(blocks), mono, atol=1e-6)
+
+
+def test_soundfile_blocks_resample_incrementally(tmp_path):
+    path = tmp_path / 'estereo.wav'
+    mono = write_stereo(path, 44100, 3)
+    blocks = list(_soundfile_blocks(str(path), 44100, 22050, 8192))
+    assert all(len(block) == 8192 for block in blocks[:-1]) and 0 < len(blocks[-1]) <= 8192
+    streamed = np.concatenate(blocks)
+    expected = soxr.resample(mono, 44100, 22050)
+    assert len(streamed) == len(expected)
+    np.testing.assert_allclose(streamed, expected, atol=1e-3)
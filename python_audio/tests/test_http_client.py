@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""Cortocircuito por host: cerrado, abierto, medio abierto con un solo intento"""
+
+import threading
+
+import pytest
+import requests
+
+import http_client
+from http_client import HttpClient, CircuitOpenError, RequestCancelled, _Circuit, CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_SECONDS
+
+URL = 'http://servicio.local/recurso'
+
+
+class FakeTime:
+    """Reloj manual: las esperas avanzan el reloj sin dormir"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.headers = {}
+
+
+class FakeSession:
+    """Devuelve (o lanza) los resultados programados, uno por petición"""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0) if len(self.outcomes) > 1 else self.outcomes[0]
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return FakeResponse(outcome)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeTime()
+    monkeypatch.setattr(http_client, 'time', fake)
+    return fake
+
+
+def client_with(*outcomes):
+    client = HttpClient()
+    client.session = FakeSession(*outcomes)
+    return client
+
+
+def test_circuit_opens_after_threshold_and_allows_one_trial(clock):
+    circuit = _Circuit()
+    for _ in range(CIRCUIT_FAILURE_THRESHOLD - 1):
+        assert circuit.allow()
+        circuit.record(False)
+    assert circuit.allow()
+    circuit.record(False)
+
+    # Abierto: falla al instante hasta que pasa el plazo
+    assert not circuit.allow()
+    clock.now += CIRCUIT_RESET_SECONDS
+    # Medio abierto: una sola petición de prueba a la vez
+    assert circuit.allow()
+    assert not circuit.allow()
+
+    # La prueba falla: otra vez abierto el plazo completo
+    circuit.record(False)
+    assert not circuit.allow()
+    clock.now += CIRCUIT_RESET_SECONDS
+    assert circuit.allow()
+
+    # La prueba sale bien: cerrado y con el contador a cero
+    circuit.record(True)
+    assert circuit.failures == 0
+    assert circuit.allow() and circuit.allow()
+
+
+def test_request_opens_circuit_and_then_fails_fast(clock):
+    client = client_with(requests.exceptions.ConnectionError('sin red'))
+    for _ in range(CIRCUIT_FAILURE_THRESHOLD):
+        with pytest.raises(requests.exceptions.ConnectionError):
+            client.request('GET', URL, retries=0)
+    calls = client.session.calls
+
+    with pytest.raises(CircuitOpenError):
+        client.request('GET', URL, retries=0)
+    assert client.session.calls == calls
+
+
+def test_retries_server_errors_until_success(clock):
+    client = client_with(503, 502, 200)
+    response = client.request('GET', URL, retries=2)
+    assert response.status_code == 200
+    assert client.session.calls == 3
+    _, circuit = client._host_state(URL)
+    assert circuit.failures == 0
+
+
+def test_unexpected_error_in_trial_releases_it(clock):
+    client = client_with(requests.exceptions.ConnectionError('sin red'))
+    for _ in range(CIRCUIT_FAILURE_THRESHOLD):
+        with pytest.raises(requests.exceptions.ConnectionError):
+            client.request('GET', URL, retries=0)
+    clock.now += CIRCUIT_RESET_SECONDS
+
+    # La petición de prueba falla con un error que no es de red
+    client.session = FakeSession(requests.exceptions.InvalidURL('url rota'), 200)
+    with pytest.raises(requests.exceptions.InvalidURL):
+        client.request('GET', URL, retries=0)
+    _, circuit = client._host_state(URL)
+    assert not circuit.trial_running
+
+    # Cuenta como fallo: abierto otra vez, y tras el plazo hay una nueva prueba
+    with pytest.raises(CircuitOpenError):
+        client.request('GET', URL, retries=0)
+    clock.now += CIRCUIT_RESET_SECONDS
+    assert client.request('GET', URL, retries=0).status_code == 200
+    assert circuit.failures == 0
+
+
+def test_cancel_stops_before_the_next_retry(clock):
+    cancel = threading.Event()
+    client = client_with(503)
+    request = client.session.request
+
+    def request_then_cancel(*args, **kwargs):
+        # El ganador llega mientras este intento está en vuelo
+        cancel.set()
+        return request(*args, **kwargs)
+
+    client.session.request = request_then_cancel
+    with pytest.raises(RequestCancelled):
+        client.request('GET', URL, retries=2, cancel=cancel)
+    assert client.session.calls == 1
+    with pytest.raises(RequestCancelled):
+        client.request('GET', URL, cancel=cancel)
+    assert client.session.calls == 1
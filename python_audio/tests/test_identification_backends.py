@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""Identificación concurrente con servidores locales que sustituyen a los remotos"""
+
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+import lyrics_cache
+from lyrics_cache import LyricsCache
+from shazam_integration import ShazamIntegration, LOCAL_MATCH_SECONDS, fetch_lyrics
+from spectral_tiles import TileStore
+
+SR = 22050
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """AudD responde con una canción y lyrics.ovh con una letra; cualquier otra ruta da 404"""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(self.server.delay)
+        self._reply(200, {
+            'status': 'success',
+            'result': {'title': 'Canción de prueba', 'artist': 'Servidor local', 'album': 'Pruebas'}
+        })
+
+    def do_GET(self):
+        if self.path.startswith('/lyrics/'):
+            self.server.lyrics_requests += 1
+            self._reply(200, {'lyrics': 'Letra de prueba'})
+        else:
+            self._reply(404, {'error': 'Not found'})
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stand_in(monkeypatch, tmp_path):
+    """Servidor local para AudD y letras, y caché de letras temporal"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    server.delay = 0.0
+    server.lyrics_requests = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+    monkeypatch.setenv('AUDD_API_URL', url)
+    monkeypatch.setenv('LYRICS_OVH_API_URL', url + 'lyrics/')
+    cache = LyricsCache(str(tmp_path / 'lyrics.sqlite'))
+    monkeypatch.setattr(lyrics_cache, 'get_lyrics_cache', lambda *args: cache)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_fast_backend_wins_and_the_slow_one_stops():
+    steps = []
+    stopped = threading.Event()
+
+    def slow(cancel):
+        # Trabajo por etapas que comprueba la cancelación entre una y otra
+        while not cancel.is_set() and len(steps) < 1000:
+            steps.append(time.perf_counter())
+            time.sleep(0.01)
+        stopped.set()
+        return {'identified': True, 'confidence': 1.0, 'title': 'lento'}
+
+    def fast(cancel):
+        time.sleep(0.05)
+        return {'identified': True, 'confidence': 0.95, 'title': 'rápido'}
+
+    start = time.perf_counter()
+    result, timings = ShazamIntegration()._identify_concurrently({'audd': fast, 'local': slow})
+    elapsed = time.perf_counter() - start
+
+    assert result['title'] == 'rápido'
+    assert timings['audd']['status'] == 'identified'
+    assert timings['local']['status'] == 'cancelled'
+    assert stopped.is_set() and elapsed < 5
+    # Después de elegir ganador el lento ya no avanza
+    done = len(steps)
+    time.sleep(0.1)
+    assert len(steps) == done < 1000
+
+
+def test_backend_that_cannot_stop_is_abandoned():
+    release = threading.Event()
+
+    def stuck(cancel):
+        # Como una subida en vuelo: no mira la cancelación
+        release.wait(10)
+        return {'identified': False}
+
+    result, timings = ShazamIntegration()._identify_concurrently({
+        'audd': lambda cancel: {'identified': True, 'confidence': 0.95, 'title': 'rápido'},
+        'local': stuck
+    })
+    release.set()
+    assert result['title'] == 'rápido'
+    assert timings['local']['status'] == 'abandoned'
+
+
+def test_backends_get_their_own_copies():
+    y = np.random.default_rng(0).standard_normal(90 * SR).astype(np.float32)
+    (audd_y, audd_sr), (local_y, local_sr) = ShazamIntegration._backend_audio((y, SR))
+    assert not np.shares_memory(audd_y, y) and not np.shares_memory(local_y, y)
+    assert len(local_y) == LOCAL_MATCH_SECONDS * SR and audd_sr == local_sr == SR
+    assert ShazamIntegration._backend_audio(None) == (None, None)
+
+
+def test_audd_stand_in_wins_before_local_analysis_finishes(stand_in):
+    y = 0.1 * np.random.default_rng(1).standard_normal(30 * SR).astype(np.float32)
+    result = ShazamIntegration().identify_song_complete(None, audio=(y, SR), defer_lyrics=False)
+    assert result['identified'] and result['title'] == 'Canción de prueba'
+    assert result['backends']['audd']['status'] == 'identified'
+    # Según la etapa en que esté, el análisis local para a tiempo o queda abandonado
+    assert result['backends']['local']['status'] in ('cancelled', 'abandoned')
+
+
+def test_deferred_lyrics_are_fetched_on_request(stand_in):
+    y = 0.1 * np.random.default_rng(2).standard_normal(10 * SR).astype(np.float32)
+    result = ShazamIntegration().identify_song_complete(None, audio=(y, SR))
+    assert result['lyrics_pending'] and 'lyrics' not in result
+    # Sin búsqueda en segundo plano: nada que se corte al terminar el proceso
+    assert stand_in.lyrics_requests == 0
+
+    lyrics = fetch_lyrics(result['title'], result['artist'])
+    assert lyrics['lyrics'] == 'Letra de prueba'
+    assert stand_in.lyrics_requests == 1
+    # La segunda vez sale de la caché y llega con la identificación
+    assert fetch_lyrics(result['title'], result['artist'])['lyrics'] == 'Letra de prueba'
+    assert stand_in.lyrics_requests == 1
+    assert ShazamIntegration()._enrich_song_data(
+        {'identified': True, 'title': result['title'], 'artist': result['artist']}, defer_lyrics=True
+    )['lyrics'] == 'Letra de prueba'
+
+
+def test_identify_keeps_the_serial_analysis(stand_in, tmp_path):
+    # La subida de la interfaz (--peaks --tiles --identify) debe dar el mismo
+    # análisis que sin identificación, a la frecuencia original del archivo
+    from analyze_audio_ultimate import analyze_audio_complete
+
+    sr = 44100
+    t = np.arange(20 * sr) / sr
+    y = 0.1 * sum(np.sin(2 * np.pi * f * t) for f in (261.63, 329.63, 392.0))
+    y[(t % 0.5) < 0.02] += 0.5 * np.sin(2 * np.pi * 1000 * t[(t % 0.5) < 0.02])
+    y[:2 * sr] = 0.0
+    path = tmp_path / 'subida.wav'
+    sf.write(path, y.astype(np.float32), sr)
+
+    plain = analyze_audio_complete(str(path), peaks_dir=str(tmp_path / 'a'), tiles_dir=str(tmp_path / 'a' / 'tiles'))
+    combined = analyze_audio_complete(str(path), peaks_dir=str(tmp_path / 'b'),
+                                      tiles_dir=str(tmp_path / 'b' / 'tiles'), identify=True)
+
+    assert combined.pop('song_identification')['title'] == 'Canción de prueba'
+    assert combined == plain
+    assert combined['sample_rate'] == sr
+    with open(tmp_path / 'a' / 'waveform.json') as a, open(tmp_path / 'b' / 'waveform.json') as b:
+        assert json.load(a) == json.load(b)
+    plain_tiles, combined_tiles = TileStore(str(tmp_path / 'a' / 'tiles')), TileStore(str(tmp_path / 'b' / 'tiles'))
+    assert combined_tiles.index() == plain_tiles.index()
+    for kind in ('chroma', 'spectrogram'):
+        np.testing.assert_array_equal(combined_tiles.tile(kind, 0, 0), plain_tiles.tile(kind, 0, 0))
+
+
+def test_identify_reuses_the_serial_features(monkeypatch, tmp_path):
+    # La identificación local no vuelve a calcular tempo, chroma y MFCC
+    from analyze_audio_ultimate import analyze_audio_complete
+
+    not_identified = lambda self, *args: {'identified': False}
+    monkeypatch.setattr(ShazamIntegration, '_identify_with_audd', not_identified)
+    monkeypatch.setattr(ShazamIntegration, '_identify_with_acrcloud', not_identified)
+    monkeypatch.setattr(ShazamIntegration, '_identify_with_fingerprints', lambda self, *args: None)
+    reused, extracted = [], []
+    original = ShazamIntegration._features_from_frame_features
+
+    def spy(self, frame_features, y, sr):
+        reused.append(frame_features)
+        return original(self, frame_features, y, sr)
+
+    monkeypatch.setattr(ShazamIntegration, '_features_from_frame_features', spy)
+    monkeypatch.setattr(ShazamIntegration, '_extract_audio_features',
+                        lambda self, y, sr: extracted.append(sr) or {})
+
+    sr = 44100
+    t = np.arange(10 * sr) / sr
+    y = 0.1 * sum(np.sin(2 * np.pi * f * t) for f in (261.63, 329.63, 392.0))
+    y[(t % 0.5) < 0.02] += 0.5
+    path = tmp_path / 'subida.wav'
+    sf.write(path, y.astype(np.float32), sr)
+
+    result = analyze_audio_complete(str(path), identify=True)
+    assert result['success']
+    assert result['song_identification']['backends']['local']['status'] == 'not_identified'
+    assert extracted == []
+    assert len(reused) == 1 and reused[0]['sr'] == sr
+    assert reused[0]['chroma'].shape[1] == len(reused[0]['onset_envelope'])
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""Análisis en vivo: acorde y BPM de un flujo entregado en bloques"""
+
+import numpy as np
+import pytest
+
+from live_analysis import LiveAnalyzer, UPDATE_INTERVAL
+
+SR = 22050
+
+
+def c_major_with_clicks(seconds, bpm=120):
+    """Acorde de Do mayor sostenido con un clic de 20 ms en cada pulso"""
+    t = np.arange(int(seconds * SR)) / SR
+    y = 0.2 * sum(np.sin(2 * np.pi * f * t) for f in (261.63, 329.63, 392.0))
+    click = 0.8 * np.sin(2 * np.pi * 1000 * np.arange(int(0.02 * SR)) / SR)
+    for beat in np.arange(0, seconds, 60.0 / bpm):
+        start = int(beat * SR)
+        y[start:start + len(click)] += click[:len(y) - start]
+    return y.astype(np.float32)
+
+
+@pytest.mark.parametrize('block_size', [1000, 2048])
+def test_blocks_report_chord_and_bpm(block_size):
+    y = c_major_with_clicks(10)
+    analyzer = LiveAnalyzer(sr=SR)
+    updates = [analyzer.push(y[start:start + block_size]) for start in range(0, len(y), block_size)]
+    updates = [update for update in updates if update is not None]
+
+    # Una actualización cada UPDATE_INTERVAL segundos de audio (más lo que sobra del bloque)
+    gaps = np.diff([update['time'] for update in updates])
+    assert np.all(gaps >= UPDATE_INTERVAL) and np.all(gaps <= UPDATE_INTERVAL + block_size / SR + 1e-9)
+
+    last = updates[-1]
+    assert last['chord'] == 'C' and last['chord_confidence'] > 0.8
+    assert last['bpm'] == pytest.approx(120, rel=0.05)
+    assert last['tempo_classification'] is not None
+    # El acorde se sostiene desde el primer segundo
+    assert all(update['chord'] == 'C' for update in updates if update['time'] >= 1.0)
+
+
+def test_no_bpm_before_two_seconds():
+    analyzer = LiveAnalyzer(sr=SR)
+    update = analyzer.push(c_major_with_clicks(1))
+    assert update is not None and update['bpm'] is None
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""Caché de letras: caducidad, entradas negativas, letras incluidas y arranque sin escrituras"""
+
+import sqlite3
+
+import pytest
+
+import lyrics_cache
+from lyrics_cache import LyricsCache, normalize_key, LYRICS_TTL, NEGATIVE_TTL, BUNDLED_LYRICS
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeTime()
+    monkeypatch.setattr(lyrics_cache, 'time', fake)
+    return fake
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    return LyricsCache(str(tmp_path / 'lyrics.sqlite'))
+
+
+def test_normalize_key_ignores_case_accents_and_annotations():
+    assert normalize_key('Canción (Remastered 2009)', 'José') == normalize_key('cancion [Live]', 'JOSE!')
+
+
+def test_found_lyrics_expire_after_ttl(cache, clock):
+    cache.put('Tema', 'Artista', 'la la la')
+    clock.now += LYRICS_TTL - 1
+    assert cache.get('tema', 'ARTISTA') == 'la la la'
+    clock.now += 1
+    assert cache.get('Tema', 'Artista') is None
+
+
+def test_not_found_is_remembered_for_a_shorter_time(cache, clock):
+    cache.put('Tema', 'Artista', None)
+    assert cache.get('Tema', 'Artista') == ''
+    clock.now += NEGATIVE_TTL
+    assert cache.get('Tema', 'Artista') is None
+    assert NEGATIVE_TTL < LYRICS_TTL
+
+
+def test_bundled_lyrics_never_expire_nor_get_replaced(cache, clock):
+    (title, artist), text = next(iter(BUNDLED_LYRICS.items()))
+    cache.put(title, artist, 'otra letra')
+    clock.now += 10 * LYRICS_TTL
+    assert cache.get(title, artist) == text
+
+
+def test_least_recently_used_entries_are_evicted(cache, clock, monkeypatch):
+    monkeypatch.setattr(lyrics_cache, 'MAX_ENTRIES', 2)
+    for name in ('uno', 'dos'):
+        clock.now += 1
+        cache.put(name, 'Artista', name)
+    clock.now += 1
+    cache.get('uno', 'Artista')
+    clock.now += 1
+    cache.put('tres', 'Artista', 'tres')
+    assert cache.get('dos', 'Artista') is None
+    assert cache.get('uno', 'Artista') == 'uno' and cache.get('tres', 'Artista') == 'tres'
+
+
+def test_restart_does_not_write(cache):
+    # Otro proceso con la base bloqueada para escritura no debe frenar el arranque
+    locker = sqlite3.connect(cache.path, isolation_level=None)
+    locker.execute('BEGIN IMMEDIATE')
+    try:
+        LyricsCache(cache.path)
+    finally:
+        locker.execute('ROLLBACK')
+        locker.close()
+
+
+def test_restart_restores_modified_bundled_lyrics(cache):
+    (title, artist), text = next(iter(BUNDLED_LYRICS.items()))
+    with sqlite3.connect(cache.path) as connection:
+        connection.execute("UPDATE lyrics SET lyrics = 'vieja' WHERE key = ?", (normalize_key(title, artist),))
+    connection.close()
+    assert LyricsCache(cache.path).get(title, artist) == text
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""Análisis por fragmentos: plan, unión de pulsos y coincidencia con el análisis en serie"""
+
+import numpy as np
+import pytest
+
+from parallel_analysis import plan_chunks, stitch_beats, analyze_audio_parallel
+from tempo_map import trim_weak_beats
+
+SR = 22050
+
+
+def click_track(seconds, bpm, sr=SR, silent=()):
+    """Clics de 20 ms a bpm con tramos en silencio [(inicio, fin)] en segundos"""
+    y = np.zeros(int(seconds * sr), dtype=np.float32)
+    click = np.sin(2 * np.pi * 1000 * np.arange(int(0.02 * sr)) / sr).astype(np.float32)
+    for t in np.arange(0, seconds, 60.0 / bpm):
+        start = int(t * sr)
+        y[start:start + len(click)] = click[:len(y) - start]
+    for start, end in silent:
+        y[int(start * sr):int(end * sr)] = 0.0
+    return y
+
+
+def test_plan_chunks_cores_are_contiguous_and_aligned():
+    chunks = plan_chunks(300 * SR, SR, chunk_duration=120, overlap=8)
+    assert chunks[0][1] == 0 and chunks[-1][2] == 300 * SR
+    for (_, _, core_end, _), (start, core_start, _, _) in zip(chunks, chunks[1:]):
+        assert core_end == core_start
+        assert core_start % (4 * SR) == 0
+        assert start == core_start - 8 * SR
+
+
+def test_stitch_beats_drops_border_duplicates():
+    parts = [{'beats': np.array([0, 100, 200, 300])}, {'beats': np.array([302, 400, 500])}]
+    np.testing.assert_array_equal(stitch_beats(parts, SR), [0, 100, 200, 300, 400, 500])
+
+
+def test_trim_weak_beats_cuts_weak_ends():
+    frames = np.arange(0, 1000, 10)
+    envelope = np.ones(len(frames))
+    envelope[:20] = 0.01
+    envelope[-10:] = 0.01
+    beats = np.arange(0, 1000, 50)
+    keep = trim_weak_beats(beats, frames, envelope)
+    assert beats[keep][0] == 200 and beats[keep][-1] == 850
+
+
+@pytest.fixture(scope='module')
+def gaps_file(tmp_path_factory):
+    soundfile = pytest.importorskip('soundfile')
+    path = tmp_path_factory.mktemp('audio') / 'gaps.wav'
+    soundfile.write(str(path), click_track(40, 120, silent=[(0, 4), (16, 26)]), SR)
+    return str(path)
+
+
+def test_parallel_rhythm_skips_silence(gaps_file):
+    parallel = analyze_audio_parallel(gaps_file, workers=1, chunk_duration=12, overlap=4)
+    assert parallel['chunks'] > 1
+
+    beats = np.array(parallel['beat_grid']['beats'])
+    assert not np.any((beats > 16.1) & (beats < 25.9))
+    assert parallel['bpm'] == pytest.approx(120, rel=0.05)
+
+
+@pytest.fixture(scope='module')
+def chord_file(tmp_path_factory):
+    """Silencio, acorde de Do con clics a 120 BPM y silencio (40 s, un solo fragmento)"""
+    soundfile = pytest.importorskip('soundfile')
+    t = np.arange(40 * SR) / SR
+    chord = 0.1 * sum(np.sin(2 * np.pi * f * t) for f in (261.63, 329.63, 392.0))
+    y = (chord + click_track(40, 120)).astype(np.float32)
+    y[:5 * SR] = 0.0
+    y[35 * SR:] = 0.0
+    path = tmp_path_factory.mktemp('audio') / 'chord.wav'
+    soundfile.write(str(path), y, SR)
+    return str(path)
+
+
+@pytest.mark.parametrize('sync', [None, 'beat'])
+def test_single_chunk_matches_serial_exactly(chord_file, sync):
+    from analyze_audio_ultimate import analyze_audio_complete
+
+    serial = analyze_audio_complete(chord_file, sync=sync)
+    parallel = analyze_audio_parallel(chord_file, workers=1, sync=sync)
+    assert parallel['chunks'] == 1
+
+    # Incluido el último pulso, que decide dónde termina la última sección
+    assert parallel['beat_grid'] == serial['beat_grid']
+    assert parallel['timeline'] == serial['timeline']
+    assert parallel['structure'] == serial['structure']
+    for name in serial:
+        if name != 'analysis_method':
+            assert parallel[name] == serial[name], name
+
+
+@pytest.fixture(scope='module')
+def progression_file(tmp_path_factory):
+    """Do, La menor, Fa y Sol cada 4 s con clics a 120 BPM y dos silencios (48 s)"""
+    soundfile = pytest.importorskip('soundfile')
+    t = np.arange(48 * SR) / SR
+    chords = [(261.63, 329.63, 392.0), (220.0, 261.63, 329.63),
+              (349.23, 440.0, 523.25), (392.0, 493.88, 587.33)]
+    y = np.zeros_like(t)
+    for i in range(12):
+        block = (t >= 4 * i) & (t < 4 * i + 4)
+        y[block] = 0.1 * sum(np.sin(2 * np.pi * f * t[block]) for f in chords[i % 4])
+    y = (y + click_track(48, 120)).astype(np.float32)
+    y[:3 * SR] = 0.0
+    y[20 * SR:23 * SR] = 0.0
+    path = tmp_path_factory.mktemp('audio') / 'progression.wav'
+    soundfile.write(str(path), y, SR)
+    return str(path)
+
+
+def test_multiple_chunks_are_equivalent_to_serial(progression_file):
+    from analyze_audio_ultimate import analyze_audio_complete
+
+    serial = analyze_audio_complete(progression_file)
+    parallel = analyze_audio_parallel(progression_file, workers=1, chunk_duration=12, overlap=4)
+    assert parallel['chunks'] > 1
+
+    # Bloques fijos alineados con los fragmentos: acordes, tonalidad y tempo iguales
+    for name in ('duration', 'sample_rate', 'key', 'bpm', 'tempo_classification', 'progression',
+                 'timeline', 'chord_timeline', 'notes', 'chord_count', 'silence'):
+        assert parallel[name] == serial[name], name
+    assert parallel['key_confidence'] == pytest.approx(serial['key_confidence'], abs=0.01)
+
+    # Los pulsos se buscan por fragmento: como mucho un frame de diferencia
+    frame = 512 / SR
+    serial_beats, parallel_beats = serial['beat_grid']['beats'], parallel['beat_grid']['beats']
+    assert len(parallel_beats) == len(serial_beats)
+    np.testing.assert_allclose(parallel_beats, serial_beats, atol=frame)
+
+    # Las secciones siguen a los pulsos
+    assert [(s['label'], s['section']) for s in parallel['structure']] == \
+        [(s['label'], s['section']) for s in serial['structure']]
+    for name in ('start', 'end'):
+        np.testing.assert_allclose([s[name] for s in parallel['structure']],
+                                   [s[name] for s in serial['structure']], atol=frame)
+
+    # Medias de frames cuyo contexto de STFT cambia en los bordes: < 1 % (MFCC: < 0.5 dB,
+    # hay coeficientes cerca de cero)
+    basic_serial, basic_parallel = serial['basic_features'], parallel['basic_features']
+    for name, value in basic_serial.items():
+        if name == 'mfcc_mean':
+            np.testing.assert_allclose(basic_parallel[name], value, atol=0.5)
+        else:
+            assert basic_parallel[name] == pytest.approx(value, rel=0.01), name
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""Fragmento para identificación remota: ventana de más energía y codificación"""
+
+import io
+import wave
+
+import numpy as np
+import pytest
+
+import ffmpeg_decoder
+import query_excerpt
+from query_excerpt import (
+    loudest_window, encode_excerpt, make_query_excerpt,
+    EXCERPT_SR, EXCERPT_SECONDS, ENERGY_HOP_SECONDS
+)
+
+SR = 22050
+
+
+def quiet_song_with_loud_part(seconds, loud_start, loud_seconds, sr=SR):
+    y = 0.01 * np.random.default_rng(0).standard_normal(int(seconds * sr))
+    loud = slice(int(loud_start * sr), int((loud_start + loud_seconds) * sr))
+    y[loud] = 0.5 * np.random.default_rng(1).standard_normal(loud.stop - loud.start)
+    return y.astype(np.float32)
+
+
+def read_wav(data):
+    with wave.open(io.BytesIO(data), 'rb') as f:
+        return f.getnchannels(), f.getsampwidth(), f.getframerate(), f.readframes(f.getnframes())
+
+
+@pytest.fixture
+def no_ffmpeg(monkeypatch):
+    monkeypatch.setattr(ffmpeg_decoder, 'ffmpeg_available', lambda: False)
+
+
+def test_loudest_window_contains_the_loud_region():
+    y = quiet_song_with_loud_part(60, loud_start=33.2, loud_seconds=6)
+    excerpt = loudest_window(y, SR)
+    assert len(excerpt) == int(EXCERPT_SECONDS * SR)
+
+    # La ventana empieza en un múltiplo del salto y cubre toda la zona fuerte
+    start = int(np.flatnonzero(y == excerpt[0])[0])  # ruido: cada muestra es única
+    assert start % int(ENERGY_HOP_SECONDS * SR) == 0
+    assert start <= 33.2 * SR and start + len(excerpt) >= 39.2 * SR
+
+
+def test_short_input_is_returned_whole():
+    y = quiet_song_with_loud_part(EXCERPT_SECONDS / 2, loud_start=1, loud_seconds=1)
+    assert loudest_window(y, SR) is y
+    exact = quiet_song_with_loud_part(EXCERPT_SECONDS, loud_start=1, loud_seconds=1)
+    assert len(loudest_window(exact, SR)) == len(exact)
+
+
+def test_wav_fallback_without_ffmpeg(no_ffmpeg):
+    y = quiet_song_with_loud_part(40, loud_start=20, loud_seconds=5, sr=44100)
+    data, extension = make_query_excerpt(None, audio=(y, 44100))
+
+    assert extension == 'wav'
+    assert data[:4] == b'RIFF' and data[8:12] == b'WAVE'
+    channels, width, rate, frames = read_wav(data)
+    assert (channels, width, rate) == (1, 2, EXCERPT_SR)
+    assert len(frames) // width == int(EXCERPT_SECONDS * EXCERPT_SR)
+
+
+def test_wav_fallback_keeps_short_input_and_clips(no_ffmpeg):
+    y = np.array([0.0, 0.5, -0.5, 1.0, -2.0], dtype=np.float32)
+    data, extension = encode_excerpt(y, EXCERPT_SR)
+    assert extension == 'wav'
+    _, _, rate, frames = read_wav(data)
+    assert rate == EXCERPT_SR
+    assert np.frombuffer(frames, dtype='<i2').tolist() == [0, 16383, -16383, 32767, -32767]
+
+
+def test_failed_mp3_encoding_falls_back_to_wav(monkeypatch):
+    def broken_run(*args, **kwargs):
+        raise OSError('ffmpeg roto')
+
+    monkeypatch.setattr(ffmpeg_decoder, 'ffmpeg_available', lambda: True)
+    monkeypatch.setattr(query_excerpt.subprocess, 'run', broken_run)
+    data, extension = encode_excerpt(np.zeros(EXCERPT_SR, dtype=np.float32), EXCERPT_SR)
+    assert extension == 'wav' and read_wav(data)[2] == EXCERPT_SR
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""Timeline columnar y serialización de resultados"""
+
+import pytest
+
+from result_format import (
+    encode_timeline_columnar, decode_timeline_columnar, legacy_timeline,
+    serialize_result, deserialize_result
+)
+
+ENTRIES = [
+    {'start': 0.0, 'chord': 'C', 'confidence': 0.9},
+    {'start': 1.5, 'chord': 'Am', 'confidence': 0.75},
+    {'start': 3.25, 'chord': 'C', 'confidence': 0.5},
+    {'start': 65.0, 'chord': 'N', 'confidence': 0.0}
+]
+
+
+def test_columnar_round_trip():
+    columnar = encode_timeline_columnar(ENTRIES, progression=['C', 'Am', 'G'])
+    assert columnar['vocabulary'] == ['C', 'Am', 'N', 'G']
+    assert columnar['chord'] == [0, 1, 0, 2]
+    assert columnar['progression'] == [0, 1, 3]
+    assert decode_timeline_columnar(columnar) == ENTRIES
+
+
+def test_legacy_timeline_formats_time():
+    legacy = legacy_timeline(ENTRIES, limit=None)
+    assert [entry['time'] for entry in legacy] == ['0:00', '0:01', '0:03', '1:05']
+    assert len(legacy_timeline(ENTRIES, limit=2)) == 2
+
+
+@pytest.mark.parametrize('fmt', ['json', 'npz'])
+def test_serialize_round_trip(fmt):
+    result = {'key': 'C major', 'chord_timeline': encode_timeline_columnar(ENTRIES)}
+    decoded = deserialize_result(serialize_result(result, fmt), fmt)
+    assert decoded['key'] == 'C major'
+    # npz guarda tiempo y confianza en float32
+    for entry, expected in zip(decode_timeline_columnar(decoded['chord_timeline']), ENTRIES):
+        assert entry['chord'] == expected['chord']
+        assert entry['start'] == pytest.approx(expected['start'])
+        assert entry['confidence'] == pytest.approx(expected['confidence'])
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        serialize_result({}, 'xml')
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""Memoria compartida: el mapeo sobrevive a close() mientras haya vistas"""
+
+import gc
+import os
+import sys
+import subprocess
+
+import numpy as np
+
+from shared_pcm import SharedPCM
+
+PYTHON_AUDIO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_attach_reads_the_same_samples():
+    y = np.linspace(-1, 1, 1000, dtype=np.float32)
+    with SharedPCM.create(y, 22050) as owner:
+        worker = SharedPCM.attach(owner.descriptor())
+        np.testing.assert_array_equal(worker.array, y)
+        assert worker.sr == 22050
+        worker.close()
+
+
+def test_mapping_is_released_with_the_last_view():
+    pcm = SharedPCM.create(np.arange(100, dtype=np.float32), 100)
+    view = pcm.array[10:20]
+    pcm.close()
+    pcm.close()
+    assert pcm._unmap.alive
+    del view
+    gc.collect()
+    assert not pcm._unmap.alive
+
+
+def test_views_stay_readable_after_close():
+    # En un subproceso: un acceso a memoria desmapeada mataría al intérprete
+    script = (
+        "import numpy as np\n"
+        "from shared_pcm import SharedPCM\n"
+        "owner = SharedPCM.create(np.arange(1 << 20, dtype=np.float32), 22050)\n"
+        "worker = SharedPCM.attach(owner.descriptor())\n"
+        "view = worker.array[1000:]\n"
+        "worker.close()\n"
+        "owner.close()\n"
+        "print(float(view[:10].sum()), float(view[-1]))\n"
+    )
+    process = subprocess.run(
+        [sys.executable, '-c', script], cwd=PYTHON_AUDIO_DIR, capture_output=True, text=True, timeout=60
+    )
+    assert process.returncode == 0, process.stderr
+    assert process.stdout.split() == ['10045.0', str(float((1 << 20) - 1))]
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""Mapa de actividad y archivos sin actividad"""
+
+import numpy as np
+
+from silence_detection import ActivityMap, detect_activity
+
+SR = 1000
+
+
+def test_to_original_maps_active_positions_across_gaps():
+    # Activo en [100, 200) y [500, 800): el audio activo concatenado mide 400 muestras
+    activity = ActivityMap([[100, 200], [500, 800]], SR, 1000)
+    assert activity.active_samples == 400
+    np.testing.assert_array_equal(activity.to_original([0, 99, 100, 250, 399]), [100, 199, 500, 650, 799])
+
+
+def test_active_audio_round_trip():
+    y = np.arange(1000, dtype=np.float32)
+    activity = ActivityMap([[100, 200], [500, 800]], SR, 1000)
+    active = activity.active_audio(y)
+    np.testing.assert_array_equal(y[activity.to_original(np.arange(len(active)))], active)
+
+
+def test_contains_and_silent_regions():
+    activity = ActivityMap([[100, 200], [500, 800]], SR, 1000)
+    np.testing.assert_array_equal(activity.contains([0, 100, 199, 200, 650, 800]),
+                                  [False, True, True, False, True, False])
+    np.testing.assert_array_equal(activity.silent_regions(), [[0, 100], [200, 500], [800, 1000]])
+    assert activity.slice(150, 600).regions.tolist() == [[0, 50], [350, 450]]
+
+
+def test_detect_activity_finds_the_tone():
+    sr = 8000
+    y = np.zeros(5 * sr, dtype=np.float32)
+    t = np.arange(2 * sr) / sr
+    y[2 * sr:4 * sr] = 0.5 * np.sin(2 * np.pi * 440 * t)
+    activity = detect_activity(y, sr)
+    assert len(activity.regions) == 1
+    start, end = activity.regions[0] / sr
+    assert abs(start - 2.0) < 0.1 and abs(end - 4.0) < 0.1
+
+
+def test_all_silent_file_has_no_chords_key_or_tempo():
+    from analyze_audio_ultimate import analyze_audio_complete, extract_frame_features, analyze_from_features
+
+    sr = 22050
+    y = np.zeros(10 * sr, dtype=np.float32)
+    assert not detect_activity(y, sr).has_activity
+
+    serial = analyze_audio_complete('silencio.wav', audio=(y, sr))
+    from_features = analyze_from_features(extract_frame_features(y, sr))
+    for result in (serial, from_features):
+        assert result['success']
+        assert {entry['chord'] for entry in result['timeline']} == {'N'}
+        assert len(result['timeline']) == 3
+        assert result['key'] == 'Unknown'
+        assert result['bpm'] == 0.0
+        assert result['notes'] == []
+        assert result['silence'] == {'active_ratio': 0.0, 'silent_regions': [[0.0, 10.0]]}
+
+
+def test_all_silent_file_writes_both_tile_kinds(tmp_path):
+    from analyze_audio_ultimate import analyze_audio_complete
+    from spectral_tiles import TileStore
+
+    sr = 22050
+    y = np.zeros(10 * sr, dtype=np.float32)
+    # En serie y por características
+    analyze_audio_complete('silencio.wav', audio=(y, sr), tiles_dir=str(tmp_path / 'serie'))
+    analyze_audio_complete('silencio.wav', audio=(y, sr), decision_params={},
+                           tiles_dir=str(tmp_path / 'caracteristicas'))
+    for name in ('serie', 'caracteristicas'):
+        tiles = TileStore(str(tmp_path / name))
+        assert set(tiles.index()['kinds']) == {'chroma', 'spectrogram'}
+        assert not tiles.tile('chroma', 0, 0).any()
+        # Suelo del rango, no 0 dB
+        assert not tiles.tile('spectrogram', 0, 0).any()
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""Almacén binario de la base de canciones: tabla SQLite + vectores en memmap"""
+
+import json
+import sqlite3
+
+import numpy as np
+import pytest
+
+import song_store
+from song_store import SongStore
+
+
+def make_entry(seed, title):
+    rng = np.random.default_rng(seed)
+    return {
+        'title': title,
+        'artist': 'Artista',
+        'album': 'Álbum',
+        'file_path': f"songs/{title}.mp3",
+        'added_date': '2026-01-01',
+        'features': {
+            'tempo': 90.0 + seed,
+            'spectral_centroid': 1500.0 + seed,
+            'chroma': [float(value) for value in rng.random(12).astype(np.float32)],
+            'mfcc': [float(value) for value in rng.random(13).astype(np.float32)]
+        }
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SongStore(str(tmp_path / 'store'))
+
+
+def test_add_get_and_replace(store):
+    assert store.add_song('uno', make_entry(1, 'Uno'))
+    assert store.add_songs({'dos': make_entry(2, 'Dos'), 'tres': make_entry(3, 'Tres')}) == 2
+    assert len(store) == 3
+
+    entry = store.get('dos')
+    assert entry['title'] == 'Dos' and entry['features']['tempo'] == 92.0
+    assert entry['features']['chroma'] == make_entry(2, 'Dos')['features']['chroma']
+    # Los vectores que no se dieron no aparecen
+    assert 'tonnetz' not in entry['features']
+
+    # Reemplazar escribe una fila nueva y marca la anterior como borrada
+    store.add_song('dos', make_entry(20, 'Dos bis'))
+    assert len(store) == 3 and store.row_count() == 4
+    assert store.get('dos')['title'] == 'Dos bis'
+    assert list(store.search('bis')) == ['dos']
+
+
+def test_remove_marks_the_row_deleted(store):
+    store.add_songs({'uno': make_entry(1, 'Uno'), 'dos': make_entry(2, 'Dos')})
+    assert store.remove_song('uno')
+    assert not store.remove_song('uno')
+    assert store.get('uno') is None
+    assert list(store.entries()) == ['dos']
+    assert store.row_count() == 2
+
+
+def test_json_round_trip(store, tmp_path):
+    songs = {'uno': make_entry(1, 'Uno'), 'dos': make_entry(2, 'Dos')}
+    source = tmp_path / 'songs.json'
+    source.write_text(json.dumps(songs), encoding='utf-8')
+    assert store.import_json(str(source)) == 2
+
+    exported = tmp_path / 'export.json'
+    store.export_json(str(exported))
+    assert json.loads(exported.read_text(encoding='utf-8')) == songs
+
+
+def test_feature_matrix_skips_deleted_rows(store):
+    store.add_songs({name: make_entry(seed, name) for seed, name in enumerate(['uno', 'dos', 'tres'])})
+    store.remove_song('dos')
+
+    songs, matrix = store.feature_matrix()
+    assert list(songs) == ['uno', 'tres'] and matrix.song_ids == ['uno', 'tres']
+    np.testing.assert_array_equal(matrix.tempo, [90.0, 92.0])
+    np.testing.assert_array_equal(matrix.chroma[1], make_entry(2, 'tres')['features']['chroma'])
+    # Sin tonnetz guardado: filas NaN
+    assert np.all(np.isnan(matrix.tonnetz))
+
+
+def test_every_connection_is_closed(store, monkeypatch):
+    opened = []
+
+    def tracking_connect(*args, **kwargs):
+        opened.append(real_connect(*args, **kwargs))
+        return opened[-1]
+
+    real_connect = sqlite3.connect
+    monkeypatch.setattr(song_store.sqlite3, 'connect', tracking_connect)
+    store.add_song('uno', make_entry(1, 'Uno'))
+    store.get('uno')
+    store.remove_song('uno')
+    store.feature_matrix()
+    len(store)
+
+    assert len(opened) >= 5
+    for connection in opened:
+        with pytest.raises(sqlite3.ProgrammingError):
+            connection.execute('SELECT 1')
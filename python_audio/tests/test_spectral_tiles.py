@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""Teselas de chroma y espectrograma: niveles, escala uint8 e ida y vuelta por tile()"""
+
+import numpy as np
+import pytest
+
+from spectral_tiles import TileStore, quantize, TILE_FRAMES, LEVEL_FACTOR, VALUE_RANGES
+
+SR = 22050
+HOP = 512
+
+
+def test_uint8_scaling():
+    chroma = quantize(np.array([[0.0, 0.5, 1.0, 1.5, -0.1]]), VALUE_RANGES['chroma'])
+    assert chroma.dtype == np.uint8
+    assert chroma.tolist() == [[0, 128, 255, 255, 0]]
+    spectrogram = quantize(np.array([[-80.0, -40.0, 0.0, -100.0]]), VALUE_RANGES['spectrogram'])
+    assert spectrogram.tolist() == [[0, 128, 255, 0]]
+
+
+def test_round_trip_through_tiles(tmp_path):
+    n_frames = 3 * TILE_FRAMES + 101
+    chroma = np.random.default_rng(0).random((12, n_frames)).astype(np.float32)
+    TileStore(str(tmp_path)).write('chroma', chroma, SR, HOP)
+
+    # Un almacén nuevo lee el índice guardado
+    tiles = TileStore(str(tmp_path))
+    info = tiles.index()['kinds']['chroma']
+    assert info['bins'] == 12 and info['sample_rate'] == SR
+    assert info['value_range'] == list(VALUE_RANGES['chroma'])
+
+    levels = info['levels']
+    assert [level['frames'] for level in levels] == [n_frames, int(np.ceil(n_frames / LEVEL_FACTOR))]
+    assert [level['hop_length'] for level in levels] == [HOP, HOP * LEVEL_FACTOR]
+    assert [level['tiles'] for level in levels] == [4, 1]
+
+    # Las teselas del nivel 0 juntas son el chroma cuantizado, frame a frame
+    level0 = [tiles.tile('chroma', 0, index) for index in range(levels[0]['tiles'])]
+    assert [tile.shape for tile in level0] == [(TILE_FRAMES, 12)] * 3 + [(101, 12)]
+    expected = quantize(chroma, VALUE_RANGES['chroma']).T
+    np.testing.assert_array_equal(np.concatenate(level0), expected)
+
+    # El nivel 1 promedia grupos de LEVEL_FACTOR frames (el último parcial)
+    level1 = tiles.tile('chroma', 1, 0)
+    assert level1.dtype == np.uint8 and level1.shape == (levels[1]['frames'], 12)
+    np.testing.assert_array_equal(
+        level1[0], np.round(expected[:LEVEL_FACTOR].astype(np.float32).mean(axis=0))
+    )
+    np.testing.assert_array_equal(
+        level1[-1], np.round(expected[-(n_frames % LEVEL_FACTOR or LEVEL_FACTOR):].astype(np.float32).mean(axis=0))
+    )
+
+    start, end = tiles.tile_time_range('chroma', 0, 3)
+    assert start == pytest.approx(3 * TILE_FRAMES * HOP / SR)
+    assert end == pytest.approx(n_frames * HOP / SR)
+    assert tiles.tile_time_range('chroma', 1, 0)[1] == pytest.approx(levels[1]['frames'] * HOP * LEVEL_FACTOR / SR)
+
+
+def test_kinds_are_independent_and_requests_are_checked(tmp_path):
+    tiles = TileStore(str(tmp_path))
+    tiles.write('chroma', np.zeros((12, 10)), SR, HOP)
+    spectrogram = quantize(np.full((128, 10), -40.0), VALUE_RANGES['spectrogram'])
+    # Ya cuantizado (uint8): se guarda tal cual
+    tiles.write('spectrogram', spectrogram, SR, HOP)
+
+    assert tiles.tile('chroma', 0, 0).shape == (10, 12)
+    np.testing.assert_array_equal(tiles.tile('spectrogram', 0, 0), spectrogram.T)
+    assert len(tiles.index()['kinds']['spectrogram']['levels']) == 1
+
+    with pytest.raises(KeyError):
+        tiles.tile('tonnetz', 0, 0)
+    with pytest.raises(IndexError):
+        tiles.tile('chroma', 1, 0)
+    with pytest.raises(IndexError):
+        tiles.tile('chroma', 0, 1)
+
+
+def test_beat_sync_tiles_reuse_the_active_chroma(tmp_path):
+    # El chroma del modo sincronizado va a las teselas en la línea de tiempo
+    # original, igual que el de las características, con el silencio a cero
+    from analyze_audio_ultimate import analyze_audio_complete
+
+    t = np.arange(12 * SR) / SR
+    y = 0.1 * sum(np.sin(2 * np.pi * f * t) for f in (261.63, 329.63, 392.0))
+    y[(t % 0.5) < 0.02] += 0.5
+    y[:3 * SR] = 0.0
+    y = y.astype(np.float32)
+
+    analyze_audio_complete('pulsos.wav', sync='beat', audio=(y, SR), tiles_dir=str(tmp_path / 'serie'))
+    analyze_audio_complete('pulsos.wav', sync='beat', audio=(y, SR), decision_params={},
+                           tiles_dir=str(tmp_path / 'caracteristicas'))
+    serial, features = TileStore(str(tmp_path / 'serie')), TileStore(str(tmp_path / 'caracteristicas'))
+    assert serial.index()['kinds']['chroma'] == features.index()['kinds']['chroma']
+    tile = serial.tile('chroma', 0, 0)
+    np.testing.assert_array_equal(tile, features.tile('chroma', 0, 0))
+    assert not tile[:2 * SR // HOP].any() and tile[4 * SR // HOP:].any()
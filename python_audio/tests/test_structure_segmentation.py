@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""Segmentación de estructura: límites por novedad y memoria acotada"""
+
+import numpy as np
+
+import structure_segmentation
+from structure_segmentation import segment_structure, MAX_STRUCTURE_VECTORS, KERNEL_HALF_WIDTH
+
+SR = 22050
+HOP = 2048
+BEAT_SECONDS = 0.5
+
+
+def sectioned_features(section_seconds, seed=0):
+    """
+    Características (24 x frames) con un patrón por sección más ruido; las
+    secciones con el mismo índice comparten patrón. Devuelve también las
+    posiciones de frames y pulsos (muestras) y el total de muestras.
+    """
+    rng = np.random.default_rng(seed)
+    patterns = rng.random((max(index for index, _ in section_seconds) + 1, 24))
+    total_samples = int(sum(seconds for _, seconds in section_seconds) * SR)
+    frame_positions = np.arange(0, total_samples, HOP)
+    features = np.empty((24, len(frame_positions)))
+    start = 0.0
+    for index, seconds in section_seconds:
+        inside = (frame_positions >= start * SR) & (frame_positions < (start + seconds) * SR)
+        features[:, inside] = patterns[index][:, None] + 0.1 * rng.standard_normal((24, inside.sum()))
+        start += seconds
+    beat_positions = np.arange(0, total_samples, int(BEAT_SECONDS * SR))
+    return features, frame_positions, beat_positions, total_samples
+
+
+def test_boundary_lands_on_the_change_point():
+    features, frames, beats, total = sectioned_features([(0, 40), (1, 40)])
+    sections = segment_structure(features, frames, beats, total, SR)
+
+    assert len(sections) == 2
+    assert abs(sections[1]['start'] - 40.0) <= 2 * BEAT_SECONDS
+    assert sections[0]['start'] == 0.0
+    assert sections[1]['end'] == float(beats[-1]) / SR + BEAT_SECONDS
+    assert sections[0]['label'] != sections[1]['label']
+
+
+def test_repeated_section_gets_the_same_label():
+    features, frames, beats, total = sectioned_features([(0, 30), (1, 30), (0, 30)], seed=1)
+    sections = segment_structure(features, frames, beats, total, SR)
+
+    assert [section['label'] for section in sections] == ['A', 'B', 'A']
+    assert abs(sections[1]['start'] - 30.0) <= 2 * BEAT_SECONDS
+    assert abs(sections[2]['start'] - 60.0) <= 2 * BEAT_SECONDS
+
+
+def test_long_input_stays_within_max_vectors(monkeypatch):
+    shapes = []
+    real_banded_similarity = structure_segmentation.banded_similarity
+
+    def recording_banded_similarity(vectors, max_lag):
+        band = real_banded_similarity(vectors, max_lag)
+        shapes.append((vectors.shape[1], band.shape))
+        return band
+
+    monkeypatch.setattr(structure_segmentation, 'banded_similarity', recording_banded_similarity)
+
+    # 50 minutos: 6000 pulsos agrupados en MAX_STRUCTURE_VECTORS vectores como máximo
+    features, frames, beats, total = sectioned_features([(0, 1500), (1, 1500)], seed=2)
+    assert len(beats) > 4 * MAX_STRUCTURE_VECTORS
+    sections = segment_structure(features, frames, beats, total, SR)
+
+    (n_vectors, band_shape), = shapes
+    assert n_vectors <= MAX_STRUCTURE_VECTORS
+    assert band_shape == (n_vectors, 2 * KERNEL_HALF_WIDTH + 1)
+    assert any(abs(section['start'] - 1500.0) <= 10 for section in sections[1:])
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""Pirámide de picos: niveles, escala int8 e ida y vuelta por waveform.json"""
+
+import json
+import os
+
+import numpy as np
+
+from waveform_peaks import (
+    compute_peak_pyramid, write_peaks, load_peak_index, load_peak_level,
+    PEAK_LEVELS, PEAKS_INDEX_FILE, QUANT_SCALE
+)
+
+SR = 22050
+
+
+def test_levels_reduce_the_finest_one():
+    y = np.random.default_rng(0).uniform(-1, 1, 10 * 4096 + 1000).astype(np.float32)
+    pyramid = compute_peak_pyramid(y)
+
+    assert sorted(pyramid) == sorted(PEAK_LEVELS)
+    for level, peaks in pyramid.items():
+        assert peaks.dtype == np.int8
+        assert peaks.shape == (int(np.ceil(len(y) / level)), 3)
+
+    # Cada nivel es el anterior agrupado por el factor entre ambos
+    for fine, coarse in zip(PEAK_LEVELS, PEAK_LEVELS[1:]):
+        factor = coarse // fine
+        assert coarse % fine == 0
+        fine_peaks = pyramid[fine].astype(np.int64)
+        for i, (low, high, _) in enumerate(pyramid[coarse]):
+            group = fine_peaks[i * factor:(i + 1) * factor]
+            assert low == group[:, 0].min() and high == group[:, 1].max()
+
+
+def test_int8_scaling():
+    y = np.concatenate([
+        np.full(256, 0.25),     # constante: min = max = rms
+        np.full(256, -0.5),
+        np.full(256, 2.0),      # fuera de rango: se recorta a 127
+        np.sin(2 * np.pi * np.arange(256) / 64)
+    ]).astype(np.float32)
+    peaks = compute_peak_pyramid(y, levels=(256,))[256]
+
+    assert peaks[0].tolist() == [32, 32, 32]
+    assert peaks[1].tolist() == [-64, -64, 64]
+    assert peaks[2].tolist() == [127, 127, 127]
+    low, high, rms = peaks[3]
+    assert low == -127 and high == 127
+    assert abs(rms - QUANT_SCALE / np.sqrt(2)) <= 1
+
+
+def test_round_trip_through_the_index(tmp_path):
+    y = np.random.default_rng(1).uniform(-0.8, 0.8, 5 * SR).astype(np.float32)
+    pyramid = compute_peak_pyramid(y)
+    directory = str(tmp_path / 'waveform')
+    write_peaks(directory, pyramid, SR, len(y))
+
+    with open(os.path.join(directory, PEAKS_INDEX_FILE), encoding='utf-8') as f:
+        index = json.load(f)
+    assert index == load_peak_index(directory)
+    assert index['sample_rate'] == SR and index['total_samples'] == len(y)
+    assert index['duration'] == len(y) / SR
+    assert index['scale'] == QUANT_SCALE
+    assert index['channels'] == ['min', 'max', 'rms']
+    assert [level['samples_per_pixel'] for level in index['levels']] == sorted(PEAK_LEVELS)
+
+    for level in index['levels']:
+        peaks = load_peak_level(directory, level['samples_per_pixel'])
+        assert len(peaks) == level['length']
+        assert os.path.getsize(os.path.join(directory, level['file'])) == 3 * level['length']
+        np.testing.assert_array_equal(peaks, pyramid[level['samples_per_pixel']])
+
+
+def test_empty_audio_and_missing_index(tmp_path):
+    assert all(len(peaks) == 0 for peaks in compute_peak_pyramid(np.zeros(0)).values())
+    assert load_peak_index(str(tmp_path)) is None
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PIRÁMIDE DE PICOS DE FORMA DE ONDA
+Mínimo, máximo y RMS por píxel a varios niveles de zoom, calculados sobre las
+muestras ya decodificadas para el análisis. Cada nivel se guarda en su propio
+archivo binario para que la interfaz descargue solo el que va a dibujar
+"""
+
+import os
+import sys
+import json
+import numpy as np
+
+# Muestras por píxel de cada nivel (cada uno múltiplo del anterior)
+PEAK_LEVELS = (256, 1024, 4096)
+
+PEAKS_INDEX_FILE = 'waveform.json'
+
+# Escala de cuantización: amplitud 1.0 -> 127
+QUANT_SCALE = 127.0
+
+
+def _reduce_level(minimum, maximum, power, factor):
+    """Agrupar un nivel en bloques de factor píxeles (el último bloque puede ser parcial)"""
+    n = len(minimum)
+    n_out = int(np.ceil(n / factor))
+    pad = n_out * factor - n
+    if pad:
+        minimum = np.concatenate((minimum, np.full(pad, minimum[-1])))
+        maximum = np.concatenate((maximum, np.full(pad, maximum[-1])))
+        power = np.concatenate((power, np.zeros(pad)))
+    counts = np.full(n_out, factor, dtype=np.float64)
+    counts[-1] = factor - pad
+    return (
+        minimum.reshape(n_out, factor).min(axis=1),
+        maximum.reshape(n_out, factor).max(axis=1),
+        power.reshape(n_out, factor).sum(axis=1) / counts
+    )
+
+
+def compute_peak_pyramid(y, levels=PEAK_LEVELS):
+    """
+    Pirámide de picos cuantizada a int8.
+    Devuelve {muestras_por_píxel: array (N, 3) con columnas min, max, rms}.
+    Solo el nivel más fino recorre las muestras; los demás se derivan de él.
+    """
+    levels = sorted(levels)
+    y = np.asarray(y, dtype=np.float32)
+    if len(y) == 0:
+        return {level: np.zeros((0, 3), dtype=np.int8) for level in levels}
+
+    # Nivel más fino: bloques contiguos, el último se rellena repitiendo la última muestra
+    base = levels[0]
+    n_blocks = int(np.ceil(len(y) / base))
+    padded = np.full(n_blocks * base, y[-1], dtype=np.float32)
+    padded[:len(y)] = y
+    blocks = padded.reshape(n_blocks, base)
+    minimum = blocks.min(axis=1)
+    maximum = blocks.max(axis=1)
+    energy = np.square(y, dtype=np.float64)
+    counts = np.full(n_blocks, base, dtype=np.float64)
+    counts[-1] = len(y) - (n_blocks - 1) * base
+    power = np.add.reduceat(energy, np.arange(0, len(y), base)) / counts
+
+    pyramid = {}
+    previous = base
+    for level in levels:
+        if level != base:
+            if level % previous:
+                raise ValueError(f"Nivel {level} no es múltiplo de {previous}")
+            minimum, maximum, power = _reduce_level(minimum, maximum, power, level // previous)
+            previous = level
+        quantized = np.stack((minimum, maximum, np.sqrt(power)), axis=1) * QUANT_SCALE
+        pyramid[level] = np.clip(np.round(quantized), -127, 127).astype(np.int8)
+    return pyramid
+
+
+def save_peak_pyramid(directory, pyramid, sr, total_samples):
+    """
+    Escribir un archivo waveform_<nivel>.bin por nivel (bytes min, max, rms
+    intercalados) y un índice waveform.json con la geometría de cada nivel.
+    """
+    os.makedirs(directory, exist_ok=True)
+    index = {
+        'sample_rate': int(sr),
+        'total_samples': int(total_samples),
+        'duration': total_samples / sr if sr else 0.0,
+        'scale': QUANT_SCALE,
+        'channels': ['min', 'max', 'rms'],
+        'levels': []
+    }
+    for level, peaks in sorted(pyramid.items()):
+        filename = f"waveform_{int(level)}.bin"
+        with open(os.path.join(directory, filename), 'wb') as f:
+            f.write(np.ascontiguousarray(peaks, dtype=np.int8).tobytes())
+        index['levels'].append({
+            'samples_per_pixel': int(level),
+            'length': int(len(peaks)),
+            'file': filename
+        })
+
+    # El índice se escribe al final: si existe, todos los niveles están completos
+    tmp_path = os.path.join(directory, f"{PEAKS_INDEX_FILE}.{os.getpid()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f)
+    os.replace(tmp_path, os.path.join(directory, PEAKS_INDEX_FILE))
+    return index
+
+
+def load_peak_index(directory):
+    """Índice de niveles guardado, o None si no existe"""
+    path = os.path.join(directory, PEAKS_INDEX_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_peak_level(directory, level):
+    """Picos de un nivel como array (N, 3) int8"""
+    with open(os.path.join(directory, f"waveform_{int(level)}.bin"), 'rb') as f:
+        data = f.read()
+    return np.frombuffer(data, dtype=np.int8).reshape(-1, 3)
+
+
+def write_peaks(directory, pyramid, sr, total_samples):
+    """Guardar la pirámide; un fallo aquí no debe tumbar el análisis"""
+    try:
+        return save_peak_pyramid(directory, pyramid, sr, total_samples)
+    except Exception as e:
+        print(f"Error al guardar picos de forma de onda: {e}", file=sys.stderr)
+        return None